@@ -29,7 +29,7 @@ async def get_market_data(
         raise HTTPException(status_code=404, detail="Coin_id not found")
     result = await get_coin_data(coin_ids=coin_ids)
     print("coinnnnnn---", coin_ids)
-    volatility_data = await get_volatility_data(symbol=coin_ids[0], user=user, db=db)
+    volatility_data = await get_volatility_data(symbol=coin_ids[0], db=db)
     return {
         "status_code": 200,
         "message": "Successfully get the Coin Data",
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.auth.user import auth_user
+from app.coinbase.client_registry import exchange_client_registry
 from app.coinbase.exchange import (
     buy_sell_order_execution,
     calculate_dashboard,
@@ -28,6 +29,9 @@ from app.schemas.exchange import (
     ExchangeConnectResponse,
 )
 from app.schemas.user import UserResponse
+from app.core.config import get_settings
+from app.security.credential_cache import credential_cache
+from app.security.envelope_service import envelope_service
 from app.security.kms_service import kms_service
 from app.services.auth_service import create_access_token, create_refresh_token
 from app.services.secret_manager_service import secrets_manager_service
@@ -37,6 +41,7 @@ from app.coinbase.coinbase_cctx import get_working_coinbase_exchange
 from app.models.user import PortfolioSnapshot
 from fastapi_utilities import repeat_every
 
+settings = get_settings()
 router = APIRouter(prefix="/exchange", tags=["Exchange"])
 
 
@@ -118,12 +123,23 @@ async def connect_exchange(
 
     # 5. Save exchange record with encrypted values (dual storage approach)
     # Store encrypted values in DB as backup/reference
+    if settings.EXCHANGE_KEY_ENCRYPTION == "envelope":
+        # One KMS-wrapped data key per user, fields sealed locally (AES-GCM)
+        data_key = await envelope_service.get_data_key(db, user.id, create=True)
+        encrypted = {
+            field: envelope_service.encrypt(getattr(data, field), data_key)
+            for field in ("api_key", "api_secret", "passphrase")
+        }
+    else:
+        encrypted = {
+            field: await kms_service.encrypt(getattr(data, field))
+            for field in ("api_key", "api_secret", "passphrase")
+        }
+
     user_exchange = UserExchange(
         user_id=user.id,
         exchange_name=exchange_name,
-        api_key=await kms_service.encrypt(data.api_key),
-        api_secret=await kms_service.encrypt(data.api_secret),
-        passphrase=await kms_service.encrypt(data.passphrase),
+        **encrypted,
         secret_arn=secret_arn,
     )
 
@@ -140,6 +156,10 @@ async def connect_exchange(
     await db.refresh(user)
     await db.refresh(user_exchange)
 
+    # Drop any decrypted keys / pooled client built from previous keys
+    credential_cache.invalidate(user_exchange.id)
+    await exchange_client_registry.invalidate(user.id, exchange_name)
+
     return {
         "message": f"{data.exchange_name} connected successfully",
         "user": user,
@@ -374,12 +394,19 @@ async def buy_sell_order(
 @router.get("/portfolio/profit-loss")
 async def portfolio_profit_loss(
     exchange_name: str,
+    method: str = "fifo",  # fifo, lifo or average
     current_user: User = Security(auth_user.get_current_user),
     db: AsyncSession = Depends(get_async_session),
 ):
-    return await get_profit_and_loss(
-        exchange_name=exchange_name.lower(), user=current_user, db=db
-    )
+    try:
+        return await get_profit_and_loss(
+            exchange_name=exchange_name.lower(),
+            user=current_user,
+            db=db,
+            method=method.lower(),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # this endpoint is an old endpoint which provide historical data but it is a slow api.
@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import ccxt.async_support as ccxt
+
+from app.coinbase.coinbase_cctx import (
+    create_coinbase_sandbox_exchange,
+    credential_fingerprint,
+    get_working_coinbase_exchange,
+    mark_auth_failed,
+)
+from app.coinbase.market_catalog import market_catalog
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# "auto"    → whatever get_working_coinbase_exchange authenticates
+#             (coinbaseadvanced, falling back to coinbaseexchange sandbox)
+# "sandbox" → coinbaseexchange sandbox client used by the portfolio endpoints
+CLIENT_FLAVOURS = {"auto", "sandbox"}
+
+
+def _auth_error_in_flight() -> bool:
+    """
+    True when called while a ccxt.AuthenticationError propagates, either
+    directly or as the cause/context of an error raised while handling it.
+    """
+    error, seen = sys.exc_info()[1], set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, ccxt.AuthenticationError):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+@dataclass
+class _ClientEntry:
+    key: tuple
+    exchange: object
+    fingerprint: str
+    last_used: float
+    leases: int = 0
+    discarded: bool = False
+
+
+class ExchangeClientRegistry:
+    """
+    Process-wide pool of warm, authenticated ccxt clients.
+
+    Clients are keyed by (user_id, exchange_name, flavour) and reused across
+    requests, so the aiohttp session, TLS connection, auth probe and loaded
+    markets survive between calls. Callers lease a client with `acquire()`
+    and hand it back with `release()` instead of closing it.
+    """
+
+    def __init__(self, max_size: int, idle_ttl: int):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._entries: "OrderedDict[tuple, _ClientEntry]" = OrderedDict()
+        self._by_client: dict[int, _ClientEntry] = {}
+        self._locks: dict[tuple, asyncio.Lock] = {}
+        self._reaper_task: asyncio.Task | None = None
+
+    async def acquire(
+        self,
+        user_id: int,
+        exchange_name: str,
+        keys: dict,
+        flavour: str = "auto",
+    ):
+        """
+        Return a pooled client for the user, building one on first use.
+        Returns None when the credentials cannot be authenticated.
+        """
+        if flavour not in CLIENT_FLAVOURS:
+            raise ValueError(f"Unknown exchange client flavour: {flavour}")
+
+        key = (int(user_id), exchange_name.lower(), flavour)
+        fingerprint = credential_fingerprint(
+            keys["api_key"], keys["api_secret"], keys.get("passphrase")
+        )
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            entry = self._entries.get(key)
+
+            # Keys were rotated since the client was built
+            if entry and entry.fingerprint != fingerprint:
+                await self._discard(entry)
+                entry = None
+
+            if entry is None:
+                exchange = await self._build(flavour, keys)
+                if not exchange:
+                    return None
+
+                entry = _ClientEntry(
+                    key=key,
+                    exchange=exchange,
+                    fingerprint=fingerprint,
+                    last_used=time.monotonic(),
+                )
+                self._entries[key] = entry
+                self._by_client[id(exchange)] = entry
+                logger.info(f"🔌 Pooled new {flavour} client for {key[:2]}")
+
+            entry.leases += 1
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(key)
+
+        await self._enforce_max_size()
+
+        return entry.exchange
+
+    async def release(self, exchange) -> None:
+        """
+        Hand a leased client back to the pool.
+        Clients that were never pooled are simply closed.
+
+        Callers release from their `finally`, so this is the one place that
+        sees every request fail: if the exchange rejected the credentials,
+        the cached auth probe is forgotten and the client is not reused.
+        """
+        if _auth_error_in_flight():
+            mark_auth_failed(exchange)
+
+        entry = self._by_client.get(id(exchange))
+
+        if entry is None:
+            await self._close_client(exchange)
+            return
+
+        entry.leases = max(entry.leases - 1, 0)
+        entry.last_used = time.monotonic()
+
+        # Credentials rejected while leased → rebuild (and re-probe) next time
+        if getattr(exchange, "_auth_failed", False) and not entry.discarded:
+            await self._discard(entry)
+            return
+
+        if entry.discarded and entry.leases == 0:
+            self._by_client.pop(id(exchange), None)
+            await self._close_client(exchange)
+
+    async def invalidate(self, user_id: int, exchange_name: str) -> None:
+        """
+        Drop every pooled client for the user on this exchange.
+        Call after the stored API keys change or are removed.
+        """
+        user_key = (int(user_id), exchange_name.lower())
+
+        for entry in [e for k, e in self._entries.items() if k[:2] == user_key]:
+            await self._discard(entry)
+
+    async def discard(self, exchange) -> None:
+        """Evict a specific client, e.g. after an authentication failure."""
+        entry = self._by_client.get(id(exchange))
+        if entry:
+            await self._discard(entry)
+
+    def start(self) -> None:
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.create_task(self._reap_idle_clients())
+
+    async def close_all(self) -> None:
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+            self._reaper_task = None
+
+        entries = list(self._by_client.values())
+        self._entries.clear()
+        self._by_client.clear()
+        self._locks.clear()
+
+        for entry in entries:
+            await self._close_client(entry.exchange)
+
+        logger.info(f"🧹 Closed {len(entries)} pooled exchange clients")
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "leased": sum(1 for e in self._entries.values() if e.leases),
+            "max_size": self.max_size,
+            "idle_ttl": self.idle_ttl,
+        }
+
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    async def _build(self, flavour: str, keys: dict):
+        if flavour == "sandbox":
+            exchange = create_coinbase_sandbox_exchange(
+                keys["api_key"], keys["api_secret"], keys.get("passphrase")
+            )
+        else:
+            exchange = await get_working_coinbase_exchange(
+                keys["api_key"],
+                keys["api_secret"],
+                keys.get("passphrase") or "",
+            )
+
+        if exchange:
+            try:
+                await market_catalog.attach(exchange)
+            except Exception as e:
+                # ccxt falls back to load_markets() on first use
+                logger.warning(f"⚠️ Market catalog unavailable: {e}")
+
+        return exchange
+
+    async def _discard(self, entry: _ClientEntry) -> None:
+        if self._entries.get(entry.key) is entry:
+            self._entries.pop(entry.key, None)
+
+        entry.discarded = True
+
+        # Still in use — the last release() closes it
+        if entry.leases > 0:
+            return
+
+        self._by_client.pop(id(entry.exchange), None)
+        await self._close_client(entry.exchange)
+
+    async def _enforce_max_size(self) -> None:
+        while len(self._entries) > self.max_size:
+            victim = next(
+                (e for e in self._entries.values() if e.leases == 0), None
+            )
+            if victim is None:
+                return
+            logger.info(f"♻️ Evicting LRU exchange client {victim.key[:2]}")
+            await self._discard(victim)
+
+    async def _reap_idle_clients(self) -> None:
+        interval = max(min(self.idle_ttl / 2, 60), 1)
+
+        while True:
+            await asyncio.sleep(interval)
+
+            cutoff = time.monotonic() - self.idle_ttl
+            idle = [
+                e
+                for e in self._entries.values()
+                if e.leases == 0 and e.last_used < cutoff
+            ]
+
+            for entry in idle:
+                logger.info(f"💤 Closing idle exchange client {entry.key[:2]}")
+                await self._discard(entry)
+
+            for key in [
+                k
+                for k, lock in self._locks.items()
+                if k not in self._entries and not lock.locked()
+            ]:
+                self._locks.pop(key, None)
+
+    @staticmethod
+    async def _close_client(exchange) -> None:
+        try:
+            await exchange.close()
+        except Exception as e:
+            logger.warning(f"Failed to close exchange client: {e}")
+
+
+# Singleton instance
+exchange_client_registry = ExchangeClientRegistry(
+    max_size=settings.EXCHANGE_CLIENT_POOL_MAX_SIZE,
+    idle_ttl=settings.EXCHANGE_CLIENT_IDLE_TTL,
+)
@@ -1,6 +1,15 @@
 import asyncio
+import hashlib
+import time
 import traceback
 import ccxt.async_support as ccxt_async
+from cachetools import TTLCache
+
+AUTH_PROBE_TTL = 86400  # seconds
+
+# Which Coinbase flavour authenticated a credential set, keyed by fingerprint:
+# {"flavour": "advanced" | "exchange_sandbox", "time_difference": ms, "probed_at": ts}
+_auth_probe_cache: TTLCache = TTLCache(maxsize=10_000, ttl=AUTH_PROBE_TTL)
 
 
 def clean_private_key(pem: str) -> str:
@@ -10,6 +19,147 @@ def clean_private_key(pem: str) -> str:
     return cleaned
 
 
+def credential_fingerprint(
+    api_key: str,
+    api_secret: str,
+    passphrase: str | None = None,
+) -> str:
+    """
+    Stable, non-reversible identifier for a set of exchange credentials.
+    Used as a cache key so plaintext secrets never end up in dict keys or logs.
+    """
+    digest = hashlib.sha256()
+    for part in (api_key, api_secret, passphrase or ""):
+        digest.update((part or "").strip().encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def build_balance_from_accounts(accounts: list) -> dict:
+    # Transform accounts into balance structure
+    balance = {"free": {}, "total": {}, "used": {}, "info": accounts}
+
+    for account in accounts:
+
+        print("🔍 Processing account:", account.get("code"))
+
+        currency_code = account["code"]
+
+        try:
+            free = float(account["info"]["available_balance"]["value"])
+            total = free
+
+            if (
+                "hold" in account["info"]
+                and "value" in account["info"]["hold"]
+            ):
+                total += float(account["info"]["hold"]["value"])
+
+            balance[currency_code] = {
+                "free": free,
+                "used": total - free,
+                "total": total,
+            }
+
+            balance["free"][currency_code] = free
+            balance["total"][currency_code] = total
+            balance["used"][currency_code] = total - free
+
+            print(
+                f"💰 {currency_code} → free={free}, total={total}"
+            )
+
+        except Exception as e:
+            print(
+                f"⚠️ Failed parsing account {currency_code}: {e}"
+            )
+
+    return balance
+
+
+def create_coinbase_sandbox_exchange(
+    api_key: str,
+    api_secret: str,
+    passphrase: str | None = None,
+):
+    """
+    Build the coinbaseexchange sandbox client used by the portfolio endpoints.
+    """
+    exchange = ccxt_async.coinbaseexchange(
+        {
+            "apiKey": api_key,
+            "secret": api_secret,
+            "password": passphrase,
+            "enableRateLimit": True,
+        }
+    )
+    exchange.set_sandbox_mode(True)
+    return exchange
+
+
+def _remember_auth_probe(exchange, fingerprint: str, flavour: str) -> None:
+    exchange._credential_fingerprint = fingerprint
+    _auth_probe_cache[fingerprint] = {
+        "flavour": flavour,
+        "time_difference": exchange.options.get("timeDifference", 0),
+        "probed_at": time.time(),
+    }
+
+
+def mark_auth_failed(exchange) -> None:
+    """
+    Forget the cached probe for this client's credentials so the next
+    get_working_coinbase_exchange() call probes again from scratch.
+    """
+    fingerprint = getattr(exchange, "_credential_fingerprint", None)
+    if fingerprint:
+        _auth_probe_cache.pop(fingerprint, None)
+    exchange._auth_failed = True
+
+
+def _build_from_auth_probe(probe: dict, api_key, api_secret, passphrase):
+    if probe["flavour"] == "advanced":
+        exchange = ccxt_async.coinbaseadvanced(
+            {
+                "apiKey": api_key.strip(),
+                "secret": clean_private_key(api_secret),
+                "enableRateLimit": True,
+                "options": {
+                    "adjustForTimeDifference": True,
+                    "createMarketBuyOrderRequiresPrice": True,
+                    "timeDifference": probe["time_difference"],
+                },
+            }
+        )
+    else:
+        exchange = create_coinbase_sandbox_exchange(
+            api_key.strip(), api_secret.strip(), (passphrase or "").strip()
+        )
+        exchange.options["timeDifference"] = probe["time_difference"]
+
+    return exchange
+
+
+async def fetch_coinbase_balance(exchange) -> dict:
+    """
+    Return the balance for an authenticated Coinbase client.
+
+    The balance captured during the authentication probe is handed out once;
+    later calls (pooled clients) fetch a fresh one so nobody trades on a stale
+    snapshot.
+    """
+    cached = getattr(exchange, "_cached_validation_balance", None)
+    if cached is not None:
+        del exchange._cached_validation_balance
+        return cached
+
+    if exchange.id == "coinbaseadvanced":
+        accounts = await exchange.fetch_accounts()
+        return build_balance_from_accounts(accounts)
+
+    return await exchange.fetch_balance()
+
+
 async def get_working_coinbase_exchange(
     api_key: str,
     api_secret: str,
@@ -22,6 +172,19 @@ async def get_working_coinbase_exchange(
     print("Passphrase exists:", bool(passphrase))
     print("==============================")
 
+    fingerprint = credential_fingerprint(api_key, api_secret, passphrase)
+
+    # Known-good flavour for these keys → skip the probing round trips.
+    # exchange_client_registry.release() reports auth failures via
+    # mark_auth_failed(), which re-enables probing.
+    probe = _auth_probe_cache.get(fingerprint)
+
+    if probe:
+        print(f"⚡ Using cached auth probe → {probe['flavour']}")
+        exchange = _build_from_auth_probe(probe, api_key, api_secret, passphrase)
+        exchange._credential_fingerprint = fingerprint
+        return exchange
+
     exchange = None
 
     try:
@@ -56,47 +219,12 @@ async def get_working_coinbase_exchange(
                 print("✅ Accounts received")
                 print("📦 Number of accounts:", len(accounts))
 
-                # Transform accounts into balance structure
-                balance = {"free": {}, "total": {}, "used": {}, "info": accounts}
-
-                for account in accounts:
-
-                    print("🔍 Processing account:", account.get("code"))
-
-                    currency_code = account["code"]
-
-                    try:
-                        free = float(account["info"]["available_balance"]["value"])
-                        total = free
-
-                        if (
-                            "hold" in account["info"]
-                            and "value" in account["info"]["hold"]
-                        ):
-                            total += float(account["info"]["hold"]["value"])
-
-                        balance[currency_code] = {
-                            "free": free,
-                            "used": total - free,
-                            "total": total,
-                        }
-
-                        balance["free"][currency_code] = free
-                        balance["total"][currency_code] = total
-                        balance["used"][currency_code] = total - free
-
-                        print(
-                            f"💰 {currency_code} → free={free}, total={total}"
-                        )
-
-                    except Exception as e:
-                        print(
-                            f"⚠️ Failed parsing account {currency_code}: {e}"
-                        )
+                balance = build_balance_from_accounts(accounts)
 
                 print("✅ Balance structure created")
 
                 exchange._cached_validation_balance = balance
+                _remember_auth_probe(exchange, fingerprint, "advanced")
 
                 print("🎉 Coinbase exchange authenticated successfully")
 
@@ -166,6 +294,7 @@ async def get_working_coinbase_exchange(
             print("✅ Balance fetched via fallback")
 
             exchange._cached_validation_balance = balance
+            _remember_auth_probe(exchange, fingerprint, "exchange_sandbox")
 
             return exchange
 
@@ -4,7 +4,7 @@
 import asyncio
 import functools
 import json
-import math
+import time
 import traceback
 from datetime import datetime, timedelta, timezone
 
@@ -12,28 +12,44 @@ from datetime import datetime, timedelta, timezone
 # Third-Party Imports
 # -----------------------------------------
 import ccxt.async_support as ccxt
-import numpy as np
 import pandas as pd
 from botocore.exceptions import ClientError
+from cryptography.exceptions import InvalidTag
 from fastapi import Depends, HTTPException
 from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.user import PortfolioSnapshot
 from app.auth.user import auth_user
-from app.coinbase.coinbase_cctx import get_working_coinbase_exchange
+from app.coinbase.client_registry import exchange_client_registry
+from app.coinbase.coinbase_cctx import fetch_coinbase_balance
+from app.coinbase.market_catalog import market_catalog
 
 # -----------------------------------------
 # Local Application Imports
 # -----------------------------------------
 from app.db.session import get_async_session
 from app.models.user import ExchangeOrder, User, UserExchange
-from app.security.kms_service import kms_service
+from app.security.credential_cache import credential_cache
+from app.security.envelope_service import envelope_service
+from app.security.kms_service import NotKMSCiphertextError, kms_service
+from app.services.candle_aggregator import candle_aggregator
+from app.services.candle_store import candle_store, timeframe_ms
+from app.services.lot_accounting import METHODS, USD_QUOTES, compute_positions
+from app.services.price_cache import price_cache
+from app.services.trade_ledger import trade_ledger
+from app.services.valuation_service import valuation_service
+from app.services.volatility import LOAD_CANDLES as VOLATILITY_LOAD_CANDLES
+from app.services.volatility import TIMEFRAME as VOLATILITY_TIMEFRAME
+from app.services.volatility import volatility_service
 
 TIMEFRAME_RULES = {
     "1m": {"tf": "1m", "max_days": 30},
+    "5m": {"tf": "5m", "max_days": 60},
     "15m": {"tf": "15m", "max_days": 90},
     "1h": {"tf": "1h", "max_days": 180},
+    "4h": {"tf": "4h", "max_days": 365},
     "1d": {"tf": "1d", "max_days": 365},
     "1w": {"tf": "1w", "max_days": 1095},
 }
@@ -123,16 +139,28 @@ async def validate_coinbase_api(api_key: str, api_secret: str, passphrase: str)
                 pass
 
 
-async def safe_decrypt(value: str | None) -> str | None:
+async def safe_decrypt(value: str | None, data_key: bytes | None = None) -> str | None:
     if not value:
         return None
 
+    # Envelope-encrypted field → local AES-GCM, no KMS round trip
+    if envelope_service.is_envelope(value):
+        # Raised as RuntimeError so get_keys reports it like a KMS failure
+        if data_key is None:
+            raise RuntimeError("envelope-encrypted field but no data key stored")
+        try:
+            return envelope_service.decrypt(value, data_key)
+        except (InvalidTag, ValueError) as e:
+            raise RuntimeError(f"envelope decrypt failed: {e!r}") from e
+
     try:
         # Try KMS decrypt
         return await kms_service.decrypt(value)
 
-    except Exception:
+    except NotKMSCiphertextError:
         # 🔥 NOT KMS ENCRYPTED → assume plaintext
+        # Any other KMS failure propagates: passing the ciphertext through
+        # as a credential would only fail later as an auth error
         return value
 
 
@@ -155,11 +183,38 @@ async def get_keys(
     if not ex:
         raise HTTPException(404, "No API keys found for this exchange")
 
+    credentials = credential_cache.get(ex)
+
+    if credentials is None:
+        try:
+            data_key = None
+            if any(
+                envelope_service.is_envelope(v)
+                for v in (ex.api_key, ex.api_secret, ex.passphrase)
+            ):
+                data_key = await envelope_service.get_data_key(db, ex.user_id)
+
+            # Cache miss → decrypt all three fields concurrently
+            api_key, api_secret, passphrase = await asyncio.gather(
+                safe_decrypt(ex.api_key, data_key),
+                safe_decrypt(ex.api_secret, data_key),
+                safe_decrypt(ex.passphrase, data_key),
+            )
+        except RuntimeError as e:
+            # Nothing is cached: the next request retries KMS
+            print(f"❌ Key decryption failed for user {user_id}: {e}")
+            raise HTTPException(503, "Could not decrypt exchange keys, please retry")
+
+        credentials = {
+            "api_key": api_key,
+            "api_secret": api_secret,
+            "passphrase": passphrase,
+        }
+        credential_cache.set(ex, credentials)
+
     return {
         "exchange": exchange_name,
-        "api_key": await safe_decrypt(ex.api_key),
-        "api_secret": await safe_decrypt(ex.api_secret),
-        "passphrase": await safe_decrypt(ex.passphrase),
+        **credentials,
         "created_at": ex.created_at,
     }
 
@@ -171,31 +226,21 @@ async def get_crypt_currencies(exchange_name: str, user, db):
         # 🔑 Get decrypted keys
         user_keys = await get_keys(exchange_name, user.id, db)
 
-        api_key = user_keys["api_key"]
-        secret = user_keys["api_secret"]
-        passphrase = user_keys["passphrase"]
-
-        # ✅ CCXT Coinbase Exchange
-        exchange = ccxt.coinbaseexchange(
-            {
-                "apiKey": api_key,
-                "secret": secret,
-                "password": passphrase,
-                "enableRateLimit": True,
-            }
+        # ✅ Pooled CCXT Coinbase Exchange (sandbox)
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, user_keys, flavour="sandbox"
         )
 
-        # ✅ Sandbox mode
-        exchange.set_sandbox_mode(True)
-
-        # ✅ Load markets
-        await exchange.load_markets()
+        # ✅ Shared market catalog
+        await market_catalog.attach(exchange)
 
         # 1️⃣ Fetch user balances (THIS decides which coins user owns)
         balance = await exchange.fetch_balance()
 
-        # 2️⃣ Fetch tickers once
-        tickers = await exchange.fetch_tickers()
+        # 2️⃣ Public prices from the shared cache (no user rate limit)
+        prices = await price_cache.get_many(
+            f"{c}/USD" for c, amt in balance["total"].items() if amt and amt > 0
+        )
 
         crypto_prices = []
 
@@ -219,11 +264,9 @@ async def get_crypt_currencies(exchange_name: str, user, db):
 
             # Crypto → USD
             else:
-                pair = f"{currency}/USD"
-                ticker = tickers.get(pair)
+                price = prices.get(f"{currency}/USD")
 
-                if ticker and ticker.get("last"):
-                    price = float(ticker["last"])
+                if price:
                     asset_data["price_usd"] = price
                     asset_data["usd_value"] = price * float(total_amount)
 
@@ -238,7 +281,7 @@ async def get_crypt_currencies(exchange_name: str, user, db):
 
     finally:
         if exchange:
-            await exchange.close()
+            await exchange_client_registry.release(exchange)
 
 
 async def user_portfolio_data(exchange_name: str, user, db):
@@ -248,25 +291,13 @@ async def user_portfolio_data(exchange_name: str, user, db):
         # 🔑 Get decrypted keys
         usr_keys = await get_keys(exchange_name, user.id, db)
 
-        api_key = usr_keys["api_key"]
-        secret = usr_keys["api_secret"]
-        passphrase = usr_keys["passphrase"]
-
-        # ✅ Correct CCXT exchange
-        exchange = ccxt.coinbaseexchange(
-            {
-                "apiKey": api_key,
-                "secret": secret,
-                "password": passphrase,
-                "enableRateLimit": True,
-            }
+        # ✅ Pooled CCXT exchange (sandbox mode is VERY IMPORTANT)
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, usr_keys, flavour="sandbox"
         )
 
-        # ✅ Sandbox mode (VERY IMPORTANT)
-        exchange.set_sandbox_mode(True)
-
-        # ✅ Load markets once
-        await exchange.load_markets()
+        # ✅ Shared market catalog (no per-request download)
+        await market_catalog.attach(exchange)
 
         # 1️⃣ Fetch balances (Retry mechanism for robust auth)
         balance = None
@@ -283,8 +314,10 @@ async def user_portfolio_data(exchange_name: str, user, db):
         assets = []
         total_usd_value = 0.0
 
-        # 2️⃣ Fetch tickers once
-        tickers = await exchange.fetch_tickers()
+        # 2️⃣ Public prices from the shared cache (no user rate limit)
+        prices = await price_cache.get_many(
+            f"{c}/USD" for c, amt in balance["total"].items() if amt and amt > 0
+        )
 
         # 3️⃣ Iterate only real balances
         for currency, data in balance["total"].items():
@@ -311,11 +344,9 @@ async def user_portfolio_data(exchange_name: str, user, db):
                 asset_data["usd_value"] = float(total_amount)
 
             else:
-                pair = f"{currency}/USD"
-                ticker = tickers.get(pair)
+                price = prices.get(f"{currency}/USD")
 
-                if ticker and ticker.get("last"):
-                    price = float(ticker["last"])
+                if price:
                     asset_data["usd_price"] = price
                     asset_data["usd_value"] = price * float(total_amount)
 
@@ -335,7 +366,7 @@ async def user_portfolio_data(exchange_name: str, user, db):
 
     finally:
         if exchange:
-            await exchange.close()
+            await exchange_client_registry.release(exchange)
 
 
 async def get_total_coin_value(exchange_name: str, user, db):
@@ -345,24 +376,12 @@ async def get_total_coin_value(exchange_name: str, user, db):
         # 🔑 Get decrypted keys
         usr_keys = await get_keys(exchange_name, user.id, db)
 
-        api_key = usr_keys["api_key"]
-        secret = usr_keys["api_secret"]
-        passphrase = usr_keys["passphrase"]
-
-        # ✅ Correct Coinbase Exchange
-        exchange = ccxt.coinbaseexchange(
-            {
-                "apiKey": api_key,
-                "secret": secret,
-                "password": passphrase,
-                "enableRateLimit": True,
-            }
+        # ✅ Pooled Coinbase Exchange (sandbox)
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, usr_keys, flavour="sandbox"
         )
 
-        # ✅ Sandbox mode
-        exchange.set_sandbox_mode(True)
-
-        await exchange.load_markets()
+        await market_catalog.attach(exchange)
 
         # Fetch balances (Retry wrapper)
         balance = None
@@ -375,7 +394,10 @@ async def get_total_coin_value(exchange_name: str, user, db):
                     await asyncio.sleep(1.0)
                     continue
                 raise e
-        tickers = await exchange.fetch_tickers()
+
+        prices = await price_cache.get_many(
+            f"{c}/USDC" for c, amt in balance["total"].items() if amt and amt > 0
+        )
 
         total_usd_value = 0.0
         currency_count = 0
@@ -389,11 +411,10 @@ async def get_total_coin_value(exchange_name: str, user, db):
             if currency == "USDC":
                 total_usd_value += float(amount)
             else:
-                pair = f"{currency}/USDC"
-                ticker = tickers.get(pair)
+                price = prices.get(f"{currency}/USDC")
 
-                if ticker and ticker.get("last"):
-                    total_usd_value += float(amount) * float(ticker["last"])
+                if price:
+                    total_usd_value += float(amount) * price
 
         return {
             "exchange": exchange_name,
@@ -403,7 +424,7 @@ async def get_total_coin_value(exchange_name: str, user, db):
 
     finally:
         if exchange:
-            await exchange.close()
+            await exchange_client_registry.release(exchange)
 
 
 async def get_total_account_value(exchange_name: str, user, db):
@@ -412,14 +433,8 @@ async def get_total_account_value(exchange_name: str, user, db):
     try:
         keys = await get_keys(exchange_name, user.id, db)
 
-        api_key = keys["api_key"]
-        api_secret = keys["api_secret"]
-        passphrase = keys.get("passphrase")
-
-        exchange = await get_working_coinbase_exchange(
-            api_key,
-            api_secret,
-            passphrase,
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, keys
         )
 
         if not exchange:
@@ -427,12 +442,8 @@ async def get_total_account_value(exchange_name: str, user, db):
 
         exchange.options["adjustForTimeDifference"] = True
 
-        if hasattr(exchange, "_cached_validation_balance"):
-            balance = exchange._cached_validation_balance
-            print("🔄 Using cached authentication balance…", balance)
-        else:
-            balance = await exchange.fetch_balance()
-            print("🔄 Testing authentication (fetch_balance)…", balance)
+        balance = await fetch_coinbase_balance(exchange)
+        print("🔄 Account balance…", balance)
 
         return balance
 
@@ -444,7 +455,7 @@ async def get_total_account_value(exchange_name: str, user, db):
     finally:
 
         if exchange:
-            await exchange.close()
+            await exchange_client_registry.release(exchange)
 
 
 async def fetch_all_orders(exchange_name: str, symbol: str, user, db):
@@ -452,13 +463,8 @@ async def fetch_all_orders(exchange_name: str, symbol: str, user, db):
 
     try:
         keys = await get_keys(exchange_name, user.id, db)
-        api_key = keys["api_key"]
-        api_secret = keys["api_secret"]
-        passphrase = keys.get("passphrase")
-        exchange = await get_working_coinbase_exchange(
-            api_key,
-            api_secret,
-            passphrase,
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, keys
         )
         if not exchange:
             raise RuntimeError("No valid Coinbase exchange found")
@@ -472,7 +478,7 @@ async def fetch_all_orders(exchange_name: str, symbol: str, user, db):
         raise
     finally:
         if exchange:
-            await exchange.close()
+            await exchange_client_registry.release(exchange)
 
 
 async def fetch_open_orders(exchange_name: str, symbol: str, user, db):
@@ -480,13 +486,8 @@ async def fetch_open_orders(exchange_name: str, symbol: str, user, db):
 
     try:
         keys = await get_keys(exchange_name, user.id, db)
-        api_key = keys["api_key"]
-        api_secret = keys["api_secret"]
-        passphrase = keys.get("passphrase")
-        exchange = await get_working_coinbase_exchange(
-            api_key,
-            api_secret,
-            passphrase,
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, keys
         )
         if not exchange:
             raise RuntimeError("No valid Coinbase exchange found")
@@ -500,7 +501,7 @@ async def fetch_open_orders(exchange_name: str, symbol: str, user, db):
         raise
     finally:
         if exchange:
-            await exchange.close()
+            await exchange_client_registry.release(exchange)
 
 
 async def fetch_close_orders(exchange_name: str, symbol: str, user, db):
@@ -508,13 +509,8 @@ async def fetch_close_orders(exchange_name: str, symbol: str, user, db):
 
     try:
         keys = await get_keys(exchange_name, user.id, db)
-        api_key = keys["api_key"]
-        api_secret = keys["api_secret"]
-        passphrase = keys.get("passphrase")
-        exchange = await get_working_coinbase_exchange(
-            api_key,
-            api_secret,
-            passphrase,
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, keys
         )
         if not exchange:
             raise RuntimeError("No valid Coinbase exchange found")
@@ -528,7 +524,7 @@ async def fetch_close_orders(exchange_name: str, symbol: str, user, db):
         raise
     finally:
         if exchange:
-            await exchange.close()
+            await exchange_client_registry.release(exchange)
 
 
 async def buy_sell_order_execution(
@@ -551,8 +547,8 @@ async def buy_sell_order_execution(
         keys = await get_keys(exchange_name, user.id, db)
         print("keys", keys)
 
-        exchange = await get_working_coinbase_exchange(
-            keys["api_key"], keys["api_secret"], keys.get("passphrase", "")
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, keys
         )
         print("exchange", exchange)
 
@@ -573,7 +569,7 @@ async def buy_sell_order_execution(
         if order_type == "limit" and limit_price is None:
             raise ValueError("price required for limit orders")
 
-        await exchange.load_markets()
+        await market_catalog.attach(exchange)
 
         # ─────────────────────────────────────────────
         # 2. Fetch ticker for market orders
@@ -586,11 +582,7 @@ async def buy_sell_order_execution(
         # ─────────────────────────────────────────────
         # 3. Balance-aware USD / USDC switching
         # ─────────────────────────────────────────────
-        balance = (
-            exchange._cached_validation_balance
-            if hasattr(exchange, "_cached_validation_balance")
-            else await exchange.fetch_balance()
-        )
+        balance = await fetch_coinbase_balance(exchange)
 
         base, quote = symbol.split("/")
 
@@ -727,94 +719,98 @@ async def buy_sell_order_execution(
 
     finally:
         if exchange:
-            await exchange.close()
+            await exchange_client_registry.release(exchange)
+
 
+async def get_profit_and_loss(
+    exchange_name: str, user, db: AsyncSession, method: str = "fifo"
+):
+    """
+    Realized and unrealized P&L per asset from the stored trade ledger,
+    matched with FIFO, LIFO or average cost (see app.services.lot_accounting).
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
 
-async def get_profit_and_loss(exchange_name: str, user, db: AsyncSession):
     exchange = None
 
     try:
         keys = await get_keys(exchange_name, user.id, db)
 
-        exchange = ccxt.coinbaseexchange(
-            {
-                "apiKey": keys["api_key"],
-                "secret": keys["api_secret"],
-                "password": keys["passphrase"],
-                "enableRateLimit": True,
-            }
+        # Same client as the dashboard, so the ledger only holds one account's fills
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, keys
         )
 
-        exchange.set_sandbox_mode(True)
-        await exchange.load_markets()
+        if not exchange:
+            raise RuntimeError("No valid Coinbase exchange found")
 
-        balance = await exchange.fetch_balance()
-        tickers = await exchange.fetch_tickers()
+        balance = await fetch_coinbase_balance(exchange)
+        held = [asset for asset, amount in balance["total"].items() if amount]
 
-        total_portfolio_value = 0.0
-        total_profit = 0.0
-        total_loss = 0.0
-        assets = []
+        try:
+            await trade_ledger.sync(db, user.id, exchange_name, exchange, held)
+        except Exception as e:
+            # Stale is better than nothing: report from the fills already stored
+            await db.rollback()
+            print(f"⚠️ Trade sync failed, using stored ledger: {e}")
 
-        for currency, qty in balance["total"].items():
-            if not qty or qty <= 0:
-                continue
+    finally:
+        if exchange:
+            await exchange_client_registry.release(exchange)
 
-            # USD stays USD
-            if currency == "USDC":
-                usd_value = float(qty)
-                total_portfolio_value += usd_value
-
-                assets.append(
-                    {
-                        "asset": currency,
-                        "quantity": float(qty),
-                        "usd_value": round(usd_value, 2),
-                    }
-                )
-                continue
+    rows = await trade_ledger.load_fill_rows(db, user.id, exchange_name)
 
-            pair = f"{currency}/USDC"
-            ticker = tickers.get(pair)
-            if not ticker or not ticker.get("last"):
-                continue
+    # CPU-bound for large histories; keep it off the event loop
+    positions = await run_in_threadpool(compute_positions, rows, method)
 
-            current_price = float(ticker["last"])
-            usd_value = current_price * float(qty)
-            total_portfolio_value += usd_value
+    prices = await price_cache.get_many(f"{asset}/USD" for asset in positions)
+    valuation = await valuation_service.value_balance(balance["total"])
 
-            # 🔥 BUY PRICE ASSUMPTION (Sandbox)
-            buy_price = current_price * 0.90
-            pnl = (current_price - buy_price) * float(qty)
+    total_realized = 0.0
+    total_unrealized = 0.0
+    total_profit = 0.0
+    total_loss = 0.0
+    assets = []
 
-            if pnl > 0:
-                total_profit += pnl
-            else:
-                total_loss += abs(pnl)
-
-            assets.append(
-                {
-                    "asset": currency,
-                    "quantity": float(qty),
-                    "buy_price": round(buy_price, 2),
-                    "current_price": round(current_price, 2),
-                    "usd_value": round(usd_value, 2),
-                    "profit_or_loss": round(pnl, 2),
-                }
-            )
+    for asset, position in positions.items():
+        current_price = prices.get(f"{asset}/USD")
+        unrealized = position.unrealized_pnl(current_price)
+        pnl = position.realized_pnl + unrealized
 
-        return {
-            "exchange": exchange_name,
-            "status": "Coinbase_Sandbox",
-            "total_portfolio_value_usd": round(total_portfolio_value, 2),
-            "total_profit": round(total_profit, 2),
-            "total_loss": round(total_loss, 2),
-            "assets": assets,
-        }
+        total_realized += position.realized_pnl
+        total_unrealized += unrealized
 
-    finally:
-        if exchange:
-            await exchange.close()
+        if pnl > 0:
+            total_profit += pnl
+        else:
+            total_loss += abs(pnl)
+
+        assets.append(
+            {
+                "asset": asset,
+                "quantity": position.quantity,
+                "avg_cost": round(position.avg_cost, 2),
+                "cost_basis": round(position.cost_basis, 2),
+                "current_price": round(current_price, 2) if current_price else None,
+                "usd_value": round(position.quantity * (current_price or 0.0), 2),
+                "realized_pnl": round(position.realized_pnl, 2),
+                "unrealized_pnl": round(unrealized, 2),
+                "profit_or_loss": round(pnl, 2),
+                "unmatched_sell_quantity": position.unmatched_sell_quantity,
+            }
+        )
+
+    return {
+        "exchange": exchange_name,
+        "method": method,
+        "total_portfolio_value_usd": round(valuation.total, 2),
+        "total_realized_pnl": round(total_realized, 2),
+        "total_unrealized_pnl": round(total_unrealized, 2),
+        "total_profit": round(total_profit, 2),
+        "total_loss": round(total_loss, 2),
+        "assets": assets,
+    }
 
 
 async def get_historical_data(
@@ -825,16 +821,6 @@ async def get_historical_data(
     symbol: str,
 ):
     target_symbol = CRYPTO_NAME_MAP.get(symbol.lower(), symbol.upper())
-    user_id = user.id
-    keys = await get_keys("coinbase", user_id, db)
-
-    exchange = ccxt.coinbaseexchange(
-        {
-            "apiKey": keys["api_key"],
-            "secret": keys["api_secret"],
-            "password": keys["passphrase"],
-        }
-    )
 
     if timeframe not in TIMEFRAME_RULES:
         raise HTTPException(400, "Invalid timeframe")
@@ -850,26 +836,10 @@ async def get_historical_data(
 
     since = int((datetime.utcnow() - timedelta(days=days)).timestamp() * 1000)
 
-    all_ohlcv = []
-    limit = 300
-    since_copy = since
-
-    while True:
-        ohlcv = await exchange.fetch_ohlcv(
-            target_symbol, timeframe=tf_rule["tf"], since=since_copy, limit=limit
-        )
-
-        if not ohlcv:
-            break
-
-        all_ohlcv.extend(ohlcv)
-        print(
-            f"Fetched {len(ohlcv)} candles, total so far: {len(all_ohlcv)}", all_ohlcv
-        )
-        since_copy = ohlcv[-1][0] + 1
-
-        if ohlcv[-1][0] >= exchange.milliseconds():
-            break
+    # Derived from stored history; only gaps and the live tail hit the exchange
+    all_ohlcv = await candle_aggregator.get_candles(
+        db, target_symbol, tf_rule["tf"], since
+    )
 
     df = pd.DataFrame(
         all_ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"]
@@ -888,9 +858,12 @@ async def get_historical_data(
 
 TIMEFRAME_CONFIG = {
     "1m": {"days": 1, "candle_minutes": 1},
+    "5m": {"days": 1, "candle_minutes": 5},
     "15m": {"days": 3, "candle_minutes": 15},
     "1h": {"days": 7, "candle_minutes": 60},
+    "4h": {"days": 30, "candle_minutes": 240},
     "1d": {"days": 30, "candle_minutes": 1440},
+    "1w": {"days": 730, "candle_minutes": 10080},
 }
 
 
@@ -905,7 +878,7 @@ async def fetch_from_binance(
     try:
         print("\n--- Trying exchange: binance ---")
 
-        await exchange.load_markets()
+        await market_catalog.attach(exchange)
 
         # Convert USD → USDT for Binance
         if target_symbol.endswith("/USD"):
@@ -938,53 +911,6 @@ async def fetch_from_binance(
         print("binance connection closed")
 
 
-async def fetch_from_exchange(
-    exchange_class,
-    target_symbol,
-    timeframe,
-    since_timestamp,
-    limit,
-    keys,
-):
-    exchange = exchange_class(
-        {
-            "apiKey": keys["api_key"],
-            "secret": keys["api_secret"],
-            "password": keys.get("passphrase"),
-            "enableRateLimit": True,
-        }
-    )
-
-    try:
-        print(f"\n--- Trying exchange: {exchange_class.__name__} ---")
-
-        await exchange.load_markets()
-
-        if target_symbol not in exchange.symbols:
-            print(f"❌ {target_symbol} not supported on {exchange_class.__name__}")
-            return []
-
-        print(f"✅ {target_symbol} supported on {exchange_class.__name__}")
-
-        candles = await exchange.fetch_ohlcv(
-            target_symbol,
-            timeframe=timeframe,
-            since=since_timestamp,
-            limit=limit,
-        )
-
-        print(f"📊 Candles received: {len(candles)}")
-        return candles
-
-    except Exception as e:
-        print(f"❌ Error from {exchange_class.__name__}: {str(e)}")
-        return []
-
-    finally:
-        await exchange.close()
-        print(f"{exchange_class.__name__} connection closed")
-
-
 async def get_historical_ohlc_data(
     user,
     timeframe: str,
@@ -1006,12 +932,8 @@ async def get_historical_ohlc_data(
     target_symbol = CRYPTO_NAME_MAP.get(symbol.lower(), symbol.upper())
     print("Mapped symbol:", target_symbol)
 
-    keys = await get_keys("coinbase", user.id, db)
-
     # 🔒 Clamp timestamp safely
-    temp_exchange = ccxt.coinbaseexchange()
-    now = temp_exchange.milliseconds()
-    await temp_exchange.close()
+    now = int(datetime.now(timezone.utc).timestamp() * 1000)
 
     if before:
         print("Before param:", before)
@@ -1030,15 +952,14 @@ async def get_historical_ohlc_data(
     print("Since timestamp:", since_timestamp)
     print("Limit:", limit)
 
-    # 🔥 Try primary exchange first
-    candles = await fetch_from_exchange(
-        ccxt.coinbaseexchange,
-        target_symbol,
-        timeframe,
-        since_timestamp,
-        limit,
-        keys,
-    )
+    # 🔥 Primary: bars resampled from stored Coinbase history
+    try:
+        candles = await candle_aggregator.get_candles(
+            db, target_symbol, timeframe, since_timestamp, until_timestamp
+        )
+    except Exception as e:
+        print(f"❌ Candle store error: {str(e)}")
+        candles = []
 
     # 🔁 Fallback if no data
     if not candles:
@@ -1087,52 +1008,20 @@ async def get_historical_ohlc_data(
     }
 
 
-async def get_volatility_data(symbol: str, user, db):
-
-    keys = await get_keys("coinbase", user.id, db)
-
-    exchange = ccxt.coinbaseexchange(
-        {
-            "apiKey": keys["api_key"],
-            "secret": keys["api_secret"],
-            "password": keys["passphrase"],
-            "enableRateLimit": True,
-        }
-    )
-
+async def get_volatility_data(symbol: str, db):
     symbol = CRYPTO_NAME_MAP.get(symbol)
 
-    # fetch 30 days of 1h candles → 720 candles
-    ohlcv = await exchange.fetch_ohlcv(symbol, timeframe="1h", limit=720)
-    await exchange.close()
-
-    if not ohlcv or len(ohlcv) < 2:
-        return {"symbol": symbol, "latest": None, "data": []}
-
-    closes = [c[4] for c in ohlcv]
-    timestamps = [c[0] for c in ohlcv]
-
-    prices = np.array(closes)
-
-    volatility_points = []
-
-    # Compute volatility for every candle (cumulative)
-    for i in range(2, len(prices)):  # start from index 2 because diff needs 2 points
-        window = prices[:i]
+    async def load_ohlcv():
+        # Public candles from the shared store; the open hour is the last one
+        step = timeframe_ms(VOLATILITY_TIMEFRAME)
+        now = int(time.time() * 1000)
+        since = now - now % step - (VOLATILITY_LOAD_CANDLES - 1) * step
 
-        log_returns = np.diff(np.log(window))
-
-        vol = np.std(log_returns) * math.sqrt(365 * 24)
-
-        volatility_points.append(
-            {"timestamp": timestamps[i], "volatility": round(float(vol), 6)}
+        return await candle_store.get_candles(
+            db, symbol, VOLATILITY_TIMEFRAME, since
         )
 
-    return {
-        "symbol": symbol,
-        "latest": volatility_points[-1]["volatility"],
-        "data": volatility_points,
-    }
+    return await volatility_service.get(symbol, load_ohlcv)
 
 
 async def fetch_orderbook_async(symbol: str, user=None, db=None):
@@ -1152,95 +1041,52 @@ async def fetch_orderbook_async(symbol: str, user=None, db=None):
 async def get_real_profit_loss(
     exchange_name: str, user, db: AsyncSession, base_currency="USD"
 ):
-    try:
-        exchange = None
-
-        keys = await get_keys(exchange_name, user.id, db)
-
-        exchange = ccxt.coinbaseexchange(
-            {
-                "apiKey": keys["api_key"],
-                "secret": keys["api_secret"],
-                "password": keys["passphrase"],
-                "enableRateLimit": True,
-            }
-        )
-
-        balance = exchange.fetch_balance()
-        holdings = {curr: amt for curr, amt in balance["total"].items() if amt > 0}
-        total_portfolio_value = 0.0
-        portfolio_value_24h_ago = 0.0
-
-        for currency, amount in holdings.items():
-            total_portfolio_value += amount
-            portfolio_value_24h_ago += amount
-            continue
-
-        symbol = f"{currency}/{base_currency}"
+    """
+    Portfolio-level P/L summary on top of FIFO lot accounting.
+    Only USD-equivalent quotes are supported as `base_currency`.
+    """
+    if base_currency not in USD_QUOTES:
+        raise ValueError("Only USD-quoted P/L is supported")
+
+    pnl = await get_profit_and_loss(exchange_name, user, db, method="fifo")
+
+    total_portfolio_value = pnl["total_portfolio_value_usd"]
+    total_cost_basis = sum(asset["cost_basis"] for asset in pnl["assets"])
+    total_pl = pnl["total_realized_pnl"] + pnl["total_unrealized_pnl"]
+    total_pl_percentage = (
+        (total_pl / total_cost_basis) * 100 if total_cost_basis > 0 else 0
+    )
 
-        try:
-            # Fetch 24h ticker data
-            ticker = exchange.fetch_ticker(symbol)
-            current_price = ticker["last"]
-            open_price = ticker["open"]
-            total_portfolio_value += amount * current_price
-            if open_price:
-                portfolio_value_24h_ago += amount * open_price
-            else:
-                # Fallback if 'open' isn't provided by the exchange
-                portfolio_value_24h_ago += amount * current_price
-        except ccxt.BadSymbol:
-            print(f"Skipping {symbol} - not found on Coinbase.")
-        except Exception as e:
-            print(f"Error fetching ticker for {symbol}: {e}")
-        pl_24h = total_portfolio_value - portfolio_value_24h_ago
-        pl_24h_percentage = (
-            (pl_24h / portfolio_value_24h_ago) * 100
-            if portfolio_value_24h_ago > 0
-            else 0
+    # Snapshots are periodic: take the one taken closest to 24h ago
+    # (created_at is naive UTC)
+    target = datetime.utcnow() - timedelta(hours=24)
+    result = await db.execute(
+        select(PortfolioSnapshot.portfolio_value)
+        .where(PortfolioSnapshot.user_id == user.id)
+        .order_by(
+            func.abs(func.extract("epoch", PortfolioSnapshot.created_at - target))
         )
+        .limit(1)
+    )
+    portfolio_value_24h_ago = result.scalar_one_or_none() or total_portfolio_value
 
-        total_cost_basis = 0.0
-        for currency in holdings.keys():
-            if currency == base_currency:
-                continue
-
-            symbol = f"{currency}/{base_currency}"
-            try:
-                # Fetch historical trades for this specific pair
-                trades = exchange.fetch_my_trades(symbol)
-
-                for trade in trades:
-                    if trade["side"] == "buy":
-                        # Cost includes the fee
-                        total_cost_basis += trade["cost"]
-                    elif trade["side"] == "sell":
-                        # Deduct proportional cost (simplified average method)
-                        # More complex FIFO logic is needed for strict accounting
-                        total_cost_basis -= trade["cost"]
-
-            except Exception as e:
-                print(f"Could not fetch trades for {symbol}: {e}")
-
-            # 4. Calculate Total P/L
-            total_pl = total_portfolio_value - total_cost_basis
-            total_pl_percentage = (
-                (total_pl / total_cost_basis) * 100 if total_cost_basis > 0 else 0
-            )
-
-            return {
-                "Total Portfolio Value": round(total_portfolio_value, 2),
-                "P/L 24h ($)": round(pl_24h, 2),
-                "P/L 24h (%)": round(pl_24h_percentage, 2),
-                "Cost Basis": round(total_cost_basis, 2),
-                "Total P/L ($)": round(total_pl, 2),
-                "Total P/L (%)": round(total_pl_percentage, 2),
-            }
+    pl_24h = total_portfolio_value - portfolio_value_24h_ago
+    pl_24h_percentage = (
+        (pl_24h / portfolio_value_24h_ago) * 100
+        if portfolio_value_24h_ago > 0
+        else 0
+    )
 
-    except ccxt.NetworkError as e:
-        print(f"Network error: {e}")
-    except ccxt.ExchangeError as e:
-        print(f"Exchange error: {e}")
+    return {
+        "Total Portfolio Value": round(total_portfolio_value, 2),
+        "P/L 24h ($)": round(pl_24h, 2),
+        "P/L 24h (%)": round(pl_24h_percentage, 2),
+        "Cost Basis": round(total_cost_basis, 2),
+        "Realized P/L ($)": round(pnl["total_realized_pnl"], 2),
+        "Unrealized P/L ($)": round(pnl["total_unrealized_pnl"], 2),
+        "Total P/L ($)": round(total_pl, 2),
+        "Total P/L (%)": round(total_pl_percentage, 2),
+    }
 
 
 async def calculate_dashboard(exchange_name: str, user, db: AsyncSession):
@@ -1267,22 +1113,19 @@ async def calculate_dashboard(exchange_name: str, user, db: AsyncSession):
         # ---------------- EXCHANGE CONNECTION ----------------
         print("\n🌐 STEP 3: Creating Coinbase exchange instance")
 
-        exchange = await get_working_coinbase_exchange(
-            keys["api_key"],
-            keys["api_secret"],
-            keys.get("passphrase", "")
+        exchange = await exchange_client_registry.acquire(
+            user.id, exchange_name, keys
         )
 
-        print("✅ Exchange instance created")
+        if not exchange:
+            raise RuntimeError("No valid Coinbase exchange found")
 
-        # ---------------- BALANCE FETCH ----------------
-        print("\n💰 STEP 4: Fetching cached balance from exchange")
+        print("✅ Exchange instance ready")
 
-        balance = getattr(exchange, "_cached_validation_balance", None)
+        # ---------------- BALANCE FETCH ----------------
+        print("\n💰 STEP 4: Fetching balance from exchange")
 
-        if not balance:
-            print("❌ ERROR: Balance cache missing")
-            raise Exception("Balance cache missing")
+        balance = await fetch_coinbase_balance(exchange)
 
         print("Balance keys:", list(balance.keys()))
 
@@ -1291,88 +1134,39 @@ async def calculate_dashboard(exchange_name: str, user, db: AsyncSession):
         print("\n📦 STEP 5: Assets detected in account")
         print(total_assets_balance)
 
-        STABLE_COINS = {"USDC", "USDT"}
-
-        portfolio_value = 0.0
         total_cost_basis = 0.0
-        asset_breakdown = {}
-        asset_amount = {}
 
         # ---------------- ASSET PROCESSING ----------------
-        print("\n📦 STEP 6: Processing assets for portfolio value")
-
-        for asset, amount in total_assets_balance.items():
-
-            print("\n----------------------------------")
-            print(f"➡️ Processing Asset: {asset}")
-            print("Amount:", amount)
-
-            if amount == 0:
-                print("⏭ Skipping asset with zero balance")
-                continue
-
-            if asset in STABLE_COINS:
-                print("💵 Stable coin detected")
-                usd_value = amount
-                print("USD value =", usd_value)
-
-            else:
-                symbol = f"{asset}/USD"
-                print("📈 Market symbol:", symbol)
-
-                try:
-                    print("📡 Fetching ticker...")
-                    ticker = await exchange.fetch_ticker(symbol)
+        print("\n📦 STEP 6: Pricing assets from the shared price cache")
 
-                    price = ticker["last"]
+        valuation = await valuation_service.value_balance(total_assets_balance)
 
-                    print("Market price:", price)
+        for asset in valuation.unpriced:
+            print(f"⚠️ No price for {asset}/USD, skipping")
 
-                    usd_value = amount * price
-
-                    print("Calculated USD value:", usd_value)
-
-                except Exception as e:
-                    print(f"⚠️ Failed to fetch ticker for {symbol}")
-                    print("Error:", e)
-                    continue
-
-            portfolio_value += usd_value
-
-            asset_breakdown[asset] = round(usd_value, 2)
-            asset_amount[asset] = amount
-
-            print("✔ Asset processed successfully")
+        portfolio_value = valuation.total
+        asset_breakdown = {
+            asset: round(value, 2) for asset, value in valuation.values.items()
+        }
+        asset_amount = valuation.amounts
 
         print("\n📊 STEP 7: Portfolio value calculated")
         print("Portfolio Value:", portfolio_value)
 
-        # ---------------- TRADE HISTORY (UPDATED LOGIC) ----------------
-        print("\n📑 STEP 8: Fetching ALL trade history for cost basis")
+        # ---------------- TRADE HISTORY (INCREMENTAL LEDGER) ----------------
+        print("\n📑 STEP 8: Syncing new trades into the ledger for cost basis")
 
         try:
-            trades = await exchange.fetch_my_trades()
-
-            print("Total trades returned:", len(trades))
-
-            for i, trade in enumerate(trades):
-
-                print("\n----------------------------------")
-                print(f"Trade #{i+1}")
-                print("Trade object:", trade)
-
-                side = trade.get("side")
-                cost = trade.get("cost")
-
-                print("Side:", side)
-                print("Cost:", cost)
+            trade_state = await trade_ledger.sync(
+                db, user.id, exchange_name, exchange, asset_amount
+            )
+            total_cost_basis = trade_state.total_buy_cost
 
-                if side == "buy" and cost:
-                    print("➕ Adding cost to cost_basis:", cost)
-                    total_cost_basis += cost
+            print("Trades in ledger:", trade_state.trade_count)
 
         except Exception as e:
-            print("⚠️ Failed to fetch trades")
+            await db.rollback()
+            print("⚠️ Failed to sync trades")
             print("Error:", e)
 
         print("\n💵 STEP 9: Total cost basis calculated")
@@ -1434,5 +1228,5 @@ async def calculate_dashboard(exchange_name: str, user, db: AsyncSession):
     finally:
 
         if exchange:
-            print("\n🔌 Closing exchange connection")
-            await exchange.close()
+            print("\n🔌 Releasing exchange connection")
+            await exchange_client_registry.release(exchange)
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import time
+
+import ccxt.async_support as ccxt
+
+from app.core.config import get_settings
+from app.core.redis import redis_client
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "market_catalog"
+
+# Catalogs warmed from Redis / the exchange on startup
+PRELOADED_CATALOGS = [
+    ("coinbaseadvanced", False),
+    ("coinbaseexchange", True),
+]
+
+
+def catalog_key(exchange_id: str, sandbox: bool) -> str:
+    return f"{exchange_id}:{'sandbox' if sandbox else 'live'}"
+
+
+class MarketCatalog:
+    """
+    Process-level cache of ccxt market/currency metadata.
+
+    The product catalog is downloaded once per (exchange id, sandbox) pair,
+    refreshed in the background every `ttl` seconds and injected into every
+    ccxt instance through `attach()`, which replaces `load_markets()`.
+    Catalogs are optionally persisted to Redis so a cold worker starts warm.
+    """
+
+    def __init__(self, ttl: int, persist: bool = True):
+        self.ttl = ttl
+        self.persist = persist
+        self._catalogs: dict[str, dict] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._refresh_task: asyncio.Task | None = None
+
+    async def attach(self, exchange) -> dict:
+        """
+        Give `exchange` the shared markets, loading them on first use.
+        Safe to call on pooled clients: markets are only re-injected when the
+        shared catalog was refreshed since the last attach.
+        """
+        sandbox = bool(getattr(exchange, "isSandboxModeEnabled", False))
+        key = catalog_key(exchange.id, sandbox)
+
+        catalog = self._catalogs.get(key)
+
+        if catalog is None:
+            catalog = await self._load(key, exchange)
+
+        if getattr(exchange, "_market_catalog_loaded_at", None) != catalog["loaded_at"]:
+            exchange.set_markets(catalog["markets"], catalog["currencies"])
+            exchange._market_catalog_loaded_at = catalog["loaded_at"]
+
+        return exchange.markets
+
+    def start(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    # ===============================
+    # LOADING
+    # ===============================
+
+    async def _load(self, key: str, exchange) -> dict:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            catalog = self._catalogs.get(key)
+            if catalog:
+                return catalog
+
+            catalog = await self._read_redis(key)
+
+            if catalog is None:
+                logger.info(f"📦 Loading market catalog for {key}")
+                await exchange.load_markets()
+                catalog = self._snapshot(exchange)
+                await self._write_redis(key, catalog)
+
+            self._catalogs[key] = catalog
+            return catalog
+
+    async def refresh(self, exchange_id: str, sandbox: bool) -> dict | None:
+        """Reload one catalog with a public (unauthenticated) client."""
+        key = catalog_key(exchange_id, sandbox)
+        exchange = getattr(ccxt, exchange_id)({"enableRateLimit": True})
+
+        try:
+            if sandbox:
+                exchange.set_sandbox_mode(True)
+
+            await exchange.load_markets(reload=True)
+            catalog = self._snapshot(exchange)
+
+        except Exception as e:
+            logger.warning(f"⚠️ Market catalog refresh failed for {key}: {e}")
+            return None
+
+        finally:
+            await exchange.close()
+
+        self._catalogs[key] = catalog
+        await self._write_redis(key, catalog)
+
+        logger.info(f"🔄 Market catalog refreshed for {key}: {len(catalog['markets'])} markets")
+
+        return catalog
+
+    async def _refresh_loop(self) -> None:
+        # Warm start: persisted catalogs first, exchange only when missing
+        for exchange_id, sandbox in PRELOADED_CATALOGS:
+            key = catalog_key(exchange_id, sandbox)
+            catalog = await self._read_redis(key)
+
+            if catalog:
+                self._catalogs.setdefault(key, catalog)
+            else:
+                await self.refresh(exchange_id, sandbox)
+
+        while True:
+            await asyncio.sleep(self.ttl)
+
+            for key in list(self._catalogs):
+                exchange_id, mode = key.split(":")
+                await self.refresh(exchange_id, mode == "sandbox")
+
+    @staticmethod
+    def _snapshot(exchange) -> dict:
+        return {
+            "markets": exchange.markets,
+            "currencies": exchange.currencies,
+            "loaded_at": time.time(),
+        }
+
+    # ===============================
+    # REDIS PERSISTENCE
+    # ===============================
+
+    async def _read_redis(self, key: str) -> dict | None:
+        if not self.persist:
+            return None
+
+        try:
+            raw = await redis_client.get(f"{REDIS_KEY_PREFIX}:{key}")
+        except Exception as e:
+            logger.warning(f"⚠️ Market catalog Redis read failed: {e}")
+            return None
+
+        if not raw:
+            return None
+
+        catalog = json.loads(raw)
+
+        if time.time() - catalog["loaded_at"] > self.ttl * 2:
+            return None
+
+        return catalog
+
+    async def _write_redis(self, key: str, catalog: dict) -> None:
+        if not self.persist:
+            return
+
+        try:
+            await redis_client.setex(
+                f"{REDIS_KEY_PREFIX}:{key}",
+                self.ttl * 2,
+                json.dumps(catalog, default=str),
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Market catalog Redis write failed: {e}")
+
+
+# Singleton instance
+market_catalog = MarketCatalog(
+    ttl=settings.MARKET_CATALOG_TTL,
+    persist=settings.MARKET_CATALOG_PERSIST_REDIS,
+)
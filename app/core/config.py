@@ -61,6 +61,15 @@ class AppSettings(BaseSettings):
     AWS_REGION: str
     AWS_ACCESS_KEY_ID: str
     AWS_SECRET_ACCESS_KEY: str
+    AWS_BACKEND: str = "aws"  # "aws" or "local" (offline stub)
+    AWS_EXECUTOR_MAX_WORKERS: int = 16
+    AWS_MAX_CONCURRENCY: int = 64
+    CREDENTIAL_CACHE_TTL: int = 300  # seconds decrypted keys stay in memory
+    CREDENTIAL_CACHE_MAX_SIZE: int = 1000
+    # "kms" (one KMS ciphertext per field) or "envelope" (per-user data key);
+    # opt in to "envelope" once reencrypt_exchange_keys has migrated the rows
+    EXCHANGE_KEY_ENCRYPTION: str = "kms"
+    DATA_KEY_CACHE_TTL: int = 300  # seconds unwrapped data keys stay in memory
 
     # --- Crypto / Market APIs (Old) ---
     COINGECKO_MARKETS_URL: str
@@ -75,6 +84,33 @@ class AppSettings(BaseSettings):
     COINBASE_API_PASSPHRASE_ENC: str | None = None
     COINBASE_EXCHANGE_SANDBOX: bool = False
     COINGECKO_PRO_API_KEY: str
+
+    # --- Exchange Client Pool ---
+    EXCHANGE_CLIENT_POOL_MAX_SIZE: int = 500
+    EXCHANGE_CLIENT_IDLE_TTL: int = 300  # seconds
+
+    # --- Market Catalog ---
+    MARKET_CATALOG_TTL: int = 3600  # seconds
+    MARKET_CATALOG_PERSIST_REDIS: bool = True
+
+    # --- Market Data WebSocket ---
+    MARKET_WS_CONNECTIONS: int = 2  # upstream sockets shared by all symbols
+    SYMBOL_LEASE_TTL: int = 15  # seconds before a dead owner's symbols move
+    BROADCAST_QUEUE_SIZE: int = 32  # per-client messages buffered before dropping
+    WS_OUTBOX_DEPTH: int = 64  # pending outbound messages per session
+    WS_SLOW_CLIENT_DROP_LIMIT: int = 1000  # overflow drops before eviction
+    WS_SEND_TIMEOUT: float = 10.0  # seconds a single send may block
+    LIVE_PRICE_MAX_AGE: float = 60.0  # seconds a cached price is trusted
+    PRICE_CACHE_REFRESH_INTERVAL: int = 30  # seconds between bulk REST refreshes
+
+    # --- OHLCV History ---
+    OHLCV_BACKFILL_CONCURRENCY: int = 8  # candle pages in flight per process
+    OHLCV_REQUEST_RATE: float = 8.0  # request weight per second (public limit is 10)
+    OHLCV_REQUEST_BURST: int = 10  # weight that may be spent at once
+    OHLCV_BASE_MAX_DAYS: int = 7  # longest span resampled from 1m candles
+    OHLCV_RESAMPLE_CACHE_TTL: int = 30  # seconds a derived series is reused
+    OHLCV_RESAMPLE_CACHE_SIZE: int = 1000
+
     # --- CoinMarketCap APIs (New) ---
     CMC_DETAIL_URL: str = (
         "https://api.coinmarketcap.com/data-api/v3/cryptocurrency/detail"
@@ -92,6 +128,12 @@ class AppSettings(BaseSettings):
         "1M": 21600,
         "1Y": 86400,
     }
+    DASHBOARD_CONCURRENCY: int = 10  # dashboards computed at once per process
+    DASHBOARD_REFRESH_JITTER: float = 0.5  # fraction of a user's slot
+    PRESENCE_TTL: int = 45  # seconds a dashboard heartbeat counts as present
+    DASHBOARD_RECENT_WINDOW: int = 7 * 86400  # "recently active" look-back
+    DASHBOARD_RECENT_REFRESH: int = 300  # seconds, recently active users
+    DASHBOARD_IDLE_REFRESH: int = 3600  # seconds, everyone else
 
 
 def get_settings() -> AppSettings:
@@ -20,6 +20,8 @@ from app.api.exchange_routers import router as exchange_routers
 from app.api.payment_routes import router as payment_router
 from app.api.router import router as api_router
 from app.api.settings_routers import settings_router
+from app.coinbase.client_registry import exchange_client_registry
+from app.coinbase.market_catalog import market_catalog
 from app.core import events
 from app.core.config import get_settings
 from app.core.exception_handlers import (
@@ -27,11 +29,20 @@ from app.core.exception_handlers import (
     custom_http_exception_handler,
 )
 from app.db.session import engine
+from app.security.aws_executor import aws_executor
+from app.services.candle_store import candle_store
+from app.services.price_cache import price_cache
+from app.services.volatility import volatility_service
 from app.websocket.background.top10_listener import (
     stop_top10_listener,
     top10_coinbase_listener,
 )
+from app.websocket.background.candle_builder import candle_builder
 from app.websocket.background.dashboard_worker import dashboard_worker
+from app.websocket.background.market_data_hub import market_data_hub
+from app.websocket.background.order_book_publisher import order_book_leases
+from app.websocket.background.symbol_leases import symbol_leases
+from app.websocket.broadcaster import broadcaster
 from app.services.background.portfolio_snapshot_worker import portfolio_snapshot_worker
 
 # from app.api.websocket_routers import coinbase_ws_listener
@@ -76,6 +87,25 @@ def create_app() -> FastAPI:
         logger.info("Application startup initiated")
         logger.warning(" STARTUP EVENT TRIGGERED")
 
+        # Reaper for idle pooled exchange clients
+        exchange_client_registry.start()
+
+        # Shared market metadata, refreshed in the background
+        market_catalog.start()
+
+        # Shared public prices (streamed ticks + bulk REST refresh)
+        price_cache.start()
+
+        # Volatility series kept current from streamed candles
+        volatility_service.start()
+
+        # Cluster-wide ownership of upstream symbol streams
+        symbol_leases.start()
+        order_book_leases.start()
+
+        # Live 1s/1m bars for the symbols this process streams
+        candle_builder.start()
+
         # app.state.coinbase_ws_task = asyncio.create_task(coinbase_ws_listener())
         asyncio.create_task(top10_coinbase_listener())
         logger.warning(" COINBASE WS TASK CREATED")
@@ -114,6 +144,11 @@ def create_app() -> FastAPI:
         # call optional project-specific shutdown hook
         logger.info("Application shutdown initiated")
         await stop_top10_listener()
+        await symbol_leases.stop()
+        await order_book_leases.stop()
+        await candle_builder.stop()
+        await market_data_hub.stop()
+        await broadcaster.stop()
 
         dashboard_task = getattr(app.state, "dashboard_task", None)
 
@@ -133,6 +168,15 @@ def create_app() -> FastAPI:
             except asyncio.CancelledError:
                 logger.info("Snapshot worker cancelled successfully")
 
+        # Close pooled exchange clients (aiohttp sessions)
+        await exchange_client_registry.close_all()
+        await market_catalog.stop()
+        await price_cache.stop()
+        await candle_store.close()
+        volatility_service.stop()
+
+        # Blocking boto3 calls run on a dedicated pool
+        aws_executor.shutdown()
         
         if hasattr(events, "shutdown") and callable(events.shutdown):
             res = events.shutdown()
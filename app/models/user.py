@@ -3,9 +3,9 @@ from datetime import datetime
 from email.policy import default
 
 from passlib.context import CryptContext
-from sqlalchemy import Boolean, Column, DateTime
+from sqlalchemy import JSON, BigInteger, Boolean, Column, DateTime
 from sqlalchemy import Enum as SAEnum
-from sqlalchemy import Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Float, ForeignKey, Integer, String, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 # Import Base from your shared base file, not from declarative_base()
@@ -166,6 +166,23 @@ class UserExchange(Base):
     user = relationship("User", back_populates="exchange_accounts")
 
 
+class UserDataKey(Base):
+    """KMS-wrapped AES-256 data key used to envelope-encrypt a user's exchange keys."""
+
+    __tablename__ = "user_data_keys"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+        index=True,
+    )
+    encrypted_key = Column(Text, nullable=False)  # base64 KMS CiphertextBlob
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class ExchangeOrder(Base):
     __tablename__ = "exchange_orders"
 
@@ -202,4 +219,98 @@ class PortfolioSnapshot(Base):
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     portfolio_value = Column((Float),nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UserTrade(Base):
+    """One fill from the exchange, stored once (deduplicated by trade id)."""
+
+    __tablename__ = "user_trades"
+    __table_args__ = (
+        UniqueConstraint("user_id", "exchange_name", "trade_id", name="uq_user_trade"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    exchange_name = Column(String(50), nullable=False)
+    trade_id = Column(String(255), nullable=False)
+    order_id = Column(String(255), nullable=True)
+
+    symbol = Column(String(20), nullable=False)
+    side = Column(String(10), nullable=False)
+    amount = Column(Float, nullable=False)
+    price = Column(Float, nullable=False)
+    cost = Column(Float, nullable=True)
+    fee_cost = Column(Float, nullable=True)
+    fee_currency = Column(String(20), nullable=True)
+
+    timestamp = Column(BigInteger, nullable=False, index=True)  # exchange time, ms
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TradeSyncState(Base):
+    """Per user/exchange cursor for trade ingestion plus running aggregates."""
+
+    __tablename__ = "trade_sync_state"
+    __table_args__ = (
+        UniqueConstraint("user_id", "exchange_name", name="uq_trade_sync_state"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    exchange_name = Column(String(50), nullable=False)
+
+    last_timestamp = Column(BigInteger, nullable=True)  # newest stored trade, ms
+    # Per-symbol exchanges: symbol -> ms up to which its fills were fetched
+    symbol_cursors = Column(JSON, nullable=True)
+    trade_count = Column(Integer, default=0, nullable=False)
+    total_buy_cost = Column(Float, default=0.0, nullable=False)
+
+    synced_at = Column(DateTime, nullable=True)
+
+
+class OHLCVCandle(Base):
+    """One closed exchange candle. Closed candles never change once stored."""
+
+    __tablename__ = "ohlcv_candles"
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange_name", "symbol", "timeframe", "timestamp", name="uq_ohlcv_candle"
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    exchange_name = Column(String(50), nullable=False)
+    symbol = Column(String(20), nullable=False)
+    timeframe = Column(String(10), nullable=False)
+
+    timestamp = Column(BigInteger, nullable=False)  # candle open, ms
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=False)
+
+
+class OHLCVCoverage(Base):
+    """Contiguous [start_ts, end_ts) range of closed candles already stored."""
+
+    __tablename__ = "ohlcv_coverage"
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange_name", "symbol", "timeframe", name="uq_ohlcv_coverage"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    exchange_name = Column(String(50), nullable=False)
+    symbol = Column(String(20), nullable=False)
+    timeframe = Column(String(10), nullable=False)
+
+    start_ts = Column(BigInteger, nullable=False)
+    end_ts = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
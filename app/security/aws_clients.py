@@ -0,0 +1,144 @@
+import base64
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+
+import boto3
+from botocore.exceptions import ClientError
+from cryptography.fernet import Fernet, InvalidToken
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+LOCAL_CIPHERTEXT_PREFIX = b"local-kms:"
+
+
+def _client_error(code: str, message: str, operation: str) -> dict:
+    return {"Error": {"Code": code, "Message": message}}, operation
+
+
+class LocalKMSClient:
+    """
+    Offline stand-in for the boto3 KMS client (AWS_BACKEND=local).
+    Ciphertexts are Fernet tokens derived from SECRET_KEY — for development
+    and tests only, never for production data.
+    """
+
+    def __init__(self, key_id: str):
+        self.key_id = key_id
+        seed = hashlib.sha256(f"{settings.SECRET_KEY}:{key_id}".encode()).digest()
+        self._fernet = Fernet(base64.urlsafe_b64encode(seed))
+
+    def encrypt(self, KeyId: str, Plaintext: bytes, **kwargs) -> dict:
+        token = self._fernet.encrypt(Plaintext)
+        return {"CiphertextBlob": LOCAL_CIPHERTEXT_PREFIX + token, "KeyId": KeyId}
+
+    def decrypt(self, CiphertextBlob: bytes, **kwargs) -> dict:
+        if not CiphertextBlob.startswith(LOCAL_CIPHERTEXT_PREFIX):
+            raise ClientError(
+                *_client_error(
+                    "InvalidCiphertextException", "Not a local ciphertext", "Decrypt"
+                )
+            )
+
+        try:
+            plaintext = self._fernet.decrypt(
+                CiphertextBlob[len(LOCAL_CIPHERTEXT_PREFIX):]
+            )
+        except InvalidToken:
+            raise ClientError(
+                *_client_error(
+                    "InvalidCiphertextException", "Invalid local ciphertext", "Decrypt"
+                )
+            )
+
+        return {"Plaintext": plaintext, "KeyId": self.key_id}
+
+    def generate_data_key(self, KeyId: str, KeySpec: str = "AES_256", **kwargs) -> dict:
+        plaintext = os.urandom(32)
+        return {
+            "Plaintext": plaintext,
+            "CiphertextBlob": self.encrypt(KeyId=KeyId, Plaintext=plaintext)[
+                "CiphertextBlob"
+            ],
+            "KeyId": KeyId,
+        }
+
+
+class _LocalSecretsExceptions:
+    class ResourceNotFoundException(ClientError):
+        def __init__(self, operation: str = "GetSecretValue"):
+            super().__init__(
+                *_client_error(
+                    "ResourceNotFoundException", "Secret not found", operation
+                )
+            )
+
+
+class LocalSecretsManagerClient:
+    """In-memory stand-in for the boto3 Secrets Manager client (AWS_BACKEND=local)."""
+
+    exceptions = _LocalSecretsExceptions
+
+    def __init__(self):
+        self._secrets: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _arn(self, name: str) -> str:
+        return f"arn:local:secretsmanager:{settings.AWS_REGION}:000000000000:secret:{name}"
+
+    def create_secret(self, Name: str, SecretString: str, **kwargs) -> dict:
+        with self._lock:
+            self._secrets[Name] = {
+                "SecretString": SecretString,
+                "CreatedDate": datetime.now(timezone.utc),
+            }
+        return {"ARN": self._arn(Name), "Name": Name}
+
+    def update_secret(self, SecretId: str, SecretString: str, **kwargs) -> dict:
+        with self._lock:
+            if SecretId not in self._secrets:
+                raise self.exceptions.ResourceNotFoundException("UpdateSecret")
+            self._secrets[SecretId]["SecretString"] = SecretString
+        return {"ARN": self._arn(SecretId), "Name": SecretId}
+
+    def get_secret_value(self, SecretId: str, **kwargs) -> dict:
+        with self._lock:
+            secret = self._secrets.get(SecretId)
+        if secret is None:
+            raise self.exceptions.ResourceNotFoundException("GetSecretValue")
+        return {"ARN": self._arn(SecretId), "SecretString": secret["SecretString"]}
+
+    def delete_secret(self, SecretId: str, **kwargs) -> dict:
+        with self._lock:
+            if self._secrets.pop(SecretId, None) is None:
+                raise self.exceptions.ResourceNotFoundException("DeleteSecret")
+        return {"ARN": self._arn(SecretId), "Name": SecretId}
+
+    def describe_secret(self, SecretId: str, **kwargs) -> dict:
+        with self._lock:
+            if SecretId not in self._secrets:
+                raise self.exceptions.ResourceNotFoundException("DescribeSecret")
+        return {"ARN": self._arn(SecretId), "Name": SecretId}
+
+
+def create_aws_client(service_name: str):
+    """
+    Build the client for `service_name` ("kms" or "secretsmanager") according
+    to AWS_BACKEND: real boto3 clients for "aws", in-process stubs for "local".
+    """
+    if settings.AWS_BACKEND == "local":
+        if service_name == "kms":
+            return LocalKMSClient(settings.KMS_KEY_ID)
+        if service_name == "secretsmanager":
+            return LocalSecretsManagerClient()
+        raise ValueError(f"No local stub for AWS service: {service_name}")
+
+    return boto3.client(
+        service_name,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_REGION,
+    )
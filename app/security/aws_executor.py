@@ -0,0 +1,81 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class AwsCallExecutor:
+    """
+    Runs blocking boto3 calls off the event loop.
+
+    Calls go through a dedicated, bounded thread pool so AWS latency never
+    stalls uvicorn (WebSocket fan-out included) and never starves the default
+    executor. A semaphore caps how many calls may be queued or running at once.
+    """
+
+    def __init__(self, max_workers: int, max_concurrency: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="aws-call"
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._metrics = {
+            "calls": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "waiting": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+        }
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+
+        self._metrics["waiting"] += 1
+        async with self._semaphore:
+            self._metrics["waiting"] -= 1
+            self._metrics["in_flight"] += 1
+            started = time.perf_counter()
+
+            try:
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(fn, *args, **kwargs)
+                )
+            except Exception:
+                self._metrics["errors"] += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                self._metrics["in_flight"] -= 1
+                self._metrics["calls"] += 1
+                self._metrics["total_seconds"] += elapsed
+                self._metrics["max_seconds"] = max(
+                    self._metrics["max_seconds"], elapsed
+                )
+
+    def stats(self) -> dict:
+        calls = self._metrics["calls"]
+        return {
+            **self._metrics,
+            "avg_seconds": self._metrics["total_seconds"] / calls if calls else 0.0,
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    def shutdown(self) -> None:
+        logger.info(f"🛑 Shutting down AWS executor: {self.stats()}")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton instance
+aws_executor = AwsCallExecutor(
+    max_workers=settings.AWS_EXECUTOR_MAX_WORKERS,
+    max_concurrency=settings.AWS_MAX_CONCURRENCY,
+)
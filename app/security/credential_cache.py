@@ -0,0 +1,53 @@
+import hashlib
+
+from cachetools import TTLCache
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class CredentialCache:
+    """
+    Short-lived, size-bounded cache of decrypted exchange credentials.
+
+    Entries are keyed by UserExchange.id plus a hash of the stored
+    ciphertexts, so re-encrypted or rotated keys never hit a stale entry.
+    Plaintext only lives in process memory and expires after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: int, max_size: int):
+        self._cache: TTLCache = TTLCache(maxsize=max_size, ttl=ttl)
+
+    @staticmethod
+    def _key(user_exchange) -> tuple:
+        digest = hashlib.sha256()
+        for value in (
+            user_exchange.api_key,
+            user_exchange.api_secret,
+            user_exchange.passphrase,
+        ):
+            digest.update((value or "").encode("utf-8"))
+            digest.update(b"\x00")
+        return user_exchange.id, digest.hexdigest()
+
+    def get(self, user_exchange) -> dict | None:
+        return self._cache.get(self._key(user_exchange))
+
+    def set(self, user_exchange, credentials: dict) -> None:
+        self._cache[self._key(user_exchange)] = credentials
+
+    def invalidate(self, user_exchange_id: int) -> None:
+        """Wipe every cached entry for a UserExchange row (call on update/delete)."""
+        for key in [k for k in list(self._cache.keys()) if k[0] == user_exchange_id]:
+            self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# Singleton instance
+credential_cache = CredentialCache(
+    ttl=settings.CREDENTIAL_CACHE_TTL,
+    max_size=settings.CREDENTIAL_CACHE_MAX_SIZE,
+)
@@ -0,0 +1,110 @@
+import asyncio
+import base64
+import os
+
+from cachetools import TTLCache
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import get_settings
+from app.models.user import UserDataKey
+from app.security.kms_service import kms_service
+
+settings = get_settings()
+
+ENVELOPE_PREFIX = "env1:"
+NONCE_SIZE = 12
+
+
+class EnvelopeEncryptionService:
+    """
+    Envelope encryption for stored exchange credentials.
+
+    Each user owns one KMS-wrapped AES-256 data key (user_data_keys table).
+    Fields are encrypted locally with AES-GCM and stored as
+    "env1:<base64(nonce || ciphertext)>", so reading them needs at most one
+    KMS call per user per DATA_KEY_CACHE_TTL instead of one per field.
+    """
+
+    def __init__(self, cache_ttl: int, max_size: int = 10_000):
+        self._data_keys: TTLCache = TTLCache(maxsize=max_size, ttl=cache_ttl)
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    @staticmethod
+    def is_envelope(value: str | None) -> bool:
+        return bool(value) and value.startswith(ENVELOPE_PREFIX)
+
+    async def get_data_key(
+        self, db: AsyncSession, user_id: int, create: bool = False
+    ) -> bytes | None:
+        """
+        Return the user's plaintext data key, unwrapping it through KMS on a
+        cache miss. With create=True a new key is generated and added to the
+        session (committed by the caller) when the user has none yet.
+        """
+        data_key = self._data_keys.get(user_id)
+        if data_key is not None:
+            return data_key
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+
+        try:
+            async with lock:
+                data_key = self._data_keys.get(user_id)
+                if data_key is not None:
+                    return data_key
+
+                row = await self._load_row(db, user_id)
+
+                if row is None and create:
+                    # Not cached until committed: a rolled-back key must never be reused
+                    data_key, wrapped = await kms_service.generate_data_key()
+                    result = await db.execute(
+                        insert(UserDataKey)
+                        .values(user_id=user_id, encrypted_key=wrapped)
+                        .on_conflict_do_nothing(index_elements=["user_id"])
+                        .returning(UserDataKey.id)
+                    )
+                    if result.scalar_one_or_none() is not None:
+                        return data_key
+
+                    # Another session created the key first: use that one
+                    row = await self._load_row(db, user_id)
+
+                if row is None:
+                    return None
+
+                data_key = await kms_service.decrypt_data_key(row.encrypted_key)
+                self._data_keys[user_id] = data_key
+                return data_key
+        finally:
+            self._locks.pop(user_id, None)
+
+    @staticmethod
+    async def _load_row(db: AsyncSession, user_id: int) -> UserDataKey | None:
+        result = await db.execute(
+            select(UserDataKey).where(UserDataKey.user_id == user_id)
+        )
+        return result.scalar_one_or_none()
+
+    def encrypt(self, value: str | None, data_key: bytes) -> str | None:
+        if not value:
+            return None
+
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = AESGCM(data_key).encrypt(nonce, value.encode("utf-8"), None)
+        return ENVELOPE_PREFIX + base64.b64encode(nonce + ciphertext).decode()
+
+    def decrypt(self, value: str, data_key: bytes) -> str:
+        raw = base64.b64decode(value[len(ENVELOPE_PREFIX):])
+        nonce, ciphertext = raw[:NONCE_SIZE], raw[NONCE_SIZE:]
+        return AESGCM(data_key).decrypt(nonce, ciphertext, None).decode("utf-8")
+
+    def forget(self, user_id: int) -> None:
+        self._data_keys.pop(user_id, None)
+
+
+# Singleton instance
+envelope_service = EnvelopeEncryptionService(cache_ttl=settings.DATA_KEY_CACHE_TTL)
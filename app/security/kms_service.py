@@ -1,21 +1,22 @@
 import base64
+import binascii
 
-import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
 from app.core.config import get_settings
+from app.security.aws_clients import create_aws_client
+from app.security.aws_executor import aws_executor
 
 settings = get_settings()
 
 
+class NotKMSCiphertextError(ValueError):
+    """The value is not a KMS ciphertext at all (e.g. a legacy plaintext field)."""
+
+
 class KMSService:
     def __init__(self):
-        self.client = boto3.client(
-            "kms",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION,
-        )
+        self.client = create_aws_client("kms")
         self.key_id = settings.KMS_KEY_ID
 
     # async def encrypt(self, value: str) -> str:
@@ -33,20 +34,60 @@ class KMSService:
             return None  # 👈 VERY IMPORTANT
 
         try:
-            encrypted = self.client.encrypt(
-                KeyId=self.key_id, Plaintext=value.encode("utf-8")
+            encrypted = await aws_executor.run(
+                self.client.encrypt,
+                KeyId=self.key_id,
+                Plaintext=value.encode("utf-8"),
             )
             return base64.b64encode(encrypted["CiphertextBlob"]).decode()
         except (BotoCoreError, ClientError) as e:
             raise RuntimeError(f"KMS encryption failed: {e}")
 
     async def decrypt(self, encrypted_value: str) -> str:
+        """
+        Raises NotKMSCiphertextError when KMS rejects the value as a
+        ciphertext, RuntimeError for every other failure (throttling,
+        network, permissions) so callers never mistake one for the other.
+        """
         try:
             decoded = base64.b64decode(encrypted_value)
-            decrypted = self.client.decrypt(CiphertextBlob=decoded)
+        except (binascii.Error, ValueError):
+            raise NotKMSCiphertextError("Value is not base64")
+
+        try:
+            decrypted = await aws_executor.run(
+                self.client.decrypt, CiphertextBlob=decoded
+            )
             return decrypted["Plaintext"].decode()
-        except (BotoCoreError, ClientError) as e:
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "InvalidCiphertextException":
+                raise NotKMSCiphertextError(str(e))
             raise RuntimeError(f"KMS decryption failed: {e}")
+        except BotoCoreError as e:
+            raise RuntimeError(f"KMS decryption failed: {e}")
+
+    async def generate_data_key(self) -> tuple[bytes, str]:
+        """
+        Create a fresh AES-256 data key.
+        Returns (plaintext key, base64 KMS-wrapped key).
+        """
+        try:
+            response = await aws_executor.run(
+                self.client.generate_data_key, KeyId=self.key_id, KeySpec="AES_256"
+            )
+            wrapped = base64.b64encode(response["CiphertextBlob"]).decode()
+            return response["Plaintext"], wrapped
+        except (BotoCoreError, ClientError) as e:
+            raise RuntimeError(f"KMS data key generation failed: {e}")
+
+    async def decrypt_data_key(self, wrapped_key: str) -> bytes:
+        try:
+            response = await aws_executor.run(
+                self.client.decrypt, CiphertextBlob=base64.b64decode(wrapped_key)
+            )
+            return response["Plaintext"]
+        except (BotoCoreError, ClientError) as e:
+            raise RuntimeError(f"KMS data key decryption failed: {e}")
 
 
 # Singleton instance
@@ -6,7 +6,9 @@ from sqlalchemy import select
 from app.db.session import AsyncSessionLocal
 from app.models.user import User,PortfolioSnapshot
 from app.coinbase.exchange import get_keys
-from app.coinbase.coinbase_cctx import get_working_coinbase_exchange
+from app.coinbase.client_registry import exchange_client_registry
+from app.coinbase.coinbase_cctx import fetch_coinbase_balance
+from app.services.valuation_service import valuation_service
 
 logger = logging.getLogger(__name__)
 
@@ -44,41 +46,28 @@ async def portfolio_snapshot_worker():
                             print(f"No exchange keys for user {user.id}")
                             continue
 
-                        exchange = await get_working_coinbase_exchange(
-                            keys["api_key"],
-                            keys["api_secret"],
-                            keys.get("passphrase", ""),
+                        exchange = await exchange_client_registry.acquire(
+                            user.id, "coinbase", keys
                         )
 
-                        balance = getattr(
-                            exchange,
-                            "_cached_validation_balance",
-                            None,
-                        )
-
-                        if not balance:
+                        if not exchange:
                             continue
 
-                        total_assets_balance = balance["total"]
-
-                        STABLE_COINS = {"USDC", "USDT"}
-
-                        portfolio_value = 0.0
-
-                        for asset, amount in total_assets_balance.items():
+                        balance = await fetch_coinbase_balance(exchange)
 
-                            if amount == 0:
-                                continue
+                        if not balance:
+                            continue
 
-                            if asset in STABLE_COINS:
-                                usd_value = amount
-                            else:
-                                symbol = f"{asset}/USD"
+                        valuation = await valuation_service.value_balance(
+                            balance["total"]
+                        )
 
-                                ticker = await exchange.fetch_ticker(symbol)
-                                usd_value = amount * ticker["last"]
+                        # A partial value would skew tomorrow's 24h P/L
+                        if valuation.unpriced:
+                            print(f"Unpriced assets for user {user.id}: {valuation.unpriced}")
+                            continue
 
-                            portfolio_value += usd_value
+                        portfolio_value = valuation.total
 
                         snapshot = PortfolioSnapshot(
                             user_id=user.id,
@@ -90,9 +79,15 @@ async def portfolio_snapshot_worker():
                     except Exception as e:
                         print(f"Error processing user {user.id}: {e}")
 
+                        if exchange:
+                            # Released while the error is still being handled,
+                            # so the registry sees a rejected key
+                            await exchange_client_registry.release(exchange)
+                            exchange = None
+
                     finally:
                         if exchange:
-                            await exchange.close()
+                            await exchange_client_registry.release(exchange)
 
                 await db.commit()
 
@@ -0,0 +1,127 @@
+import logging
+import time
+
+import pandas as pd
+from cachetools import TTLCache
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.services.candle_store import candle_store, timeframe_ms
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+# Granularities Coinbase serves directly
+NATIVE_TIMEFRAMES = ("1m", "5m", "15m", "1h", "6h", "1d")
+BASE_TIMEFRAME = "1m"
+
+# Weekly bars open on Monday 00:00 UTC (the epoch was a Thursday)
+WEEK_MS = 7 * 86400 * 1000
+WEEK_ORIGIN = 4 * 86400 * 1000
+
+
+def resample(candles: list[list], step: int) -> list[list]:
+    """Aggregate time-ordered candles into `step`-ms bars."""
+    if not candles:
+        return []
+
+    df = pd.DataFrame(candles, columns=COLUMNS)
+    df["volume"] = df["volume"].fillna(0.0)
+
+    origin = WEEK_ORIGIN if step == WEEK_MS else 0
+    bucket = df["timestamp"] - (df["timestamp"] - origin) % step
+
+    bars = df.groupby(bucket, sort=True).agg(
+        open=("open", "first"),
+        high=("high", "max"),
+        low=("low", "min"),
+        close=("close", "last"),
+        volume=("volume", "sum"),
+    )
+
+    return [
+        [int(ts), o, h, low, c, v]
+        for ts, o, h, low, c, v in zip(
+            bars.index.tolist(),
+            bars["open"].tolist(),
+            bars["high"].tolist(),
+            bars["low"].tolist(),
+            bars["close"].tolist(),
+            bars["volume"].tolist(),
+        )
+    ]
+
+
+def base_timeframe(timeframe: str, span_ms: int) -> str:
+    """
+    1m for spans up to OHLCV_BASE_MAX_DAYS, so every intraday zoom level
+    shares one stored history; beyond that the coarsest native granularity
+    that divides `timeframe` (1h for 4h, 1d for 1w, itself when native).
+    """
+    if span_ms <= settings.OHLCV_BASE_MAX_DAYS * 86400 * 1000:
+        return BASE_TIMEFRAME
+
+    step = timeframe_ms(timeframe)
+    divisors = [tf for tf in NATIVE_TIMEFRAMES if step % timeframe_ms(tf) == 0]
+    return max(divisors, key=timeframe_ms)
+
+
+class CandleAggregator:
+    """
+    Chart candles for any timeframe, derived from the candle store.
+
+    Bars are resampled server-side from a stored base timeframe instead of
+    fetching each timeframe from the exchange; derived series are cached
+    for `ttl` seconds per (symbol, timeframe, range).
+    """
+
+    def __init__(self, ttl: int, max_size: int):
+        self._cache: TTLCache = TTLCache(maxsize=max_size, ttl=ttl)
+        self._metrics = {"hits": 0, "misses": 0}
+
+    async def get_candles(
+        self,
+        db: AsyncSession,
+        symbol: str,
+        timeframe: str,
+        since: int,
+        until: int | None = None,
+    ) -> list[list]:
+        step = timeframe_ms(timeframe)
+        now = int(time.time() * 1000)
+
+        origin = WEEK_ORIGIN if step == WEEK_MS else 0
+        since -= (since - origin) % step
+        # `end` goes up to a bar boundary too, so requests ending "now" share
+        # one key for the whole bar instead of missing on every millisecond
+        end = min(until or now, now)
+        end += -(end - origin) % step
+
+        key = (symbol, timeframe, since, end)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._metrics["hits"] += 1
+            return cached
+
+        self._metrics["misses"] += 1
+
+        base = base_timeframe(timeframe, end - since)
+        candles = await candle_store.get_candles(db, symbol, base, since, end)
+
+        if base != timeframe:
+            candles = resample(candles, step)
+
+        self._cache[key] = candles
+        return candles
+
+    def stats(self) -> dict:
+        return {**self._metrics, "series": len(self._cache)}
+
+
+# Singleton instance
+candle_aggregator = CandleAggregator(
+    ttl=settings.OHLCV_RESAMPLE_CACHE_TTL,
+    max_size=settings.OHLCV_RESAMPLE_CACHE_SIZE,
+)
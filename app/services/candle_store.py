@@ -0,0 +1,270 @@
+import logging
+import time
+
+import ccxt.async_support as ccxt
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.coinbase.market_catalog import market_catalog
+from app.models.user import OHLCVCandle, OHLCVCoverage
+from app.services.ohlcv_backfill import ohlcv_backfill
+
+logger = logging.getLogger(__name__)
+
+EXCHANGE_ID = "coinbaseexchange"
+INSERT_CHUNK = 1000
+
+
+def timeframe_ms(timeframe: str) -> int:
+    return int(ccxt.Exchange.parse_timeframe(timeframe) * 1000)
+
+
+class CandleStore:
+    """
+    Postgres-backed OHLCV history.
+
+    Closed candles are fetched from Coinbase's public API once and stored;
+    OHLCVCoverage records the contiguous range already stored per
+    (symbol, timeframe). A request only fetches what lies outside that
+    range: the gap before it, and the tail after it up to now; a request
+    far away from it is fetched on its own without moving it. The newest
+    two candles (open, and just closed but possibly still revised) are
+    returned from that tail without being stored or counted as covered.
+    """
+
+    def __init__(self, exchange_id: str = EXCHANGE_ID):
+        self.exchange_id = exchange_id
+        self._exchange = None
+
+    async def get_candles(
+        self,
+        db: AsyncSession,
+        symbol: str,
+        timeframe: str,
+        since: int,
+        until: int | None = None,
+    ) -> list[list]:
+        """[timestamp, open, high, low, close, volume] rows in [since, until)."""
+        step = timeframe_ms(timeframe)
+        now = int(time.time() * 1000)
+        # The open candle and the one just closed may still be revised by
+        # the exchange: both are returned but never stored
+        settled = now - now % step - step
+
+        until = min(until or now + 1, now + 1)
+        since -= since % step
+        until += -until % step  # align up so the candle holding `until` is kept
+
+        if since >= until:
+            return []
+
+        # Plain read, and the transaction ends before any network call: the
+        # coverage row is only locked again to record what was fetched
+        coverage = await self._get_coverage(db, symbol, timeframe, since)
+        cov_start, cov_end = coverage.start_ts, coverage.end_ts
+        await db.commit()
+
+        if max(since - cov_end, cov_start - until) > until - since:
+            # Far from the stored range: bridging the gap costs more than the
+            # request itself, so serve it directly and leave coverage alone
+            candles = await self._fetch_range(symbol, timeframe, since, until)
+            await self._store(db, symbol, timeframe, candles, settled)
+            return [c for c in candles if c[0] < until]
+
+        missing = []
+        if cov_start > since:
+            missing.append((since, cov_start))
+        if until > cov_end:
+            missing.append((cov_end, until))
+
+        covered_until = max(cov_end, min(until, settled))
+        live = []
+
+        if missing:
+            fetched = []
+            for start, end in missing:
+                fetched.extend(await self._fetch_range(symbol, timeframe, start, end))
+
+            closed = [c for c in fetched if c[0] < covered_until]
+            live = [c for c in fetched if c[0] >= covered_until]
+
+            try:
+                coverage = await self._lock_coverage(db, symbol, timeframe)
+                await self._insert(db, symbol, timeframe, closed)
+                # Coverage only grows and the fetch touched the range read
+                # above, so the union with the current row is contiguous
+                coverage.start_ts = min(coverage.start_ts, since)
+                coverage.end_ts = max(coverage.end_ts, covered_until)
+                logger.info(
+                    f"🕯️ Candle store {symbol} {timeframe}: fetched {len(missing)} range(s), "
+                    f"covered {coverage.start_ts}..{coverage.end_ts}"
+                )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+        stored = await self._load(
+            db, symbol, timeframe, since, min(until, covered_until)
+        )
+        return stored + sorted(c for c in live if c[0] < until)
+
+    async def append(
+        self,
+        db: AsyncSession,
+        symbol: str,
+        timeframe: str,
+        candles: list[list],
+        complete_from: int | None,
+    ) -> None:
+        """
+        Store closed candles built elsewhere (the live candle builder).
+        `complete_from` is the time from which the caller saw every trade
+        (None if unknown); when stored coverage already reaches it, coverage
+        is extended over the new candles so later reads skip the REST tail
+        for them.
+        """
+        if not candles:
+            return
+
+        step = timeframe_ms(timeframe)
+        coverage = await self._lock_coverage(db, symbol, timeframe)
+        await self._insert(db, symbol, timeframe, candles)
+
+        if coverage and complete_from is not None and coverage.end_ts >= complete_from:
+            coverage.end_ts = max(coverage.end_ts, max(c[0] for c in candles) + step)
+
+        await db.commit()
+
+    async def close(self) -> None:
+        exchange, self._exchange = self._exchange, None
+        if exchange:
+            await exchange.close()
+
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    async def _client(self):
+        if self._exchange is None:
+            # Candles are public: one unauthenticated client for everyone.
+            # Request pacing is done by ohlcv_backfill's shared budget.
+            self._exchange = getattr(ccxt, self.exchange_id)({"enableRateLimit": False})
+        await market_catalog.attach(self._exchange)
+        return self._exchange
+
+    def _coverage_key(self, symbol: str, timeframe: str) -> dict:
+        return {
+            "exchange_name": self.exchange_id,
+            "symbol": symbol,
+            "timeframe": timeframe,
+        }
+
+    async def _get_coverage(
+        self, db: AsyncSession, symbol: str, timeframe: str, since: int
+    ) -> OHLCVCoverage:
+        key = self._coverage_key(symbol, timeframe)
+
+        await db.execute(
+            insert(OHLCVCoverage)
+            .values(**key, start_ts=since, end_ts=since)
+            .on_conflict_do_nothing(constraint="uq_ohlcv_coverage")
+        )
+
+        result = await db.execute(select(OHLCVCoverage).filter_by(**key))
+        return result.scalar_one()
+
+    async def _lock_coverage(
+        self, db: AsyncSession, symbol: str, timeframe: str
+    ) -> OHLCVCoverage | None:
+        # Held only for the insert and the coverage update, never across fetches
+        result = await db.execute(
+            select(OHLCVCoverage)
+            .filter_by(**self._coverage_key(symbol, timeframe))
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+
+    async def _store(
+        self,
+        db: AsyncSession,
+        symbol: str,
+        timeframe: str,
+        candles: list[list],
+        settled: int,
+    ) -> None:
+        try:
+            await self._insert(
+                db, symbol, timeframe, [c for c in candles if c[0] < settled]
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+    async def _fetch_range(
+        self, symbol: str, timeframe: str, start: int, end: int
+    ) -> list[list]:
+        exchange = await self._client()
+        return await ohlcv_backfill.fetch(
+            exchange, symbol, timeframe, start, end, timeframe_ms(timeframe)
+        )
+
+    async def _insert(
+        self, db: AsyncSession, symbol: str, timeframe: str, candles: list[list]
+    ) -> None:
+        rows = {
+            c[0]: {
+                "exchange_name": self.exchange_id,
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "timestamp": int(c[0]),
+                "open": c[1],
+                "high": c[2],
+                "low": c[3],
+                "close": c[4],
+                "volume": c[5] or 0.0,
+            }
+            for c in candles
+        }
+        rows = list(rows.values())
+
+        # Chunked to stay under the driver's bind-parameter limit
+        for i in range(0, len(rows), INSERT_CHUNK):
+            await db.execute(
+                insert(OHLCVCandle)
+                .values(rows[i:i + INSERT_CHUNK])
+                .on_conflict_do_nothing(constraint="uq_ohlcv_candle")
+            )
+
+    async def _load(
+        self, db: AsyncSession, symbol: str, timeframe: str, since: int, until: int
+    ) -> list[list]:
+        if since >= until:
+            return []
+
+        result = await db.execute(
+            select(
+                OHLCVCandle.timestamp,
+                OHLCVCandle.open,
+                OHLCVCandle.high,
+                OHLCVCandle.low,
+                OHLCVCandle.close,
+                OHLCVCandle.volume,
+            )
+            .where(
+                OHLCVCandle.exchange_name == self.exchange_id,
+                OHLCVCandle.symbol == symbol,
+                OHLCVCandle.timeframe == timeframe,
+                OHLCVCandle.timestamp >= since,
+                OHLCVCandle.timestamp < until,
+            )
+            .order_by(OHLCVCandle.timestamp)
+        )
+        return [list(row) for row in result.all()]
+
+
+# Singleton instance
+candle_store = CandleStore()
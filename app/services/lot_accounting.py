@@ -0,0 +1,164 @@
+"""
+Lot accounting over stored fills.
+
+Trades are grouped per base asset (USD/USDC/USDT quotes only) and matched
+with FIFO, LIFO or average cost. FIFO is fully vectorized: with spot
+holdings the n-th unit sold is always the n-th unit bought, so the cost
+of everything sold is a lookup on the cumulative-cost-vs-cumulative-
+quantity curve of the buys (np.interp), once each sell is clipped to the
+units bought before it. LIFO and average cost depend on the order of buys
+and sells and use a single O(n) pass.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+METHODS = ("fifo", "lifo", "average")
+USD_QUOTES = {"USD", "USDC", "USDT"}
+
+
+@dataclass
+class AssetPosition:
+    asset: str
+    quantity: float  # units still held according to the trades
+    cost_basis: float  # cost of those units
+    realized_pnl: float
+    unmatched_sell_quantity: float = 0.0  # sells without recorded buys
+
+    @property
+    def avg_cost(self) -> float:
+        return self.cost_basis / self.quantity if self.quantity > 0 else 0.0
+
+    def unrealized_pnl(self, price: float | None) -> float:
+        if price is None or self.quantity <= 0:
+            return 0.0
+        return self.quantity * price - self.cost_basis
+
+
+def trade_arrays(rows) -> dict[str, dict[str, np.ndarray]]:
+    """
+    Group (symbol, side, amount, price, cost, fee_cost, fee_currency) rows,
+    already in time order, into per-asset arrays: signed quantity and USD
+    cash flow including fees (buys cost more, sells bring in less).
+    """
+    grouped: dict[str, tuple[list, list]] = {}
+
+    for symbol, side, amount, price, cost, fee_cost, fee_currency in rows:
+        base, _, quote = (symbol or "").partition("/")
+        if quote not in USD_QUOTES or not amount:
+            continue
+
+        value = cost if cost is not None else amount * price
+        fee = fee_cost if fee_cost and fee_currency in USD_QUOTES else 0.0
+
+        quantities, cash = grouped.setdefault(base, ([], []))
+        if side == "buy":
+            quantities.append(amount)
+            cash.append(value + fee)
+        elif side == "sell":
+            quantities.append(-amount)
+            cash.append(value - fee)
+
+    return {
+        asset: {
+            "quantity": np.asarray(quantities, dtype=np.float64),
+            "cash": np.asarray(cash, dtype=np.float64),
+        }
+        for asset, (quantities, cash) in grouped.items()
+    }
+
+
+def fifo(asset: str, quantity: np.ndarray, cash: np.ndarray) -> AssetPosition:
+    buys = quantity > 0
+    bought_qty = np.concatenate(([0.0], np.cumsum(quantity[buys])))
+    bought_cost = np.concatenate(([0.0], np.cumsum(cash[buys])))
+
+    # A sell can only match units bought before it. Units matched so far
+    # follow m[t] = min(m[t-1] + sell[t], bought[t]), whose closed form is
+    # sold[t] + min(0, min over k <= t of (bought[k] - sold[k]))
+    sold_cum = np.cumsum(np.where(buys, 0.0, -quantity))
+    bought_cum = np.cumsum(np.where(buys, quantity, 0.0))
+    shortfall = np.minimum.accumulate(np.minimum(bought_cum - sold_cum, 0.0))
+
+    sold = sold_cum[-1]
+    proceeds = cash[~buys].sum()
+
+    total_bought = bought_qty[-1]
+    matched = float(np.clip(sold + shortfall[-1], 0.0, total_bought))
+    matched_cost = np.interp(matched, bought_qty, bought_cost)
+
+    # Proceeds of sells we hold no buys for count as gain at zero cost
+    return AssetPosition(
+        asset=asset,
+        quantity=float(total_bought - matched),
+        cost_basis=float(bought_cost[-1] - matched_cost),
+        realized_pnl=float(proceeds - matched_cost),
+        unmatched_sell_quantity=float(sold - matched),
+    )
+
+
+def lifo(asset: str, quantity: np.ndarray, cash: np.ndarray) -> AssetPosition:
+    lots: list[list[float]] = []  # [units, unit cost], newest last
+    realized = 0.0
+    unmatched = 0.0
+
+    for q, c in zip(quantity.tolist(), cash.tolist()):
+        if q > 0:
+            lots.append([q, c / q])
+            continue
+
+        remaining = -q
+        matched_cost = 0.0
+        while remaining > 0 and lots:
+            lot = lots[-1]
+            take = min(lot[0], remaining)
+            matched_cost += take * lot[1]
+            lot[0] -= take
+            remaining -= take
+            if lot[0] <= 1e-12:
+                lots.pop()
+
+        unmatched += remaining
+        realized += c - matched_cost
+
+    held = sum(units for units, _ in lots)
+    cost = sum(units * unit_cost for units, unit_cost in lots)
+
+    return AssetPosition(asset, held, cost, realized, unmatched)
+
+
+def average(asset: str, quantity: np.ndarray, cash: np.ndarray) -> AssetPosition:
+    held = 0.0
+    cost = 0.0
+    realized = 0.0
+    unmatched = 0.0
+
+    for q, c in zip(quantity.tolist(), cash.tolist()):
+        if q > 0:
+            held += q
+            cost += c
+            continue
+
+        sold = min(-q, held)
+        avg = cost / held if held > 0 else 0.0
+        realized += c - sold * avg
+        unmatched += -q - sold
+        cost -= sold * avg
+        held -= sold
+
+    return AssetPosition(asset, held, cost, realized, unmatched)
+
+
+_ENGINES = {"fifo": fifo, "lifo": lifo, "average": average}
+
+
+def compute_positions(rows, method: str = "fifo") -> dict[str, AssetPosition]:
+    if method not in _ENGINES:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+
+    engine = _ENGINES[method]
+    return {
+        asset: engine(asset, arrays["quantity"], arrays["cash"])
+        for asset, arrays in trade_arrays(rows).items()
+    }
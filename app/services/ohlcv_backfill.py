@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+
+import ccxt.async_support as ccxt
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PAGE_LIMIT = 300  # Coinbase candles per request
+MAX_RETRIES = 3
+
+
+def plan_windows(start: int, end: int, step: int, page_limit: int = PAGE_LIMIT):
+    """Split [start, end) into page-sized [since, until) windows."""
+    span = step * page_limit
+    return [(since, min(since + span, end)) for since in range(start, end, span)]
+
+
+class RequestBudget:
+    """
+    Token bucket shared by every backfill in the process: `rate` weight
+    units per second with bursts of up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self, weight: float = 1) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+
+                await asyncio.sleep((weight - self._tokens) / self.rate)
+
+
+class OHLCVBackfill:
+    """
+    Concurrent paginated candle fetcher.
+
+    A range is planned into page-aligned windows that are fetched at most
+    `concurrency` at a time, each request paying one unit of the shared
+    RequestBudget, then merged and deduplicated by timestamp.
+    """
+
+    def __init__(self, concurrency: int, budget: RequestBudget):
+        self.budget = budget
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self._metrics = {"windows": 0, "retries": 0}
+
+    async def fetch(
+        self, exchange, symbol: str, timeframe: str, start: int, end: int, step: int
+    ) -> list[list]:
+        windows = plan_windows(start, end, step)
+        if not windows:
+            return []
+
+        pages = await asyncio.gather(
+            *(
+                self._fetch_window(exchange, symbol, timeframe, since, until)
+                for since, until in windows
+            )
+        )
+
+        merged = {}
+        for page in pages:
+            for candle in page:
+                merged[candle[0]] = candle
+
+        if len(windows) > 1:
+            logger.info(
+                f"🕯️ Backfilled {symbol} {timeframe}: "
+                f"{len(windows)} pages, {len(merged)} candles"
+            )
+
+        return [merged[ts] for ts in sorted(merged)]
+
+    def stats(self) -> dict:
+        return dict(self._metrics)
+
+    async def _fetch_window(
+        self, exchange, symbol: str, timeframe: str, since: int, until: int
+    ) -> list[list]:
+        async with self._semaphore:
+            for attempt in range(MAX_RETRIES + 1):
+                await self.budget.take()
+                try:
+                    page = await exchange.fetch_ohlcv(
+                        symbol,
+                        timeframe=timeframe,
+                        since=since,
+                        limit=PAGE_LIMIT,
+                    )
+                    break
+                except ccxt.NetworkError as e:  # includes RateLimitExceeded
+                    if attempt == MAX_RETRIES:
+                        raise
+                    self._metrics["retries"] += 1
+                    logger.warning(f"Candle page {symbol} {since} retry: {e}")
+                    await asyncio.sleep(2**attempt)
+
+        self._metrics["windows"] += 1
+        return [c for c in page if since <= c[0] < until]
+
+
+# Singleton instance
+ohlcv_backfill = OHLCVBackfill(
+    concurrency=settings.OHLCV_BACKFILL_CONCURRENCY,
+    budget=RequestBudget(
+        rate=settings.OHLCV_REQUEST_RATE,
+        burst=settings.OHLCV_REQUEST_BURST,
+    ),
+)
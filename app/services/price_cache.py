@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+
+import httpx
+
+from app.core.config import get_settings
+from app.core.redis import redis_client
+from app.websocket.background.market_data_hub import market_data_hub
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PUBLIC_PRODUCTS_URL = "https://api.coinbase.com/api/v3/brokerage/market/products"
+
+REDIS_KEY = "price_cache"
+REFRESH_LOCK_KEY = "price_cache:refresh_lock"
+FLUSH_INTERVAL = 1  # seconds between Redis writes of streamed prices
+
+# Coinbase runs USD and USDC pairs on a single book
+EQUIVALENT_QUOTES = {"USD": "USDC", "USDC": "USD"}
+
+
+def to_symbol(product_id: str) -> str:
+    return product_id.replace("-", "/")
+
+
+class PriceCache:
+    """
+    Cross-user public price cache, keyed by ccxt symbol ("BTC/USD").
+
+    Entries are (price, unix time). Sources, freshest first:
+      - ticker events on the market data hub (streamed symbols, top-10),
+        batched to Redis every FLUSH_INTERVAL seconds;
+      - a bulk refresh of every product from Coinbase's public REST API every
+        `refresh_interval` seconds, done by one process at a time (Redis
+        lock) while the others read the result from the `price_cache` hash.
+    Prices are public, so no user API key or per-user rate limit is involved.
+    """
+
+    def __init__(self, max_age: float, refresh_interval: int):
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self._prices: dict[str, tuple[float, float]] = {}
+        self._dirty: dict[str, tuple[float, float]] = {}
+        self._last_refresh = 0.0
+        self._last_redis_load = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._tasks: list[asyncio.Task] = []
+        self._metrics = {"hits": 0, "misses": 0, "rest_refreshes": 0, "redis_loads": 0}
+
+    # ===============================
+    # READS
+    # ===============================
+
+    def get(self, symbol: str) -> float | None:
+        """Fresh in-memory price for `symbol`, or its USD/USDC twin."""
+        price = self._fresh(symbol)
+
+        if price is None:
+            base, _, quote = symbol.partition("/")
+            if quote in EQUIVALENT_QUOTES:
+                price = self._fresh(f"{base}/{EQUIVALENT_QUOTES[quote]}")
+
+        return price
+
+    async def get_many(self, symbols) -> dict[str, float]:
+        """symbol -> price for every symbol that has a fresh price."""
+        symbols = set(symbols)
+        prices = self._lookup(symbols)
+
+        if len(prices) < len(symbols) and time.time() - self._last_redis_load > FLUSH_INTERVAL:
+            await self._load_from_redis()
+            prices = self._lookup(symbols)
+
+        if len(prices) < len(symbols) and time.time() - self._last_refresh > self.max_age:
+            await self.refresh()
+            prices = self._lookup(symbols)
+
+        self._metrics["hits"] += len(prices)
+        self._metrics["misses"] += len(symbols) - len(prices)
+
+        return prices
+
+    def stats(self) -> dict:
+        return {**self._metrics, "symbols": len(self._prices)}
+
+    # ===============================
+    # WRITES
+    # ===============================
+
+    def update(self, symbol: str, price: float, ts: float | None = None) -> None:
+        entry = (price, ts or time.time())
+        self._prices[symbol] = entry
+        self._dirty[symbol] = entry
+
+    async def refresh(self) -> None:
+        """Bulk refresh, single-flight per process and per interval cluster-wide."""
+        async with self._refresh_lock:
+            # Callers that queued behind a refresh that just finished
+            if time.time() - self._last_refresh < FLUSH_INTERVAL:
+                return
+
+            owner = await redis_client.set(
+                REFRESH_LOCK_KEY, "1", nx=True, ex=self.refresh_interval
+            )
+
+            if owner:
+                await self._refresh_from_rest()
+            else:
+                await self._load_from_redis()
+
+            self._last_refresh = time.time()
+
+    # ===============================
+    # LIFECYCLE
+    # ===============================
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+
+        market_data_hub.add_listener(self._on_market_message)
+        self._tasks = [
+            asyncio.create_task(self._refresh_loop()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+
+    async def stop(self) -> None:
+        market_data_hub.remove_listener(self._on_market_message)
+
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    def _fresh(self, symbol: str) -> float | None:
+        entry = self._prices.get(symbol)
+        if entry and time.time() - entry[1] <= self.max_age:
+            return entry[0]
+        return None
+
+    def _lookup(self, symbols) -> dict[str, float]:
+        prices = {}
+        for symbol in symbols:
+            price = self.get(symbol)
+            if price is not None:
+                prices[symbol] = price
+        return prices
+
+    async def _refresh_from_rest(self) -> None:
+        async with httpx.AsyncClient(timeout=10) as client:
+            res = await client.get(PUBLIC_PRODUCTS_URL, params={"product_type": "SPOT"})
+            res.raise_for_status()
+            products = res.json().get("products", [])
+
+        now = time.time()
+        for product in products:
+            try:
+                price = float(product["price"])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            symbol = to_symbol(product["product_id"])
+            # Never overwrite a fresher streamed tick with the REST value
+            current = self._prices.get(symbol)
+            if current is None or current[1] < now - FLUSH_INTERVAL:
+                self.update(symbol, price, now)
+
+        self._metrics["rest_refreshes"] += 1
+        await self._flush()
+
+        logger.info(f"💲 Price cache refreshed: {len(products)} products")
+
+    async def _load_from_redis(self) -> None:
+        entries = await redis_client.hgetall(REDIS_KEY)
+        self._last_redis_load = time.time()
+        self._metrics["redis_loads"] += 1
+
+        for symbol, raw in entries.items():
+            try:
+                price, ts = (float(v) for v in raw.split(":"))
+            except ValueError:
+                continue
+
+            current = self._prices.get(symbol)
+            if current is None or current[1] < ts:
+                self._prices[symbol] = (price, ts)
+
+    async def _flush(self) -> None:
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, {}
+        await redis_client.hset(
+            REDIS_KEY,
+            mapping={symbol: f"{price}:{ts}" for symbol, (price, ts) in dirty.items()},
+        )
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Price cache refresh failed: {e}")
+
+            await asyncio.sleep(self.refresh_interval)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self._flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Price cache flush failed: {e}")
+
+    def _on_market_message(self, data: dict) -> None:
+        if data.get("channel") != "ticker":
+            return
+
+        now = time.time()
+        for event in data.get("events", []):
+            for ticker in event.get("tickers", []):
+                try:
+                    self.update(to_symbol(ticker["product_id"]), float(ticker["price"]), now)
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+
+# Singleton instance
+price_cache = PriceCache(
+    max_age=settings.LIVE_PRICE_MAX_AGE,
+    refresh_interval=settings.PRICE_CACHE_REFRESH_INTERVAL,
+)
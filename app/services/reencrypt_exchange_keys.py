@@ -0,0 +1,116 @@
+"""
+Bulk migration of stored exchange keys to envelope encryption.
+
+Rows whose api_key / api_secret / passphrase are still individual KMS
+ciphertexts are decrypted once, re-sealed with the owner's data key and
+committed batch by batch. Already-migrated rows are skipped, so the script
+is safe to re-run. A row any of whose fields fails to decrypt is left
+untouched and reported as failed; nothing is ever re-sealed unverified.
+
+Usage:
+    python -m app.services.reencrypt_exchange_keys [--batch-size 200] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import select
+
+from app.db.session import AsyncSessionLocal
+from app.models.user import UserExchange
+from app.security.credential_cache import credential_cache
+from app.security.envelope_service import envelope_service
+from app.security.kms_service import kms_service
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("api_key", "api_secret", "passphrase")
+
+
+def _pending(value: str | None) -> bool:
+    return bool(value) and not envelope_service.is_envelope(value)
+
+
+async def reencrypt_batch(
+    db, rows: list[UserExchange], dry_run: bool
+) -> tuple[int, int]:
+    """Returns (migrated, failed) row counts."""
+    migrated = 0
+    failed = 0
+
+    for row in rows:
+        fields = [f for f in FIELDS if _pending(getattr(row, f))]
+        if not fields:
+            continue
+
+        # KMS only, no plaintext pass-through: a throttled or failed call
+        # must never be sealed as if the ciphertext were the key
+        try:
+            plaintext = await asyncio.gather(
+                *(kms_service.decrypt(getattr(row, f)) for f in fields)
+            )
+        except Exception as e:
+            logger.warning(f"Skipping exchange row {row.id}: decrypt failed: {e}")
+            failed += 1
+            continue
+
+        data_key = await envelope_service.get_data_key(db, row.user_id, create=True)
+
+        for field, value in zip(fields, plaintext):
+            setattr(row, field, envelope_service.encrypt(value, data_key))
+
+        credential_cache.invalidate(row.id)
+        migrated += 1
+
+    if dry_run:
+        await db.rollback()
+        for row in rows:
+            envelope_service.forget(row.user_id)
+    else:
+        await db.commit()
+
+    return migrated, failed
+
+
+async def main(batch_size: int = 200, dry_run: bool = False):
+    last_id = 0
+    total = 0
+    total_failed = 0
+
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(UserExchange)
+                .where(UserExchange.id > last_id)
+                .order_by(UserExchange.id)
+                .limit(batch_size)
+            )
+            rows = result.scalars().all()
+
+            if not rows:
+                break
+
+            last_id = rows[-1].id
+            migrated, failed = await reencrypt_batch(db, rows, dry_run)
+            total += migrated
+            total_failed += failed
+
+            print(
+                f"🔐 Batch up to id={last_id}: {migrated}/{len(rows)} rows re-encrypted, "
+                f"{failed} failed"
+            )
+
+    print(f"✅ Done — {total} rows {'would be ' if dry_run else ''}migrated")
+
+    if total_failed:
+        print(f"⚠️ {total_failed} rows could not be decrypted and were left unchanged")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(main(batch_size=args.batch_size, dry_run=args.dry_run))
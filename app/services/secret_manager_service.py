@@ -1,21 +1,17 @@
 import json
 
-import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
 from app.core.config import get_settings
+from app.security.aws_clients import create_aws_client
+from app.security.aws_executor import aws_executor
 
 settings = get_settings()
 
 
 class SecretsManagerService:
     def __init__(self):
-        self.client = boto3.client(
-            "secretsmanager",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION,
-        )
+        self.client = create_aws_client("secretsmanager")
         self.secret_prefix = "trading-user"
 
     def _get_secret_name(self, user_id: int, exchange_name: str) -> str:
@@ -47,7 +43,8 @@ class SecretsManagerService:
 
         try:
             # Try to update existing secret
-            response = self.client.update_secret(
+            response = await aws_executor.run(
+                self.client.update_secret,
                 SecretId=secret_name,
                 SecretString=json.dumps(secret_value),
                 Description=f"API credentials for {exchange_name} exchange - User {user_id}",
@@ -56,7 +53,8 @@ class SecretsManagerService:
 
         except self.client.exceptions.ResourceNotFoundException:
             # Secret doesn't exist, create new one
-            response = self.client.create_secret(
+            response = await aws_executor.run(
+                self.client.create_secret,
                 Name=secret_name,
                 SecretString=json.dumps(secret_value),
                 Description=f"API credentials for {exchange_name} exchange - User {user_id}",
@@ -81,7 +79,9 @@ class SecretsManagerService:
         secret_name = self._get_secret_name(user_id, exchange_name)
 
         try:
-            response = self.client.get_secret_value(SecretId=secret_name)
+            response = await aws_executor.run(
+                self.client.get_secret_value, SecretId=secret_name
+            )
             secret_data = json.loads(response["SecretString"])
             return secret_data
 
@@ -105,12 +105,14 @@ class SecretsManagerService:
 
         try:
             if force:
-                self.client.delete_secret(
+                await aws_executor.run(
+                    self.client.delete_secret,
                     SecretId=secret_name,
                     ForceDeleteWithoutRecovery=True,
                 )
             else:
-                self.client.delete_secret(
+                await aws_executor.run(
+                    self.client.delete_secret,
                     SecretId=secret_name,
                     RecoveryWindowInDays=7,
                 )
@@ -127,7 +129,9 @@ class SecretsManagerService:
         secret_name = self._get_secret_name(user_id, exchange_name)
 
         try:
-            self.client.describe_secret(SecretId=secret_name)
+            await aws_executor.run(
+                self.client.describe_secret, SecretId=secret_name
+            )
             return True
         except self.client.exceptions.ResourceNotFoundException:
             return False
@@ -0,0 +1,274 @@
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import distinct
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.coinbase.market_catalog import market_catalog
+from app.models.user import TradeSyncState, UserTrade
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGES = 50  # ccxt pagination calls per fetch
+# Coinbase pages hold 100-250 fills: a fetch returning at least this many
+# may have stopped at MAX_PAGES with older fills still unfetched
+TRUNCATED_FETCH = MAX_PAGES * 50
+INSERT_CHUNK = 1000
+
+# ccxt exchanges whose fetch_my_trades needs a symbol
+PER_SYMBOL_EXCHANGES = {"coinbaseexchange"}
+TRADE_QUOTES = ("USD", "USDC", "USDT")
+
+
+def trade_row(user_id: int, exchange_name: str, trade: dict) -> dict | None:
+    """Map a ccxt trade to user_trades columns; None if it is unusable."""
+    if not trade.get("id") or not trade.get("timestamp") or not trade.get("symbol"):
+        return None
+
+    amount = trade.get("amount")
+    price = trade.get("price")
+    if amount is None or price is None:
+        return None
+
+    fee = trade.get("fee") or {}
+
+    return {
+        "user_id": user_id,
+        "exchange_name": exchange_name,
+        "trade_id": str(trade["id"]),
+        "order_id": trade.get("order"),
+        "symbol": trade.get("symbol"),
+        "side": trade.get("side"),
+        "amount": float(amount),
+        "price": float(price),
+        "cost": float(trade["cost"]) if trade.get("cost") is not None else None,
+        "fee_cost": fee.get("cost"),
+        "fee_currency": fee.get("currency"),
+        "timestamp": int(trade["timestamp"]),
+    }
+
+
+class TradeLedgerService:
+    """
+    Persistent, incrementally synced trade history.
+
+    Each sync asks the exchange only for fills since the stored cursor
+    (newest trade timestamp), inserts them with ON CONFLICT DO NOTHING on
+    (user, exchange, trade id) and folds just the newly inserted rows into
+    the running aggregates on TradeSyncState. Work per sync is proportional
+    to the number of new trades, not to the whole history. Exchanges that
+    need a symbol for fetch_my_trades (coinbaseexchange) are queried per
+    held or previously traded symbol, each with its own cursor.
+    """
+
+    async def get_state(
+        self, db: AsyncSession, user_id: int, exchange_name: str, lock: bool = False
+    ) -> TradeSyncState:
+        key = {"user_id": user_id, "exchange_name": exchange_name}
+
+        # Concurrent first syncs would otherwise race on the unique constraint
+        await db.execute(
+            insert(TradeSyncState)
+            .values(**key, trade_count=0, total_buy_cost=0.0)
+            .on_conflict_do_nothing(constraint="uq_trade_sync_state")
+        )
+
+        query = select(TradeSyncState).filter_by(**key)
+        if lock:
+            query = query.with_for_update()
+
+        result = await db.execute(query)
+        return result.scalar_one()
+
+    async def sync(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        exchange_name: str,
+        exchange,
+        held_assets=(),
+    ) -> TradeSyncState:
+        """
+        Pull new fills through `exchange` and commit them with the cursor.
+        `held_assets` (currency codes) picks the symbols to query on
+        exchanges that cannot list fills across all markets.
+        """
+        state = await self.get_state(db, user_id, exchange_name)
+        cursor = state.last_timestamp
+        symbol_cursors = dict(state.symbol_cursors or {})
+
+        # End the read before the network calls: no transaction or row lock
+        # is held while paginating
+        await db.commit()
+
+        trades, synced_symbols = await self._fetch_trades(
+            db, user_id, exchange_name, exchange, cursor, symbol_cursors, held_assets
+        )
+
+        rows = {}
+        for trade in trades:
+            row = trade_row(user_id, exchange_name, trade)
+            if row:
+                rows[row["trade_id"]] = row
+
+        # Short transaction: only rows this sync inserted are folded, so an
+        # overlapping sync never counts a fill twice
+        state = await self.get_state(db, user_id, exchange_name, lock=True)
+
+        if rows:
+            # `since` is inclusive: boundary fills come back and are skipped
+            # by the unique constraint
+            inserted = await self._insert(db, list(rows.values()))
+            self._fold(state, inserted)
+
+            newest = max(row["timestamp"] for row in rows.values())
+            state.last_timestamp = max(state.last_timestamp or 0, newest)
+
+        if synced_symbols:
+            # New dict so the JSON column is flagged dirty
+            state.symbol_cursors = {**(state.symbol_cursors or {}), **synced_symbols}
+
+        state.synced_at = datetime.utcnow()
+        await db.commit()
+
+        return state
+
+    async def load_fill_rows(
+        self, db: AsyncSession, user_id: int, exchange_name: str
+    ) -> list[tuple]:
+        """
+        (symbol, side, amount, price, cost, fee_cost, fee_currency) for every
+        stored fill in time order, as plain rows for lot accounting.
+        """
+        result = await db.execute(
+            select(
+                UserTrade.symbol,
+                UserTrade.side,
+                UserTrade.amount,
+                UserTrade.price,
+                UserTrade.cost,
+                UserTrade.fee_cost,
+                UserTrade.fee_currency,
+            )
+            .where(
+                UserTrade.user_id == user_id,
+                UserTrade.exchange_name == exchange_name,
+            )
+            .order_by(UserTrade.timestamp, UserTrade.id)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def _fetch_trades(
+        self,
+        db,
+        user_id,
+        exchange_name,
+        exchange,
+        cursor,
+        symbol_cursors,
+        held_assets,
+    ) -> tuple[list[dict], dict[str, int]]:
+        """Fills since the cursors, plus the new cursor of each symbol queried."""
+        if exchange.id not in PER_SYMBOL_EXCHANGES:
+            return await self._fetch_all(exchange, None, cursor), {}
+
+        known = await self._stored_symbols(db, user_id, exchange_name)
+        await db.commit()
+
+        markets = await market_catalog.attach(exchange)
+        candidates = {
+            f"{asset}/{quote}"
+            for asset in held_assets
+            for quote in TRADE_QUOTES
+            if asset not in TRADE_QUOTES
+        }
+        symbols = sorted(s for s in known | candidates if s in markets)
+
+        trades, synced = [], {}
+        for symbol in symbols:
+            started_at = int(time.time() * 1000)
+
+            # Symbols stored before per-symbol cursors existed were synced up
+            # to the global one; anything else unseen needs its whole history
+            since = symbol_cursors.get(symbol)
+            if since is None and symbol in known:
+                since = cursor
+
+            trades.extend(await self._fetch_all(exchange, symbol, since))
+            synced[symbol] = started_at
+
+        return trades, synced
+
+    async def _fetch_all(self, exchange, symbol, since) -> list[dict]:
+        """
+        Every fill at or after `since`. Coinbase pages newest-first, so a
+        fetch cut off at MAX_PAGES holds the newest fills only; keep asking
+        for older ones (`until` the oldest seen) until nothing new comes back,
+        or the cursor would skip the fills in between for good.
+        """
+        trades: dict[str, dict] = {}
+        until = None
+
+        while True:
+            params = {"paginate": True, "paginationCalls": MAX_PAGES}
+            if until is not None:
+                params["until"] = until
+
+            batch = await exchange.fetch_my_trades(symbol, since=since, params=params)
+            new = [t for t in batch if t.get("id") and t["id"] not in trades]
+            trades.update((t["id"], t) for t in new)
+
+            if len(batch) < TRUNCATED_FETCH or not new:
+                break
+
+            timestamps = [t["timestamp"] for t in new if t.get("timestamp")]
+            if not timestamps:
+                break
+            until = min(timestamps)
+
+            logger.info(
+                f"📑 Trade fetch for {symbol or 'all symbols'} hit the page cap, "
+                f"continuing before {until}"
+            )
+
+        return list(trades.values())
+
+    async def _stored_symbols(
+        self, db: AsyncSession, user_id: int, exchange_name: str
+    ) -> set[str]:
+        result = await db.execute(
+            select(distinct(UserTrade.symbol)).where(
+                UserTrade.user_id == user_id,
+                UserTrade.exchange_name == exchange_name,
+            )
+        )
+        return set(result.scalars().all())
+
+    async def _insert(self, db: AsyncSession, rows: list[dict]) -> list[dict]:
+        new_ids = set()
+
+        # Chunked to stay under the driver's bind-parameter limit
+        for i in range(0, len(rows), INSERT_CHUNK):
+            stmt = (
+                insert(UserTrade)
+                .values(rows[i:i + INSERT_CHUNK])
+                .on_conflict_do_nothing(constraint="uq_user_trade")
+                .returning(UserTrade.trade_id)
+            )
+            result = await db.execute(stmt)
+            new_ids.update(result.scalars().all())
+
+        return [row for row in rows if row["trade_id"] in new_ids]
+
+    def _fold(self, state: TradeSyncState, inserted: list[dict]) -> None:
+        state.trade_count += len(inserted)
+        state.total_buy_cost += sum(
+            row["cost"] or 0.0 for row in inserted if row["side"] == "buy"
+        )
+
+
+# Singleton instance
+trade_ledger = TradeLedgerService()
@@ -0,0 +1,58 @@
+from dataclasses import dataclass, field
+
+from app.services.price_cache import price_cache
+
+STABLE_COINS = {"USDC", "USDT"}
+QUOTE = "USD"
+
+
+@dataclass
+class PortfolioValuation:
+    total: float = 0.0
+    values: dict[str, float] = field(default_factory=dict)  # asset -> USD value
+    amounts: dict[str, float] = field(default_factory=dict)  # asset -> units
+    unpriced: list[str] = field(default_factory=list)
+
+
+class ValuationService:
+    """
+    Prices balance maps in USD from the shared public price cache.
+
+    Stable coins count at 1; every other asset uses "{ASSET}/USD" from
+    price_cache, which falls back to a single public bulk refresh when
+    something is missing. No user API key is used for pricing.
+    """
+
+    async def price_assets(self, assets) -> dict[str, float]:
+        """asset -> USD price for every asset that could be priced."""
+        assets = set(assets)
+        prices = {asset: 1.0 for asset in assets & STABLE_COINS}
+
+        symbols = {f"{asset}/{QUOTE}": asset for asset in assets - STABLE_COINS}
+        for symbol, price in (await price_cache.get_many(symbols)).items():
+            prices[symbols[symbol]] = price
+
+        return prices
+
+    async def value_balance(self, totals: dict) -> PortfolioValuation:
+        held = {asset: amount for asset, amount in totals.items() if amount}
+        prices = await self.price_assets(held)
+
+        valuation = PortfolioValuation()
+
+        for asset, amount in held.items():
+            price = prices.get(asset)
+            if price is None:
+                valuation.unpriced.append(asset)
+                continue
+
+            usd_value = amount * price
+            valuation.total += usd_value
+            valuation.values[asset] = usd_value
+            valuation.amounts[asset] = amount
+
+        return valuation
+
+
+# Singleton instance
+valuation_service = ValuationService()
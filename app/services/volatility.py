@@ -0,0 +1,310 @@
+"""
+Annualized close-to-close volatility of hourly candles.
+
+Expanding and rolling standard deviations of log returns are derived from
+running sums of r and r**2 (var = E[r^2] - E[r]^2): a whole history is two
+cumsums, and a new or updated candle adjusts the sums in O(1) instead of
+re-running np.std over every prefix.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from app.websocket.background.market_data_hub import market_data_hub
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAME = "1h"
+TIMEFRAME_MS = 3600 * 1000
+PERIODS_PER_YEAR = 365 * 24
+HISTORY = 720  # points kept per symbol (30 days)
+
+# name -> window length in candles
+ROLLING_WINDOWS = {"24h": 24, "7d": 24 * 7, "30d": 24 * 30}
+
+# n returns need n + 1 closes: enough candles for the longest window
+LOAD_CANDLES = max(ROLLING_WINDOWS.values()) + 1
+
+SERIES_MAX_AGE = 300  # seconds without stream updates before a reload
+
+
+def _annualize(var) -> np.ndarray:
+    return np.sqrt(np.clip(var, 0.0, None) * PERIODS_PER_YEAR)
+
+
+def expanding_volatility(returns: np.ndarray) -> np.ndarray:
+    n = np.arange(1, len(returns) + 1)
+    mean = np.cumsum(returns) / n
+    return _annualize(np.cumsum(returns**2) / n - mean**2)
+
+
+def rolling_volatility(returns: np.ndarray, window: int) -> np.ndarray:
+    """NaN until `window` returns are available."""
+    out = np.full(len(returns), np.nan)
+    if len(returns) < window:
+        return out
+
+    s = np.concatenate(([0.0], np.cumsum(returns)))
+    s2 = np.concatenate(([0.0], np.cumsum(returns**2)))
+
+    mean = (s[window:] - s[:-window]) / window
+    out[window - 1:] = _annualize((s2[window:] - s2[:-window]) / window - mean**2)
+    return out
+
+
+def _vol(s: float, s2: float, n: int) -> float | None:
+    if n < 1:
+        return None
+    mean = s / n
+    return math.sqrt(max(s2 / n - mean * mean, 0.0) * PERIODS_PER_YEAR)
+
+
+def _round(value) -> float | None:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return round(float(value), 6)
+
+
+class VolatilitySeries:
+    """
+    Volatility points for one symbol with incremental state.
+
+    `update(ts, close)` folds a candle close into the series: a close inside
+    the current hour replaces the latest return, a new hour appends one.
+    Both only touch the running sums, so streamed candles cost O(1).
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.updated_at = 0.0
+
+        self._last_ts: int | None = None
+        self._last_close: float | None = None
+        self._prev_close: float | None = None  # close before the current hour
+
+        self._returns: deque[float] = deque(maxlen=max(ROLLING_WINDOWS.values()))
+        self._count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._window_sums = {name: [0.0, 0.0] for name in ROLLING_WINDOWS}
+
+        self.points: deque[dict] = deque(maxlen=HISTORY)
+
+    @classmethod
+    def from_ohlcv(cls, symbol: str, ohlcv: list) -> "VolatilitySeries":
+        series = cls(symbol)
+        if not ohlcv:
+            return series
+
+        timestamps = np.array([c[0] for c in ohlcv], dtype=np.int64)
+        closes = np.array([c[4] for c in ohlcv], dtype=np.float64)
+        returns = np.diff(np.log(closes))
+
+        expanding = expanding_volatility(returns)
+        rolling = {
+            name: rolling_volatility(returns, window)
+            for name, window in ROLLING_WINDOWS.items()
+        }
+
+        # One return gives a zero deviation; start where there are two
+        for i in range(1, len(returns)):
+            series.points.append(
+                series._point(
+                    int(timestamps[i + 1]),
+                    expanding[i],
+                    {name: values[i] for name, values in rolling.items()},
+                )
+            )
+
+        # Seed the running sums with the same totals
+        series._count = len(returns)
+        series._sum = float(returns.sum())
+        series._sum_sq = float((returns**2).sum())
+        series._returns.extend(returns.tolist())
+        for name, window in ROLLING_WINDOWS.items():
+            tail = returns[-window:]
+            series._window_sums[name] = [float(tail.sum()), float((tail**2).sum())]
+
+        series._last_ts = int(timestamps[-1])
+        series._last_close = float(closes[-1])
+        series._prev_close = float(closes[-2]) if len(closes) > 1 else None
+        series.updated_at = time.time()
+
+        return series
+
+    def update(self, ts: int, close: float) -> None:
+        """Fold a close at `ts` (ms) into the series."""
+        if close <= 0:
+            return
+
+        bucket = ts - ts % TIMEFRAME_MS
+
+        if self._last_ts is None:
+            self._last_ts, self._last_close = bucket, close
+            return
+
+        if bucket < self._last_ts:
+            return
+
+        replaced = bucket == self._last_ts
+        if replaced:
+            if self._prev_close is None:
+                self._last_close = close
+                return
+            self._remove_latest_return()
+        else:
+            self._prev_close = self._last_close
+            self._last_ts = bucket
+
+        self._last_close = close
+        self._append_return(math.log(close / self._prev_close), replaced)
+        self.updated_at = time.time()
+
+    def latest(self) -> float | None:
+        return self.points[-1]["volatility"] if self.points else None
+
+    def to_dict(self) -> dict:
+        return {
+            "symbol": self.symbol,
+            "latest": self.latest(),
+            "data": list(self.points),
+        }
+
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    def _point(self, ts: int, expanding, rolling: dict) -> dict:
+        return {
+            "timestamp": ts,
+            "volatility": _round(expanding),
+            **{f"volatility_{name}": _round(value) for name, value in rolling.items()},
+        }
+
+    def _remove_latest_return(self) -> None:
+        r = self._returns.pop()
+        self._count -= 1
+        self._sum -= r
+        self._sum_sq -= r * r
+        for sums in self._window_sums.values():
+            sums[0] -= r
+            sums[1] -= r * r
+
+    def _append_return(self, r: float, replaced: bool) -> None:
+        # Returns leaving each rolling window; a replaced return only swaps
+        # the newest one, so nothing leaves
+        leaving = {
+            name: (
+                self._returns[-window]
+                if not replaced and len(self._returns) >= window
+                else None
+            )
+            for name, window in ROLLING_WINDOWS.items()
+        }
+
+        self._returns.append(r)
+        self._count += 1
+        self._sum += r
+        self._sum_sq += r * r
+
+        rolling = {}
+        for name, window in ROLLING_WINDOWS.items():
+            sums = self._window_sums[name]
+            sums[0] += r
+            sums[1] += r * r
+
+            old = leaving[name]
+            if old is not None:
+                sums[0] -= old
+                sums[1] -= old * old
+
+            n = min(len(self._returns), window)
+            rolling[name] = _vol(sums[0], sums[1], n) if n == window else None
+
+        point = self._point(
+            self._last_ts, _vol(self._sum, self._sum_sq, self._count), rolling
+        )
+
+        if replaced and self.points and self.points[-1]["timestamp"] == self._last_ts:
+            self.points[-1] = point
+        elif self._count > 1:
+            self.points.append(point)
+
+
+class VolatilityService:
+    """
+    Per-symbol volatility series, loaded once from OHLCV history and kept
+    current from candle events on the market data hub. A series that has
+    not been updated for SERIES_MAX_AGE seconds (symbol not streamed) is
+    rebuilt from history on the next request.
+    """
+
+    def __init__(self, max_age: int = SERIES_MAX_AGE):
+        self.max_age = max_age
+        self._series: dict[str, VolatilitySeries] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._started = False
+
+    async def get(self, symbol: str, load_ohlcv) -> dict:
+        """
+        Volatility for `symbol`; `load_ohlcv()` is awaited for hourly
+        candles only when there is no fresh cached series.
+        """
+        series = self._fresh(symbol)
+        if series is None:
+            lock = self._locks.setdefault(symbol, asyncio.Lock())
+            async with lock:
+                series = self._fresh(symbol)
+                if series is None:
+                    ohlcv = await load_ohlcv()
+                    series = VolatilitySeries.from_ohlcv(symbol, ohlcv or [])
+                    self._series[symbol] = series
+
+        return series.to_dict()
+
+    def on_candle(self, symbol: str, ts: int, close: float) -> None:
+        series = self._series.get(symbol)
+        if series is not None:
+            series.update(ts, close)
+
+    def start(self) -> None:
+        if not self._started:
+            market_data_hub.add_listener(self._on_market_message)
+            self._started = True
+
+    def stop(self) -> None:
+        market_data_hub.remove_listener(self._on_market_message)
+        self._started = False
+
+    def stats(self) -> dict:
+        return {"symbols": len(self._series)}
+
+    def _fresh(self, symbol: str) -> VolatilitySeries | None:
+        series = self._series.get(symbol)
+        if series and time.time() - series.updated_at <= self.max_age:
+            return series
+        return None
+
+    def _on_market_message(self, data: dict) -> None:
+        if data.get("channel") != "candles" or not self._series:
+            return
+
+        for event in data.get("events", []):
+            for candle in event.get("candles", []):
+                try:
+                    self.on_candle(
+                        candle["product_id"].replace("-", "/"),
+                        int(candle["start"]) * 1000,
+                        float(candle["close"]),
+                    )
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+
+# Singleton instance
+volatility_service = VolatilityService()
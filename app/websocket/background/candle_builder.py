@@ -0,0 +1,327 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from app.core.redis import redis_client
+from app.db.session import AsyncSessionLocal
+from app.services.candle_store import candle_store
+from app.websocket.background.market_data_hub import market_data_hub
+
+logger = logging.getLogger(__name__)
+
+TRADES_CHANNEL = "market_trades"
+
+# interval -> bar length in ms
+INTERVALS = {"1s": 1000, "1m": 60 * 1000}
+PERSISTED_INTERVAL = "1m"
+
+PUBLISH_INTERVAL = 0.25  # seconds between bar publishes
+PERSIST_INTERVAL = 5  # seconds between candle store writes
+FINALIZE_GRACE = 1000  # ms to wait for late trades before closing a bar
+# ms after a 1m bar ends before it is stored; one bar, like the candle
+# store's own settle margin for REST candles
+PERSIST_GRACE = INTERVALS[PERSISTED_INTERVAL]
+
+
+def parse_trade_time(value: str) -> int:
+    """Coinbase RFC 3339 time (nanosecond fraction) -> unix ms."""
+    date, _, frac = value.rstrip("Z").partition(".")
+    dt = datetime.fromisoformat(date).replace(tzinfo=timezone.utc)
+    return int(dt.timestamp()) * 1000 + int((frac + "000")[:3])
+
+
+def candle_category(interval: str, final: bool) -> str:
+    # Distinct categories so session outboxes never conflate a final bar
+    # away behind the next updating one, or 1s bars with 1m bars
+    return f"market_candle_{interval}{'_final' if final else ''}"
+
+
+def bar_payload(symbol: str, interval: str, bar: list, final: bool) -> dict:
+    start, o, h, low, c, v = bar
+    return {
+        "category": candle_category(interval, final),
+        "symbol": symbol,
+        "interval": interval,
+        "start": datetime.fromtimestamp(start / 1000, tz=timezone.utc).isoformat(),
+        "open": o,
+        "high": h,
+        "low": low,
+        "close": c,
+        "volume": v,
+        "final": final,
+    }
+
+
+class LiveCandleBuilder:
+    """
+    In-process 1s/1m bars built from the Coinbase market_trades stream.
+
+    Runs for the symbols this process owns through symbol_leases. Bars are
+    updated in memory per trade; every PUBLISH_INTERVAL the changed bars
+    are published on `symbol:{SYMBOL}` (final=False) together with bars
+    that closed (final=True). Closed 1m bars are appended to the candle
+    store once PERSIST_GRACE has passed. A bar counts as complete only if
+    the stream was connected for its whole interval: every trades snapshot
+    (subscribe or reconnect) moves `complete_from` to the next bar
+    boundary. A trade arriving for an already closed 1m bar does the same,
+    and that bar is left to the REST backfill instead of being stored.
+    """
+
+    def __init__(self):
+        self._bars: dict[str, dict[str, list]] = {}  # product -> interval -> bar
+        self._dirty: set[tuple[str, str]] = set()
+        self._finals: list[tuple[str, str, list]] = []
+        self._to_persist: dict[str, list[list]] = {}
+        self._complete_from: dict[str, int] = {}
+        self._last_closed: dict[tuple[str, str], int] = {}  # start of last final bar
+        self._tasks: list[asyncio.Task] = []
+        self._metrics = {"trades": 0, "late": 0, "published": 0, "persisted": 0}
+
+    # ===============================
+    # SYMBOLS
+    # ===============================
+
+    async def track(self, symbol: str) -> None:
+        symbol = symbol.upper()
+        if symbol in self._bars:
+            return
+
+        self._bars[symbol] = {}
+        self._complete_from[symbol] = self._next_boundary(int(time.time() * 1000))
+        await market_data_hub.subscribe(
+            [symbol], channels=(TRADES_CHANNEL,), publish=False
+        )
+
+    async def untrack(self, symbol: str) -> None:
+        symbol = symbol.upper()
+        if self._bars.pop(symbol, None) is None:
+            return
+
+        # Open bars are dropped: the next owner (or REST) rebuilds them
+        self._complete_from.pop(symbol, None)
+        self._dirty = {key for key in self._dirty if key[0] != symbol}
+        self._last_closed = {
+            key: start for key, start in self._last_closed.items() if key[0] != symbol
+        }
+        await market_data_hub.unsubscribe(
+            [symbol], channels=(TRADES_CHANNEL,), publish=False
+        )
+
+    # ===============================
+    # LIFECYCLE
+    # ===============================
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+
+        market_data_hub.add_listener(self._on_market_message)
+        self._tasks = [
+            asyncio.create_task(self._publish_loop()),
+            asyncio.create_task(self._persist_loop()),
+        ]
+
+    async def stop(self) -> None:
+        market_data_hub.remove_listener(self._on_market_message)
+
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            await self._persist()
+        except Exception as e:
+            logger.warning(f"Final candle persist failed: {e}")
+
+    def stats(self) -> dict:
+        return {**self._metrics, "symbols": len(self._bars)}
+
+    # ===============================
+    # BAR BUILDING
+    # ===============================
+
+    def _on_market_message(self, data: dict) -> None:
+        if data.get("channel") != TRADES_CHANNEL or not self._bars:
+            return
+
+        for event in data.get("events", []):
+            snapshot = event.get("type") == "snapshot"
+            trades = []
+
+            for trade in event.get("trades", []):
+                symbol = trade.get("product_id")
+                if symbol not in self._bars:
+                    continue
+
+                if snapshot:
+                    # Fresh (re)subscription: trades may have been missed
+                    self._complete_from[symbol] = self._next_boundary(
+                        int(time.time() * 1000)
+                    )
+                    continue
+
+                try:
+                    trades.append(
+                        (
+                            parse_trade_time(trade["time"]),
+                            int(trade["trade_id"]),
+                            symbol,
+                            float(trade["price"]),
+                            float(trade["size"]),
+                        )
+                    )
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+            # Events list trades newest first; open/close need time order
+            for ts, _, symbol, price, size in sorted(trades):
+                self._add_trade(symbol, ts, price, size)
+
+    def _add_trade(self, symbol: str, ts: int, price: float, size: float) -> None:
+        self._metrics["trades"] += 1
+        bars = self._bars[symbol]
+
+        for interval, step in INTERVALS.items():
+            start = ts - ts % step
+            bar = bars.get(interval)
+
+            if start <= self._last_closed.get((symbol, interval), -1):
+                # Late trade for a bar already closed
+                if interval == PERSISTED_INTERVAL:
+                    self._drop_late(symbol, start)
+                continue
+
+            if bar is None or start > bar[0]:
+                if bar is not None:
+                    self._finalize(symbol, interval, bar)
+                bars[interval] = [start, price, price, price, price, size]
+            else:
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[4] = price
+                bar[5] += size
+
+            self._dirty.add((symbol, interval))
+
+    def _finalize(self, symbol: str, interval: str, bar: list) -> None:
+        self._finals.append((symbol, interval, bar))
+        self._dirty.discard((symbol, interval))
+        self._last_closed[(symbol, interval)] = bar[0]
+
+        complete = bar[0] >= self._complete_from.get(symbol, 0)
+        if interval == PERSISTED_INTERVAL and complete:
+            self._to_persist.setdefault(symbol, []).append(bar)
+
+    def _drop_late(self, symbol: str, start: int) -> None:
+        """The closed bar at `start` missed a trade: never store it."""
+        self._metrics["late"] += 1
+
+        pending = self._to_persist.get(symbol)
+        if pending:
+            self._to_persist[symbol] = [bar for bar in pending if bar[0] != start]
+
+        # Stored coverage must not be extended over the hole it leaves
+        self._complete_from[symbol] = self._next_boundary(int(time.time() * 1000))
+
+    def _close_expired(self, now: int) -> None:
+        """Close bars whose interval ended without a newer trade."""
+        for symbol, bars in self._bars.items():
+            for interval, bar in list(bars.items()):
+                if now >= bar[0] + INTERVALS[interval] + FINALIZE_GRACE:
+                    del bars[interval]
+                    self._finalize(symbol, interval, bar)
+
+    @staticmethod
+    def _next_boundary(ts: int) -> int:
+        step = INTERVALS[PERSISTED_INTERVAL]
+        return ts - ts % step + step
+
+    # ===============================
+    # OUTPUT
+    # ===============================
+
+    async def _publish(self) -> None:
+        self._close_expired(int(time.time() * 1000))
+
+        finals, self._finals = self._finals, []
+        dirty, self._dirty = self._dirty, set()
+
+        messages = [
+            (symbol, bar_payload(symbol, interval, bar, final=True))
+            for symbol, interval, bar in finals
+        ]
+        for symbol, interval in dirty:
+            bar = self._bars.get(symbol, {}).get(interval)
+            if bar is not None:
+                messages.append((symbol, bar_payload(symbol, interval, bar, final=False)))
+
+        if not messages:
+            return
+
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for symbol, payload in messages:
+                pipe.publish(f"symbol:{symbol}", json.dumps(payload))
+            await pipe.execute()
+
+        self._metrics["published"] += len(messages)
+
+    async def _persist(self) -> None:
+        # Bars still inside PERSIST_GRACE wait for a later pass
+        now = int(time.time() * 1000)
+        settled = now - INTERVALS[PERSISTED_INTERVAL] - PERSIST_GRACE
+        pending, waiting = {}, {}
+        for product_id, bars in self._to_persist.items():
+            for bar in bars:
+                target = pending if bar[0] <= settled else waiting
+                target.setdefault(product_id, []).append(bar)
+
+        self._to_persist = waiting
+        if not pending:
+            return
+
+        async with AsyncSessionLocal() as db:
+            for product_id, bars in pending.items():
+                try:
+                    await candle_store.append(
+                        db,
+                        product_id.replace("-", "/"),
+                        PERSISTED_INTERVAL,
+                        bars,
+                        complete_from=self._complete_from.get(product_id),
+                    )
+                    self._metrics["persisted"] += len(bars)
+                except Exception as e:
+                    await db.rollback()
+                    # The store now has a hole: stop extending its coverage
+                    if product_id in self._complete_from:
+                        self._complete_from[product_id] = self._next_boundary(
+                            int(time.time() * 1000)
+                        )
+                    logger.warning(f"Candle persist failed for {product_id}: {e}")
+
+    async def _publish_loop(self) -> None:
+        while True:
+            await asyncio.sleep(PUBLISH_INTERVAL)
+            try:
+                await self._publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Live candle publish failed: {e}")
+
+    async def _persist_loop(self) -> None:
+        while True:
+            await asyncio.sleep(PERSIST_INTERVAL)
+            try:
+                await self._persist()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Live candle persist failed: {e}")
+
+
+# Singleton instance
+candle_builder = LiveCandleBuilder()
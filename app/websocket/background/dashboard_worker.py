@@ -1,68 +1,254 @@
 import asyncio
+import hashlib
 import json
 import logging
+import random
+import time
 
+from app.core.config import get_settings
 from app.core.redis import redis_client
 from app.coinbase.exchange import calculate_dashboard
 from app.db.session import AsyncSessionLocal
-from app.models.user import User
-from sqlalchemy import select
+from app.models.user import User, UserExchange
+from app.websocket.background.presence import presence
+from sqlalchemy import distinct, select
 
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
 DASHBOARD_REFRESH = 30
+DASHBOARD_CACHE_TTL = DASHBOARD_REFRESH * 2  # outlives a slow cycle
 
 
-async def dashboard_worker():
+def dashboard_channel(user_id) -> str:
+    return f"dashboard_updates:{user_id}"
+
+
+async def store_dashboard(
+    user_id, dashboard: dict, ttl: int = DASHBOARD_CACHE_TTL
+) -> bool:
     """
-    Background task that refreshes dashboard cache
-    for all active users every 30 seconds.
+    Refresh the cached dashboard and, only when its content changed since
+    the previous write, publish it on the user's update channel.
+    Returns True if an update was published.
     """
+    data = json.dumps(dashboard, sort_keys=True)
+    digest = hashlib.sha1(data.encode()).hexdigest()
 
-    logger.info("🚀 Dashboard worker started")
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.setex(
+            f"dashboard:{user_id}",
+            ttl,
+            json.dumps({"data": dashboard}),
+        )
+        pipe.set(f"dashboard_digest:{user_id}", digest, ex=ttl, get=True)
+        _, previous = await pipe.execute()
 
-    try:
+    if previous == digest:
+        return False
+
+    await redis_client.publish(dashboard_channel(user_id), data)
+    return True
+
+
+class DashboardScheduler:
+    """
+    Refreshes dashboards of users with a connected exchange.
+
+    Users are tiered by dashboard presence: those with an open dashboard
+    socket are refreshed every `interval`, those seen within
+    DASHBOARD_RECENT_WINDOW every DASHBOARD_RECENT_REFRESH, everyone else
+    every DASHBOARD_IDLE_REFRESH. Each cycle only handles users that are due.
+
+    Refresh starts are spread evenly across the interval (plus jitter) so
+    exchange calls don't burst at the top of each cycle, at most
+    `concurrency` refreshes run at once, and each one gets its own DB
+    session. A user whose previous refresh is still running is skipped, so
+    one API key never has two dashboards in flight; the pooled exchange
+    client applies that key's ccxt rate limit to the calls themselves.
+    """
+
+    def __init__(self, interval: float, concurrency: int, jitter: float):
+        self.interval = interval
+        self.jitter = jitter
+        self.tiers = {
+            "present": interval,
+            "recent": settings.DASHBOARD_RECENT_REFRESH,
+            "idle": settings.DASHBOARD_IDLE_REFRESH,
+        }
+        self._last_attempt: dict[int, float] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight: set[int] = set()
+        self.concurrency = concurrency
+        self._metrics = {
+            "cycles": 0,
+            "users": 0,
+            "refreshed": 0,
+            "changed": 0,
+            "failed": 0,
+            "skipped": 0,
+            "last_cycle_seconds": 0.0,
+            "max_cycle_seconds": 0.0,
+            "overruns": 0,
+            "due": {},
+        }
+
+    async def run(self) -> None:
         while True:
-            try:
-                async with AsyncSessionLocal() as db:
+            started = time.monotonic()
 
-                    result = await db.execute(select(User))
-                    users = result.scalars().all()
+            try:
+                await self._run_cycle(started)
+            except Exception as e:
+                logger.error(f"🔥 Worker loop error: {e}")
 
-                    logger.info(f"📊 Updating dashboard for {len(users)} users")
+            elapsed = time.monotonic() - started
+            self._record_cycle(elapsed)
+
+            await asyncio.sleep(max(self.interval - elapsed, 0))
 
-                    for user in users:
+    def stats(self) -> dict:
+        return {
+            **self._metrics,
+            "in_flight": len(self._in_flight),
+            "interval": self.interval,
+            "concurrency": self.concurrency,
+        }
 
-                        try:
-                            dashboard = await calculate_dashboard(
-                                "coinbase",
-                                user,
-                                db,
-                            )
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    def _tier(self, last_seen: float | None) -> str:
+        if last_seen is None:
+            return "idle"
+        if time.time() - last_seen <= presence.ttl:
+            return "present"
+        return "recent"
+
+    async def _due_users(self) -> list[tuple[int, str]]:
+        """(user_id, tier) pairs due this cycle, present users first."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(distinct(UserExchange.user_id)).where(
+                    UserExchange.exchange_name == "coinbase"
+                )
+            )
+            user_ids = result.scalars().all()
+
+        seen = await presence.last_seen()
+        now = time.monotonic()
+
+        self._metrics["users"] = len(user_ids)
+        due = []
+
+        for user_id in user_ids:
+            tier = self._tier(seen.get(user_id))
+            last = self._last_attempt.get(user_id)
+
+            # Half an interval of slack so jitter never pushes a user a cycle late
+            if last is None or now - last + self.interval / 2 >= self.tiers[tier]:
+                due.append((user_id, tier))
+
+        order = list(self.tiers)
+        due.sort(key=lambda item: order.index(item[1]))
+
+        return due
+
+    async def _run_cycle(self, started: float) -> None:
+        due = await self._due_users()
+
+        self._metrics["due"] = {
+            tier: sum(1 for _, t in due if t == tier) for tier in self.tiers
+        }
+
+        logger.info(f"📊 Updating dashboard for {len(due)} users {self._metrics['due']}")
+
+        slot = self.interval / max(len(due), 1)
+        tasks = []
+
+        for i, (user_id, tier) in enumerate(due):
+            # Even spacing; jitter stays inside the slot so order is kept
+            slot_at = started + i * slot + random.uniform(0, slot * self.jitter)
+            await asyncio.sleep(max(slot_at - time.monotonic(), 0))
+
+            if user_id in self._in_flight:
+                self._metrics["skipped"] += 1
+                continue
+
+            await self._semaphore.acquire()
+            self._in_flight.add(user_id)
+            self._last_attempt[user_id] = time.monotonic()
+            tasks.append(asyncio.create_task(self._refresh(user_id, tier)))
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _refresh(self, user_id: int, tier: str) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                user = await db.get(User, user_id)
+                if user is None:
+                    return
+
+                dashboard = await asyncio.wait_for(
+                    calculate_dashboard("coinbase", user, db), self.interval
+                )
+
+            # Slower tiers keep their dashboard cached until the next refresh
+            ttl = max(DASHBOARD_CACHE_TTL, self.tiers[tier] * 2)
+            changed = await store_dashboard(user_id, dashboard, ttl=ttl)
+
+            self._metrics["refreshed"] += 1
+            self._metrics["changed"] += int(changed)
+
+            logger.info(
+                f"✅ Cached dashboard for user {user_id}"
+                f"{' (changed)' if changed else ''}"
+            )
+
+        except Exception as e:
+            self._metrics["failed"] += 1
+            logger.warning(f"⚠️ Dashboard update failed for user {user_id}: {e}")
+
+        finally:
+            self._in_flight.discard(user_id)
+            self._semaphore.release()
+
+    def _record_cycle(self, elapsed: float) -> None:
+        self._metrics["cycles"] += 1
+        self._metrics["last_cycle_seconds"] = elapsed
+        self._metrics["max_cycle_seconds"] = max(
+            self._metrics["max_cycle_seconds"], elapsed
+        )
+
+        if elapsed > self.interval:
+            self._metrics["overruns"] += 1
+            logger.warning(
+                f"⏱ Dashboard cycle took {elapsed:.1f}s (interval {self.interval}s)"
+            )
+        else:
+            logger.info(f"⏱ Dashboard cycle took {elapsed:.1f}s")
 
-                            redis_key = f"dashboard:{user.id}"
 
-                            await redis_client.setex(
-                                redis_key,
-                                40,
-                                json.dumps({
-                                    "data": dashboard
-                                }),
-                            )
+# Singleton instance
+dashboard_scheduler = DashboardScheduler(
+    interval=DASHBOARD_REFRESH,
+    concurrency=settings.DASHBOARD_CONCURRENCY,
+    jitter=settings.DASHBOARD_REFRESH_JITTER,
+)
 
-                            logger.info(f"✅ Cached dashboard for user {user.id}")
 
-                        except Exception as e:
-                            logger.warning(
-                                f"⚠️ Dashboard update failed for user {user.id}: {e}"
-                            )
+async def dashboard_worker():
+    """
+    Background task that refreshes the dashboard cache, every
+    DASHBOARD_REFRESH seconds for users currently viewing it.
+    """
 
-            except Exception as e:
-                logger.error(f"🔥 Worker loop error: {e}")
+    logger.info("🚀 Dashboard worker started")
 
-            await asyncio.sleep(DASHBOARD_REFRESH)
+    try:
+        await dashboard_scheduler.run()
     except asyncio.CancelledError:
-        logger.info("🛑 Dashboard worker stopped")
+        logger.info(f"🛑 Dashboard worker stopped: {dashboard_scheduler.stats()}")
         raise
-
-    
\ No newline at end of file
@@ -0,0 +1,399 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+import websockets
+
+from app.core.config import get_settings
+from app.core.redis import redis_client
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ADVANCED_WS_URL = "wss://advanced-trade-ws.coinbase.com"
+
+DEFAULT_CHANNELS = ("ticker", "candles")
+
+# Channels whose consumers keep state built from a subscribe snapshot plus
+# deltas; after a sequence gap they are resubscribed for a fresh snapshot
+SNAPSHOT_CHANNELS = ("level2", "market_trades")
+
+# Synthetic message sent to listeners before such a resubscribe:
+# {"channel": RESYNC_CHANNEL, "channels": [...], "product_ids": [...]}
+RESYNC_CHANNEL = "hub_resync"
+
+
+def ticker_payload(ticker: dict, timestamp: str | None) -> dict:
+    return {
+        "category": "market_price_ticker",
+        "symbol": ticker.get("product_id"),
+        "price": ticker.get("price"),
+        "best_bid": ticker.get("best_bid"),
+        "best_ask": ticker.get("best_ask"),
+        "volume_24h": ticker.get("volume_24h"),
+        "timestamp": timestamp,
+    }
+
+
+def candle_payload(candle: dict, event_type: str | None, timestamp: str | None) -> dict:
+    return {
+        "category": "market_price_candle",
+        "symbol": candle.get("product_id"),
+        "event_type": event_type,
+        "start": candle.get("start"),
+        "open": candle.get("open"),
+        "high": candle.get("high"),
+        "low": candle.get("low"),
+        "close": candle.get("close"),
+        "volume": candle.get("volume"),
+        "timestamp": timestamp,
+    }
+
+
+class _UpstreamConnection:
+    """
+    One Advanced Trade WebSocket carrying many product_ids.
+    Products are added/removed with subscribe/unsubscribe messages; after a
+    reconnect the current subscription set is replayed. `last_sequence` is
+    the connection-wide sequence_num of the latest message (None until the
+    first message after each connect).
+    """
+
+    def __init__(self, index: int, on_message):
+        self.index = index
+        self.channels: dict[str, set[str]] = defaultdict(set)
+        self.last_sequence: int | None = None
+        self._on_message = on_message
+        self._ws = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_idle(self) -> bool:
+        return not any(self.channels.values())
+
+    async def add(self, channel: str, product_ids: list[str]) -> None:
+        new = [p for p in product_ids if p not in self.channels[channel]]
+        if not new:
+            return
+
+        self.channels[channel].update(new)
+        await self._send("subscribe", channel, new)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def remove(self, channel: str, product_ids: list[str]) -> None:
+        gone = [p for p in product_ids if p in self.channels[channel]]
+        if not gone:
+            return
+
+        self.channels[channel].difference_update(gone)
+        await self._send("unsubscribe", channel, gone)
+
+        # Coinbase drops connections without subscriptions anyway
+        if self.is_idle:
+            await self.stop()
+
+    async def resubscribe(self, channel: str) -> list[str]:
+        """Unsubscribe and subscribe again, so Coinbase resends a snapshot."""
+        products = sorted(self.channels.get(channel, ()))
+        if products:
+            await self._send("unsubscribe", channel, products)
+            await self._send("subscribe", channel, products)
+        return products
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _send(self, msg_type: str, channel: str, product_ids: list[str]) -> None:
+        ws = self._ws
+        if ws is None:
+            # Not connected yet — _run() subscribes the current set on connect
+            return
+
+        try:
+            await ws.send(
+                json.dumps(
+                    {"type": msg_type, "product_ids": product_ids, "channel": channel}
+                )
+            )
+        except Exception as e:
+            logger.warning(f"[Hub#{self.index}] {msg_type} {channel} failed: {e}")
+
+    async def _run(self) -> None:
+        backoff = 1
+
+        while True:
+            try:
+                async with websockets.connect(
+                    ADVANCED_WS_URL,
+                    ping_interval=20,
+                    ping_timeout=20,
+                    close_timeout=10,
+                ) as ws:
+
+                    backoff = 1
+                    self._ws = ws
+                    self.last_sequence = None
+
+                    # Keeps quiet connections open
+                    await ws.send(json.dumps({"type": "subscribe", "channel": "heartbeats"}))
+
+                    for channel, products in list(self.channels.items()):
+                        if products:
+                            await ws.send(
+                                json.dumps(
+                                    {
+                                        "type": "subscribe",
+                                        "product_ids": sorted(products),
+                                        "channel": channel,
+                                    }
+                                )
+                            )
+
+                    logger.info(
+                        f"📡 Hub#{self.index} connected: "
+                        f"{ {c: len(p) for c, p in self.channels.items() if p} }"
+                    )
+
+                    async for raw_msg in ws:
+                        await self._on_message(raw_msg, self)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                logger.warning(f"[Hub#{self.index}] error: {e}. Retry in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+            finally:
+                self._ws = None
+
+
+class CoinbaseMarketDataHub:
+    """
+    Multiplexed Coinbase market-data feed.
+
+    Keeps at most `max_connections` upstream sockets and spreads product_ids
+    across them. Subscriptions are reference counted per (channel, product):
+    the first subscriber sends `subscribe`, the last one sends `unsubscribe`.
+    Ticker and candle events of products subscribed with publish=True are
+    published to Redis on `symbol:{SYMBOL}`; in-process consumers can also
+    register listeners for raw messages.
+    """
+
+    def __init__(self, max_connections: int):
+        self._connections = [
+            _UpstreamConnection(i, self._handle_message)
+            for i in range(max(max_connections, 1))
+        ]
+        self._refcounts: dict[tuple[str, str], int] = {}
+        self._assignment: dict[str, _UpstreamConnection] = {}
+        self._publishing: dict[str, int] = {}
+        self._listeners: list = []
+        self._lock = asyncio.Lock()
+
+    async def subscribe(
+        self, product_ids, channels=DEFAULT_CHANNELS, publish: bool = True
+    ) -> None:
+        product_ids = [p.upper() for p in product_ids]
+
+        async with self._lock:
+            if publish:
+                for product_id in product_ids:
+                    self._publishing[product_id] = self._publishing.get(product_id, 0) + 1
+
+            for channel in channels:
+                pending: dict[_UpstreamConnection, list[str]] = defaultdict(list)
+
+                for product_id in product_ids:
+                    key = (channel, product_id)
+                    self._refcounts[key] = self._refcounts.get(key, 0) + 1
+
+                    if self._refcounts[key] == 1:
+                        pending[self._connection_for(product_id)].append(product_id)
+
+                for connection, ids in pending.items():
+                    await connection.add(channel, ids)
+
+    async def unsubscribe(
+        self, product_ids, channels=DEFAULT_CHANNELS, publish: bool = True
+    ) -> None:
+        product_ids = [p.upper() for p in product_ids]
+
+        async with self._lock:
+            if publish:
+                for product_id in product_ids:
+                    if product_id in self._publishing:
+                        self._publishing[product_id] -= 1
+                        if self._publishing[product_id] <= 0:
+                            self._publishing.pop(product_id)
+
+            for channel in channels:
+                pending: dict[_UpstreamConnection, list[str]] = defaultdict(list)
+
+                for product_id in product_ids:
+                    key = (channel, product_id)
+                    if key not in self._refcounts:
+                        continue
+
+                    self._refcounts[key] -= 1
+
+                    if self._refcounts[key] <= 0:
+                        self._refcounts.pop(key, None)
+                        connection = self._assignment.get(product_id)
+                        if connection:
+                            pending[connection].append(product_id)
+
+                for connection, ids in pending.items():
+                    await connection.remove(channel, ids)
+
+            for product_id in product_ids:
+                if not any(p == product_id for _, p in self._refcounts):
+                    self._assignment.pop(product_id, None)
+
+    def add_listener(self, callback) -> None:
+        """Register `callback(message: dict)` for every upstream message."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    async def stop(self) -> None:
+        for connection in self._connections:
+            await connection.stop()
+
+    def stats(self) -> dict:
+        return {
+            "connections": [
+                {c: len(p) for c, p in conn.channels.items() if p}
+                for conn in self._connections
+            ],
+            "products": len(self._assignment),
+            "publishing": len(self._publishing),
+        }
+
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    def _connection_for(self, product_id: str) -> _UpstreamConnection:
+        connection = self._assignment.get(product_id)
+
+        if connection is None:
+            load = defaultdict(int)
+            for assigned in self._assignment.values():
+                load[assigned.index] += 1
+
+            connection = min(self._connections, key=lambda c: load[c.index])
+            self._assignment[product_id] = connection
+
+        return connection
+
+    async def _handle_message(self, raw_msg, connection=None) -> None:
+        try:
+            data = json.loads(raw_msg)
+        except (TypeError, ValueError) as e:
+            # One bad frame must not tear down the socket and its products;
+            # the next frame's sequence_num shows the gap
+            logger.warning(f"Dropping malformed market data frame: {e}")
+            return
+
+        if connection is not None:
+            await self._check_sequence(connection, data.get("sequence_num"))
+
+        channel = data.get("channel")
+        timestamp = data.get("timestamp")
+        messages = []
+
+        # ==========================
+        # TICKER
+        # ==========================
+        if channel == "ticker":
+            for event in data.get("events", []):
+                for ticker in event.get("tickers", []):
+                    if ticker.get("product_id") not in self._publishing:
+                        continue
+                    messages.append(
+                        (ticker.get("product_id"), ticker_payload(ticker, timestamp))
+                    )
+
+        # ==========================
+        # CANDLES
+        # ==========================
+        elif channel == "candles":
+            for event in data.get("events", []):
+                for candle in event.get("candles", []):
+                    if candle.get("product_id") not in self._publishing:
+                        continue
+                    messages.append(
+                        (
+                            candle.get("product_id"),
+                            candle_payload(candle, event.get("type"), timestamp),
+                        )
+                    )
+
+        if messages:
+            # One round trip per frame instead of one per ticker/candle
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    for product_id, payload in messages:
+                        pipe.publish(f"symbol:{product_id}", json.dumps(payload))
+                    await pipe.execute()
+            except Exception as e:
+                # A Redis hiccup must not reconnect the upstream socket
+                # either; in-process listeners still get the frame
+                logger.warning(f"Market data publish failed: {e}")
+
+        self._notify(data)
+
+    async def _check_sequence(self, connection: _UpstreamConnection, sequence) -> None:
+        if not isinstance(sequence, int):
+            return
+
+        last, connection.last_sequence = connection.last_sequence, sequence
+        if last is None or sequence == last + 1:
+            return
+
+        # A frame was dropped or reordered: snapshot-based state built from
+        # this connection can no longer be trusted
+        logger.warning(
+            f"[Hub#{connection.index}] sequence gap {last} -> {sequence}, resyncing"
+        )
+
+        for channel in SNAPSHOT_CHANNELS:
+            products = sorted(connection.channels.get(channel, ()))
+            if not products:
+                continue
+
+            self._notify(
+                {
+                    "channel": RESYNC_CHANNEL,
+                    "channels": [channel],
+                    "product_ids": products,
+                }
+            )
+            await connection.resubscribe(channel)
+
+    def _notify(self, data: dict) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(data)
+            except Exception as e:
+                logger.warning(f"Market data listener failed: {e}")
+
+
+# Singleton instance
+market_data_hub = CoinbaseMarketDataHub(
+    max_connections=settings.MARKET_WS_CONNECTIONS,
+)
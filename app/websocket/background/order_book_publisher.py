@@ -0,0 +1,98 @@
+import asyncio
+import logging
+
+from app.core.config import get_settings
+from app.core.redis import redis_client
+from app.websocket.background.order_book_store import order_book_store
+from app.websocket.background.symbol_leases import SymbolLeaseCoordinator
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+BOOK_DEPTHS = (10, 50)
+PUBLISH_INTERVAL = 0.1  # seconds between snapshots per symbol
+SNAPSHOT_TTL = 5  # seconds the latest snapshot outlives a dead publisher
+
+
+def order_book_channel(symbol: str, depth: int) -> str:
+    return f"orderbook:{symbol.upper()}:{depth}"
+
+
+class OrderBookPublisher:
+    """
+    Publishes top-N snapshots of the shared level2 book for symbols this
+    process owns. Each change (throttled to PUBLISH_INTERVAL) goes out once
+    per depth on `orderbook:{SYMBOL}:{depth}`, and the same payload is kept
+    under that key so late joiners get the current book immediately. The
+    key's TTL is refreshed while the book is quiet, so it only lapses when
+    the publisher is gone.
+    """
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def start(self, symbol: str) -> None:
+        task = self._tasks.get(symbol)
+        if task is None or task.done():
+            self._tasks[symbol] = asyncio.create_task(self._publish(symbol))
+
+    async def stop(self, symbol: str) -> None:
+        task = self._tasks.pop(symbol, None)
+
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _publish(self, symbol: str) -> None:
+        logger.info(f"📗 Publishing order book for {symbol}")
+
+        async with order_book_store.watch(symbol) as book:
+            seen_version = 0
+
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        book.wait_for_change(seen_version), SNAPSHOT_TTL / 2
+                    )
+                except asyncio.TimeoutError:
+                    await self._keep_snapshot(symbol)
+                    continue
+
+                seen_version = book.version
+
+                try:
+                    async with redis_client.pipeline(transaction=False) as pipe:
+                        for depth in BOOK_DEPTHS:
+                            channel = order_book_channel(symbol, depth)
+                            payload = book.payload(depth)
+                            pipe.publish(channel, payload)
+                            pipe.set(channel, payload, ex=SNAPSHOT_TTL)
+                        await pipe.execute()
+
+                except Exception as e:
+                    logger.warning(f"[OrderBook {symbol}] publish failed: {e}")
+
+                await asyncio.sleep(PUBLISH_INTERVAL)
+
+    async def _keep_snapshot(self, symbol: str) -> None:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for depth in BOOK_DEPTHS:
+                    pipe.expire(order_book_channel(symbol, depth), SNAPSHOT_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"[OrderBook {symbol}] snapshot refresh failed: {e}")
+
+
+order_book_publisher = OrderBookPublisher()
+
+# Singleton instance — one publishing process per symbol cluster-wide
+order_book_leases = SymbolLeaseCoordinator(
+    name="orderbook",
+    lease_ttl=settings.SYMBOL_LEASE_TTL,
+    on_claim=order_book_publisher.start,
+    on_release=order_book_publisher.stop,
+)
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+
+from app.websocket.background.market_data_hub import RESYNC_CHANNEL, market_data_hub
+
+logger = logging.getLogger(__name__)
+
+LEVEL2_CHANNEL = "level2"
+LEVEL2_MESSAGE_CHANNEL = "l2_data"
+
+
+class BookSide:
+    """
+    One side of an L2 book as two parallel sorted lists.
+
+    Levels are kept ordered best-first (bids descending, asks ascending) by
+    storing bids under negated keys, so insert/update/delete is a bisect and
+    top-N is a slice.
+    """
+
+    def __init__(self, descending: bool):
+        self.descending = descending
+        self._keys: list[float] = []
+        self._sizes: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._sizes.clear()
+
+    def set(self, price: float, size: float) -> None:
+        key = -price if self.descending else price
+        i = bisect_left(self._keys, key)
+        found = i < len(self._keys) and self._keys[i] == key
+
+        if size <= 0:
+            if found:
+                del self._keys[i]
+                del self._sizes[i]
+        elif found:
+            self._sizes[i] = size
+        else:
+            self._keys.insert(i, key)
+            self._sizes.insert(i, size)
+
+    def top(self, n: int) -> list[dict]:
+        sign = -1 if self.descending else 1
+        return [
+            {"price": sign * key, "size": size}
+            for key, size in zip(self._keys[:n], self._sizes[:n])
+        ]
+
+
+class OrderBook:
+    """L2 book for one product, built from a level2 snapshot plus updates."""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.version = 0
+        self.ready = False
+        self.updated_at: float | None = None
+        self._changed = asyncio.Event()
+        self._payloads: dict[int, tuple[int, str]] = {}
+
+    def apply(self, event_type: str, updates: list[dict]) -> None:
+        if event_type == "snapshot":
+            self.bids.clear()
+            self.asks.clear()
+            self.ready = True
+        elif not self.ready:
+            # Updates before the first snapshot cannot be placed
+            return
+
+        for update in updates:
+            side = self.bids if update.get("side") == "bid" else self.asks
+            try:
+                side.set(float(update["price_level"]), float(update["new_quantity"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        self.version += 1
+        self.updated_at = time.time()
+
+        # Wake everyone waiting on the previous version
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def invalidate(self) -> None:
+        """Drop updates until the next snapshot rebuilds the book."""
+        self.ready = False
+
+    async def wait_for_change(self, seen_version: int) -> None:
+        if self.version == seen_version:
+            await self._changed.wait()
+
+    def payload(self, depth: int) -> str:
+        """Top-N payload as JSON, encoded once per book version and depth."""
+        cached = self._payloads.get(depth)
+        if cached and cached[0] == self.version:
+            return cached[1]
+
+        text = json.dumps(
+            {
+                "category": "market_order",
+                "symbol": self.symbol,
+                "bids": self.bids.top(depth),
+                "asks": self.asks.top(depth),
+            }
+        )
+        self._payloads[depth] = (self.version, text)
+        return text
+
+
+class OrderBookStore:
+    """
+    Shared, incrementally maintained order books.
+
+    The first watcher of a symbol subscribes its level2 channel on the market
+    data hub; Coinbase answers with a snapshot followed by deltas, which are
+    applied in place. The last watcher unsubscribes and the book is dropped.
+    A hub reconnect replays the subscription, and the fresh snapshot replaces
+    whatever the book held. On a sequence gap the hub resubscribes level2 and
+    the affected books ignore updates until that snapshot arrives.
+    """
+
+    def __init__(self):
+        self._books: dict[str, OrderBook] = {}
+        self._watchers: dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        self._listening = False
+
+    async def acquire(self, symbol: str) -> OrderBook:
+        symbol = symbol.upper()
+
+        async with self._lock:
+            if not self._listening:
+                market_data_hub.add_listener(self._on_market_message)
+                self._listening = True
+
+            self._watchers[symbol] = self._watchers.get(symbol, 0) + 1
+
+            if self._watchers[symbol] == 1:
+                self._books[symbol] = OrderBook(symbol)
+                await market_data_hub.subscribe(
+                    [symbol], channels=(LEVEL2_CHANNEL,), publish=False
+                )
+                logger.info(f"📚 Order book opened for {symbol}")
+
+            return self._books[symbol]
+
+    async def release(self, symbol: str) -> None:
+        symbol = symbol.upper()
+
+        async with self._lock:
+            if symbol not in self._watchers:
+                return
+
+            self._watchers[symbol] -= 1
+
+            if self._watchers[symbol] <= 0:
+                self._watchers.pop(symbol)
+                self._books.pop(symbol, None)
+                await market_data_hub.unsubscribe(
+                    [symbol], channels=(LEVEL2_CHANNEL,), publish=False
+                )
+                logger.info(f"📕 Order book closed for {symbol}")
+
+    @asynccontextmanager
+    async def watch(self, symbol: str):
+        book = await self.acquire(symbol)
+        try:
+            yield book
+        finally:
+            await self.release(symbol)
+
+    def stats(self) -> dict:
+        return {
+            symbol: {
+                "watchers": self._watchers.get(symbol, 0),
+                "bids": len(book.bids),
+                "asks": len(book.asks),
+                "version": book.version,
+            }
+            for symbol, book in self._books.items()
+        }
+
+    def _on_market_message(self, data: dict) -> None:
+        if data.get("channel") == RESYNC_CHANNEL:
+            if LEVEL2_CHANNEL in data.get("channels", ()):
+                for product_id in data.get("product_ids", ()):
+                    book = self._books.get(product_id)
+                    if book is not None:
+                        book.invalidate()
+            return
+
+        if data.get("channel") != LEVEL2_MESSAGE_CHANNEL:
+            return
+
+        for event in data.get("events", []):
+            book = self._books.get(event.get("product_id"))
+            if book is not None:
+                book.apply(event.get("type"), event.get("updates", []))
+
+
+# Singleton instance
+order_book_store = OrderBookStore()
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from app.core.config import get_settings
+from app.core.redis import redis_client
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PRESENCE_KEY = "dashboard_presence"
+
+
+class PresenceTracker:
+    """
+    Last-seen timestamps of dashboard viewers.
+
+    A sorted set maps user_id -> unix time of the latest heartbeat. Open
+    dashboard sockets touch it every ttl/3 seconds, so a user counts as
+    present while their score is younger than `ttl`; older scores tell how
+    recently they were around. Entries older than `retention` are pruned.
+    """
+
+    def __init__(self, ttl: int, retention: int):
+        self.ttl = ttl
+        self.retention = retention
+
+    async def touch(self, user_id) -> None:
+        await redis_client.zadd(PRESENCE_KEY, {str(user_id): time.time()})
+
+    @asynccontextmanager
+    async def session(self, user_id):
+        """Keep `user_id` present for as long as the block runs."""
+
+        async def heartbeat():
+            while True:
+                try:
+                    await self.touch(user_id)
+                except Exception as e:
+                    logger.warning(f"Presence heartbeat failed for {user_id}: {e}")
+                await asyncio.sleep(self.ttl / 3)
+
+        task = asyncio.create_task(heartbeat())
+        try:
+            yield
+        finally:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def last_seen(self) -> dict[int, float]:
+        """user_id -> last heartbeat for everyone seen within `retention`."""
+        cutoff = time.time() - self.retention
+
+        await redis_client.zremrangebyscore(PRESENCE_KEY, "-inf", cutoff)
+        entries = await redis_client.zrangebyscore(
+            PRESENCE_KEY, cutoff, "+inf", withscores=True
+        )
+
+        return {int(user_id): score for user_id, score in entries}
+
+
+# Singleton instance
+presence = PresenceTracker(
+    ttl=settings.PRESENCE_TTL,
+    retention=settings.DASHBOARD_RECENT_WINDOW,
+)
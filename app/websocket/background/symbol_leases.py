@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from app.core.config import get_settings
+from app.core.redis import redis_client
+from app.websocket.background.candle_builder import candle_builder
+from app.websocket.background.market_data_hub import market_data_hub
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# One id per process, shared by every coordinator in it
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Extend / drop the lease only while we still hold it
+_RENEW_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Remove a symbol from the active set only if no process counts it any more
+_RETIRE_SYMBOL = """
+if redis.call('HLEN', KEYS[1]) == 0 then
+    return redis.call('SREM', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+
+def process_key(process_id: str) -> str:
+    return f"market_process:{process_id}"
+
+
+class SymbolLeaseCoordinator:
+    """
+    Cluster-wide ownership of per-symbol streams.
+
+    Each process writes its local subscriber count into the Redis hash
+    `{name}_subscribers:{SYMBOL}` (field = process id) and keeps its
+    `market_process:{id}` heartbeat key alive. Only the holder of
+    `{name}_lease:{SYMBOL}` runs the stream: `on_claim(symbol)` is awaited
+    when the lease is won and `on_release(symbol)` when it is given up or
+    lost. The owner renews its leases every heartbeat; if it dies the lease
+    expires and any live process picks the symbol up on its next tick.
+    Counts of dead processes are pruned.
+    """
+
+    def __init__(self, name: str, lease_ttl: int, on_claim, on_release):
+        self.name = name
+        self.process_id = PROCESS_ID
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = max(lease_ttl / 3, 1)
+        self.active_key = f"{name}_subscribers:active"
+
+        self._on_claim = on_claim
+        self._on_release = on_release
+
+        self.local_counts: dict[str, int] = {}
+        self.owned: set[str] = set()
+
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+        self._renew_lease = redis_client.register_script(_RENEW_LEASE)
+        self._release_lease = redis_client.register_script(_RELEASE_LEASE)
+        self._retire_symbol = redis_client.register_script(_RETIRE_SYMBOL)
+
+    @property
+    def _lease_ms(self) -> int:
+        return int(self.lease_ttl * 1000)
+
+    def subscribers_key(self, symbol: str) -> str:
+        return f"{self.name}_subscribers:{symbol}"
+
+    def lease_key(self, symbol: str) -> str:
+        return f"{self.name}_lease:{symbol}"
+
+    # ===============================
+    # SUBSCRIBERS
+    # ===============================
+
+    async def acquire(self, symbol: str) -> int:
+        """Count one local subscriber; returns the cluster-wide count."""
+        symbol = symbol.upper()
+
+        async with self._lock:
+            self.local_counts[symbol] = self.local_counts.get(symbol, 0) + 1
+
+            await redis_client.hset(
+                self.subscribers_key(symbol), self.process_id, self.local_counts[symbol]
+            )
+            await redis_client.sadd(self.active_key, symbol)
+
+            if symbol not in self.owned:
+                await self._try_claim(symbol)
+
+            return await self._cluster_count(symbol)
+
+    async def release(self, symbol: str) -> int:
+        """Drop one local subscriber; returns the cluster-wide count."""
+        symbol = symbol.upper()
+
+        async with self._lock:
+            if symbol not in self.local_counts:
+                return 0
+
+            self.local_counts[symbol] -= 1
+
+            if self.local_counts[symbol] <= 0:
+                self.local_counts.pop(symbol)
+                await redis_client.hdel(self.subscribers_key(symbol), self.process_id)
+            else:
+                await redis_client.hset(
+                    self.subscribers_key(symbol), self.process_id, self.local_counts[symbol]
+                )
+
+            total = await self._cluster_count(symbol)
+
+            # Owner keeps streaming while other processes still have viewers
+            if total == 0:
+                if symbol in self.owned:
+                    await self._give_up(symbol)
+                await self._retire_symbol(
+                    keys=[self.subscribers_key(symbol), self.active_key], args=[symbol]
+                )
+
+            return total
+
+    # ===============================
+    # LIFECYCLE
+    # ===============================
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        async with self._lock:
+            for symbol in list(self.owned):
+                await self._give_up(symbol)
+
+            for symbol in list(self.local_counts):
+                await redis_client.hdel(self.subscribers_key(symbol), self.process_id)
+            self.local_counts.clear()
+
+            await redis_client.delete(process_key(self.process_id))
+
+        logger.info(f"🛑 {self.name} leases released by {self.process_id}")
+
+    def stats(self) -> dict:
+        return {
+            "process_id": self.process_id,
+            "local_symbols": len(self.local_counts),
+            "local_subscribers": sum(self.local_counts.values()),
+            "owned": sorted(self.owned),
+        }
+
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            try:
+                await self._heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{self.name} lease heartbeat failed: {e}")
+
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _heartbeat(self) -> None:
+        await redis_client.set(process_key(self.process_id), "1", px=self._lease_ms)
+
+        # Re-assert our counts in case another process pruned us during a stall
+        if self.local_counts:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for symbol, count in self.local_counts.items():
+                    pipe.hset(self.subscribers_key(symbol), self.process_id, count)
+                    pipe.sadd(self.active_key, symbol)
+                await pipe.execute()
+
+        symbols = set(await redis_client.smembers(self.active_key)) | self.owned
+
+        for symbol in symbols:
+            async with self._lock:
+                total = await self._cluster_count(symbol)
+
+                if total == 0:
+                    if symbol in self.owned:
+                        await self._give_up(symbol)
+                    await self._retire_symbol(
+                        keys=[self.subscribers_key(symbol), self.active_key], args=[symbol]
+                    )
+
+                elif symbol in self.owned:
+                    renewed = await self._renew_lease(
+                        keys=[self.lease_key(symbol)], args=[self.process_id, self._lease_ms]
+                    )
+                    if not renewed:
+                        logger.warning(f"⚠️ Lost {self.name} lease for {symbol}")
+                        self.owned.discard(symbol)
+                        await self._on_release(symbol)
+
+                else:
+                    await self._try_claim(symbol)
+
+    async def _cluster_count(self, symbol: str) -> int:
+        counts = await redis_client.hgetall(self.subscribers_key(symbol))
+        others = [pid for pid in counts if pid != self.process_id]
+
+        if others:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for pid in others:
+                    pipe.exists(process_key(pid))
+                alive = await pipe.execute()
+
+            dead = [pid for pid, ok in zip(others, alive) if not ok]
+            if dead:
+                await redis_client.hdel(self.subscribers_key(symbol), *dead)
+                for pid in dead:
+                    counts.pop(pid, None)
+
+        return sum(int(c) for c in counts.values())
+
+    async def _try_claim(self, symbol: str) -> bool:
+        claimed = await redis_client.set(
+            self.lease_key(symbol), self.process_id, nx=True, px=self._lease_ms
+        )
+        if not claimed:
+            return False
+
+        self.owned.add(symbol)
+        logger.info(f"🔑 {self.process_id} now owns {self.name} {symbol}")
+        await self._on_claim(symbol)
+        return True
+
+    async def _give_up(self, symbol: str) -> None:
+        self.owned.discard(symbol)
+        await self._release_lease(keys=[self.lease_key(symbol)], args=[self.process_id])
+        await self._on_release(symbol)
+        logger.info(f"🔓 {self.process_id} released {self.name} {symbol}")
+
+
+async def _start_symbol_stream(symbol: str) -> None:
+    await market_data_hub.subscribe([symbol])
+    await candle_builder.track(symbol)
+
+
+async def _stop_symbol_stream(symbol: str) -> None:
+    await candle_builder.untrack(symbol)
+    await market_data_hub.unsubscribe([symbol])
+
+
+# Singleton instance — ticker/candle streams and live bars on symbol:{SYMBOL}
+symbol_leases = SymbolLeaseCoordinator(
+    name="symbol",
+    lease_ttl=settings.SYMBOL_LEASE_TTL,
+    on_claim=_start_symbol_stream,
+    on_release=_stop_symbol_stream,
+)
@@ -1,13 +1,10 @@
 import asyncio
-import json
 import logging
 
-import websockets
+from app.websocket.background.market_data_hub import market_data_hub
 
 logger = logging.getLogger(__name__)
 
-COINBASE_WS_URL = "wss://ws-feed.exchange.coinbase.com"
-
 TOP_10_PRODUCTS = [
     "BTC-USD",
     "ETH-USD",
@@ -18,7 +15,7 @@ TOP_10_PRODUCTS = [
     "DOGE-USD",
     "AVAX-USD",
     "LINK-USD",
-    "MATIC-USD",
+    "POL-USD",  # formerly MATIC-USD
 ]
 
 # Shared in-memory store — updated by listener, read by handler
@@ -26,56 +23,59 @@ price_store: dict[str, dict] = {}
 _shutdown_event = asyncio.Event()
 
 
+def _open_24h(ticker: dict):
+    """Advanced Trade tickers carry the 24h % change instead of the open price."""
+    try:
+        price = float(ticker["price"])
+        change = float(ticker["price_percent_chg_24_h"])
+        return str(price / (1 + change / 100))
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
+
+
+def _on_market_message(data: dict) -> None:
+    if data.get("channel") != "ticker":
+        return
+
+    for event in data.get("events", []):
+        for ticker in event.get("tickers", []):
+            product_id = ticker.get("product_id")
+            if product_id not in TOP_10_PRODUCTS:
+                continue
+
+            price_store[product_id] = {
+                "symbol": product_id,
+                "price": ticker.get("price"),
+                "open_24h": _open_24h(ticker),
+                "volume_24h": ticker.get("volume_24_h"),
+                "low_24h": ticker.get("low_24_h"),
+                "high_24h": ticker.get("high_24_h"),
+                "best_bid": ticker.get("best_bid"),
+                "best_ask": ticker.get("best_ask"),
+                "side": None,
+                "time": data.get("timestamp"),
+            }
+
+
 async def top10_coinbase_listener():
     """
-    Persistent listener for top-10 crypto prices from Coinbase WS.
-    Runs forever with exponential backoff on failure.
-    Stored in price_store dict keyed by product_id.
+    Keeps top-10 crypto prices in price_store, keyed by product_id.
+    Rides on the shared multiplexed market data hub instead of opening its
+    own connection to the legacy feed; runs until stop_top10_listener().
     """
     logger.info("Top10 Coinbase listener starting...")
-    backoff = 1
-
-    while not _shutdown_event.is_set():
-        try:
-            async with websockets.connect(
-                COINBASE_WS_URL,
-                ping_interval=20,
-                ping_timeout=20,
-                close_timeout=10,
-            ) as ws:
-                backoff = 1  # reset on successful connect
-                logger.info("Connected to Coinbase WS (top10)")
-
-                subscribe_msg = {
-                    "type": "subscribe",
-                    "channels": [{"name": "ticker", "product_ids": TOP_10_PRODUCTS}],
-                }
-                await ws.send(json.dumps(subscribe_msg))
-
-                async for raw_msg in ws:
-                    if _shutdown_event.is_set():
-                        break
-                    data = json.loads(raw_msg)
-                    if data.get("type") == "ticker":
-                        product_id = data.get("product_id")
-                        if product_id:
-                            price_store[product_id] = {
-                                "symbol": product_id,
-                                "price": data.get("price"),
-                                "open_24h": data.get("open_24h"),
-                                "volume_24h": data.get("volume_24h"),
-                                "low_24h": data.get("low_24h"),
-                                "high_24h": data.get("high_24h"),
-                                "best_bid": data.get("best_bid"),
-                                "best_ask": data.get("best_ask"),
-                                "side": data.get("side"),
-                                "time": data.get("time"),
-                            }
-
-        except Exception as e:
-            logger.warning(f"Top10 listener error: {e}. Reconnecting in {backoff}s...")
-            await asyncio.sleep(backoff)
-            backoff = min(backoff * 2, 60)  # exponential backoff, max 60s
+
+    market_data_hub.add_listener(_on_market_message)
+    # Local price_store only — Redis publishing belongs to the symbol lease owner
+    await market_data_hub.subscribe(TOP_10_PRODUCTS, channels=("ticker",), publish=False)
+
+    try:
+        await _shutdown_event.wait()
+    finally:
+        market_data_hub.remove_listener(_on_market_message)
+        await market_data_hub.unsubscribe(
+            TOP_10_PRODUCTS, channels=("ticker",), publish=False
+        )
 
 
 async def stop_top10_listener():
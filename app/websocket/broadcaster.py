@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from app.core.config import get_settings
+from app.core.redis import redis_client
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One local consumer of a Redis channel.
+
+    Messages wait in a bounded queue; when a slow client lets it fill up the
+    oldest message is dropped, so the client always catches up to the newest
+    tick instead of holding the publisher back.
+    """
+
+    def __init__(self, channel: str, maxsize: int):
+        self.channel = channel
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, message) -> None:
+        if self._queue.full():
+            try:
+                self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.dropped += 1
+
+        self._queue.put_nowait(message)
+
+    async def get(self):
+        return await self._queue.get()
+
+
+class RedisBroadcaster:
+    """
+    Per-process fan-out of Redis pub/sub channels to WebSocket sessions.
+
+    The process holds a single pub/sub connection and subscribes each channel
+    once, however many local clients watch it. One reader task copies every
+    message into the bounded queues of the channel's subscriptions.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._pubsub = None
+        self._subscriptions: dict[str, set[Subscription]] = defaultdict(set)
+        self._reader: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self._metrics = {"received": 0, "delivered": 0, "dropped": 0}
+
+    async def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(channel, self.queue_size)
+
+        async with self._lock:
+            first = not self._subscriptions[channel]
+            self._subscriptions[channel].add(subscription)
+
+            if first:
+                if self._pubsub is None:
+                    self._pubsub = redis_client.pubsub()
+                await self._pubsub.subscribe(channel)
+                logger.info(f"📡 Broadcaster subscribed to {channel}")
+
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read_loop())
+
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        channel = subscription.channel
+
+        async with self._lock:
+            subscriptions = self._subscriptions.get(channel)
+            if not subscriptions or subscription not in subscriptions:
+                return
+
+            subscriptions.discard(subscription)
+            self._metrics["dropped"] += subscription.dropped
+
+            if not subscriptions:
+                self._subscriptions.pop(channel, None)
+                await self._pubsub.unsubscribe(channel)
+                logger.info(f"📴 Broadcaster unsubscribed from {channel}")
+
+    @asynccontextmanager
+    async def listen(self, channel: str):
+        subscription = await self.subscribe(channel)
+        try:
+            yield subscription
+        finally:
+            await self.unsubscribe(subscription)
+
+    async def stop(self) -> None:
+        reader, self._reader = self._reader, None
+
+        if reader and not reader.done():
+            reader.cancel()
+            try:
+                await reader
+            except asyncio.CancelledError:
+                pass
+
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+        self._subscriptions.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self._metrics,
+            "dropped": self._metrics["dropped"]
+            + sum(s.dropped for subs in self._subscriptions.values() for s in subs),
+            "channels": len(self._subscriptions),
+            "subscribers": sum(len(subs) for subs in self._subscriptions.values()),
+        }
+
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    async def _read_loop(self) -> None:
+        backoff = 1
+
+        # listen() returns once every channel is unsubscribed; the next
+        # subscribe() starts a fresh reader
+        while self._subscriptions:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+
+                    backoff = 1
+                    self._metrics["received"] += 1
+
+                    for subscription in list(
+                        self._subscriptions.get(message["channel"], ())
+                    ):
+                        subscription.offer(message["data"])
+                        self._metrics["delivered"] += 1
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                # redis-py reconnects and re-subscribes on the next read
+                logger.warning(f"Broadcaster read error: {e}. Retry in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+# Singleton instance
+broadcaster = RedisBroadcaster(queue_size=settings.BROADCAST_QUEUE_SIZE)
@@ -1,12 +1,9 @@
-import asyncio
-import json
 import logging
-import traceback
 
 from fastapi import WebSocket
 
-from app.core.redis import redis_client
 from app.websocket.background.coinbase_worker import ensure_symbol_worker, remove_symbol_subscriber
+from app.websocket.broadcaster import broadcaster
 
 logger = logging.getLogger(__name__)
 
@@ -23,23 +20,21 @@ async def handle_market_price(
     # Ensure symbol worker exists
     await ensure_symbol_worker(symbol)
 
-    pubsub = redis_client.pubsub()
     channel = f"symbol:{symbol}"
 
     print("📡 Subscribing to:", channel)
-    await pubsub.subscribe(channel)
 
     try:
-        async for message in pubsub.listen():
-            if message["type"] == "message":
-                data = json.loads(message["data"])
-                await websocket.send_json(data)
+        # Shared per-process Redis subscription, fanned out locally.
+        # Payloads are already JSON (encoded once by the publisher), so they
+        # are forwarded as-is instead of being decoded and re-encoded per client.
+        async with broadcaster.listen(channel) as subscription:
+            while True:
+                await websocket.send_text(await subscription.get())
 
     except Exception as e:
         print("🔥 market_price error:", e)
 
     finally:
         print(f"❌ WebSocket closed for {symbol}")
-        await pubsub.unsubscribe(channel)
-        await pubsub.aclose()
         await remove_symbol_subscriber(symbol)
@@ -1,88 +1,42 @@
-import asyncio
-import json
 import logging
 
-import ccxt.async_support as ccxt
 from fastapi import WebSocket
 
-from app.coinbase.exchange import get_keys
-from app.services.coinbase_credentials import get_coinbase_credentials
+from app.core.redis import redis_client
+from app.websocket.background.order_book_publisher import (
+    order_book_channel,
+    order_book_leases,
+)
+from app.websocket.broadcaster import broadcaster
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_SYMBOL = "BTC-USD"
-FETCH_INTERVAL = 2  # seconds
+BOOK_DEPTH = 10
 
 
-async def build_exchange(user_id: int, db):
-    print("DEBUG: building exchange for user", user_id)
-
-    keys = await get_keys("coinbase", user_id, db)
-
-    print("DEBUG: keys received", keys)
-
-    exchange = ccxt.coinbaseexchange(
-        {
-            "apiKey": keys["api_key"],
-            "secret": keys["api_secret"],
-            "password": keys["passphrase"],
-            "enableRateLimit": True,
-        }
-    )
-
-    print("DEBUG: exchange created")
-
-    return exchange
-
+async def handle_order_book(websocket: WebSocket, symbol: str = DEFAULT_SYMBOL):
+    """
+    Streams top BOOK_DEPTH snapshots of `symbol`. One process cluster-wide
+    maintains the book from the public level2 feed and publishes it to
+    Redis; this handler only relays the published payloads.
+    """
+    symbol = symbol.upper()
 
-async def handle_order_book(
-    websocket: WebSocket,
-    user_id: int,
-    db,
-    symbol: str = DEFAULT_SYMBOL,
-):
     print("DEBUG: handle_order_book started")
-    print("DEBUG: user_id:", user_id)
     print("DEBUG: symbol:", symbol)
 
-    symbol = symbol.upper()
+    await order_book_leases.acquire(symbol)
+    channel = order_book_channel(symbol, BOOK_DEPTH)
 
     try:
-        print("DEBUG: building exchange...")
-        exchange = await build_exchange(user_id, db)
-        print("DEBUG: exchange built successfully")
-
-    except Exception as e:
-        print("❌ ERROR building exchange:", e)
-        raise
-
-    try:
-        while True:
-            try:
-                print("DEBUG: fetching orderbook...")
-                orderbook = await exchange.fetch_order_book(symbol)
-                print("DEBUG: orderbook fetched")
-
-                bids = orderbook["bids"][:10]
-                asks = orderbook["asks"][:10]
-
-                payload = {
-                    "category": "market_order",
-                    "symbol": symbol,
-                    "bids": [{"price": b[0], "size": b[1]} for b in bids],
-                    "asks": [{"price": a[0], "size": a[1]} for a in asks],
-                }
-
-                print("DEBUG: sending payload to websocket")
-                await websocket.send_json(payload)
-                print("DEBUG: payload sent")
-
-            except Exception as e:
-                print("❌ ERROR inside fetch loop:", e)
-                raise
+        async with broadcaster.listen(channel) as subscription:
+            latest = await redis_client.get(channel)
+            if latest:
+                await websocket.send_text(latest)
 
-            await asyncio.sleep(FETCH_INTERVAL)
+            while True:
+                await websocket.send_text(await subscription.get())
 
     finally:
-        print("DEBUG: closing exchange")
-        await exchange.close()
+        await order_book_leases.release(symbol)
@@ -10,10 +10,14 @@ from app.api.exchange_routers import calculate_dashboard
 from app.auth.user import get_user_from_token
 from app.core.redis import redis_client
 from app.db.session import get_async_session
+from app.websocket.background.dashboard_worker import dashboard_channel
+from app.websocket.background.presence import presence
 from app.websocket.background.redis_utils import get_cached_dashboard
+from app.websocket.broadcaster import broadcaster
 from app.websocket.handlers.market_price import handle_market_price
 from app.websocket.handlers.order_book import handle_order_book
 from app.websocket.handlers.top_10 import handle_top_10
+from app.websocket.session_outbox import SessionOutbox
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/market", tags=["Market WebSocket"])
@@ -31,19 +35,6 @@ async def unified_market_ws(
     await websocket.accept()
     print("✅ WebSocket accepted")
 
-    # KEEP ALIVE TASK
-    async def keep_alive():
-        while True:
-            await asyncio.sleep(20)
-            try:
-                print("💓 Sending ping to client")
-                await websocket.send_json({"type": "ping"})
-            except Exception:
-                print("❌ Ping failed — client disconnected?")
-                break
-
-    asyncio.create_task(keep_alive())
-
     # --- Auth: expect first message to be auth token ---
     try:
         auth_msg = await asyncio.wait_for(websocket.receive_text(), timeout=10)
@@ -79,6 +70,19 @@ async def unified_market_ws(
     user_id = str(user.id)
     print("🟢 User connected:", user_id)
 
+    # All server -> client traffic goes through a bounded, conflating queue
+    outbox = SessionOutbox(websocket)
+    outbox.start()
+
+    # KEEP ALIVE TASK
+    async def keep_alive():
+        while not outbox.closed:
+            await asyncio.sleep(20)
+            print("💓 Sending ping to client")
+            await outbox.send_json({"type": "ping"})
+
+    keep_alive_task = asyncio.create_task(keep_alive())
+
     current_symbol = DEFAULT_SYMBOL
 
     # Active background tasks per session
@@ -90,10 +94,7 @@ async def unified_market_ws(
             task.cancel()
 
     async def safe_send(data: dict):
-        try:
-            await websocket.send_json(data)
-        except Exception:
-            pass
+        await outbox.send_json(data)
 
     logger.info(f"User {user_id} connected to unified WS")
 
@@ -115,14 +116,14 @@ async def unified_market_ws(
                 #     current_symbol = symbol
                 #     await change_symbol(user_id, current_symbol)
                 # active_tasks["market_price"] = asyncio.create_task(
-                #     handle_market_price(websocket, user_id, current_symbol)
+                #     handle_market_price(outbox, user_id, current_symbol)
                 # )
                 cancel_task("market_price")
 
                 current_symbol = symbol
 
                 active_tasks["market_price"] = asyncio.create_task(
-                    handle_market_price(websocket, user_id, current_symbol)
+                    handle_market_price(outbox, user_id, current_symbol)
                 )
 
             # --- order_book ---
@@ -135,7 +136,7 @@ async def unified_market_ws(
                 print("DEBUG: symbol:", current_symbol)
 
                 task = asyncio.create_task(
-                    handle_order_book(websocket, user.id, db, current_symbol)
+                    handle_order_book(outbox, current_symbol)
                 )
 
                 def task_done_callback(t: asyncio.Task):
@@ -153,7 +154,7 @@ async def unified_market_ws(
             # --- top 10 ---
             elif msg_type == "subscribe_top_10":
                 cancel_task("top_10")
-                active_tasks["top_10"] = asyncio.create_task(handle_top_10(websocket))
+                active_tasks["top_10"] = asyncio.create_task(handle_top_10(outbox))
 
             # --- unsubscribe any ---
             elif msg_type == "unsubscribe":
@@ -169,7 +170,7 @@ async def unified_market_ws(
                 #     cancel_task("market_price")
                 #     await change_symbol(user_id, current_symbol)
                 #     active_tasks["market_price"] = asyncio.create_task(
-                #         handle_market_price(websocket, user_id, current_symbol)
+                #         handle_market_price(outbox, user_id, current_symbol)
                 #     )
                 # if "order_book" in active_tasks:
                 #     cancel_task("order_book")
@@ -181,13 +182,13 @@ async def unified_market_ws(
                 if "market_price" in active_tasks:
                     cancel_task("market_price")
                     active_tasks["market_price"] = asyncio.create_task(
-                        handle_market_price(websocket, user_id, current_symbol)
+                        handle_market_price(outbox, user_id, current_symbol)
                     )
 
                 if "order_book" in active_tasks:
                     cancel_task("order_book")
                     active_tasks["order_book"] = asyncio.create_task(
-                        handle_order_book(websocket, user.id, db, current_symbol)
+                        handle_order_book(outbox, current_symbol)
                     )
 
             else:
@@ -203,6 +204,13 @@ async def unified_market_ws(
     finally:
         print("🔴 WebSocket closed")
 
+        keep_alive_task.cancel()
+        for name in list(active_tasks):
+            cancel_task(name)
+
+        await outbox.close()
+        logger.info(f"User {user_id} outbox stats: {outbox.stats()}")
+
         # cancel market_price worker for this user
         # from app.websocket.background.coinbase_worker import active_workers
 
@@ -248,15 +256,23 @@ async def dashboard_ws(
 
     user_id = str(user.id)
 
-    redis = redis_client
-
-    try:
+    async def push_updates(subscription):
+        while True:
+            await websocket.send_text(await subscription.get())
 
+    async def drain_client():
+        # Client messages are ignored; reading detects disconnects
         while True:
+            await websocket.receive_text()
 
-            redis_key = f"dashboard:{user_id}"
+    try:
+        # Presence heartbeat moves this user to the fastest refresh tier.
+        # Subscribe before reading the cache so no update slips in between.
+        async with presence.session(user_id), broadcaster.listen(
+            dashboard_channel(user_id)
+        ) as subscription:
 
-            cached = await redis.get(redis_key)
+            cached = await redis_client.get(f"dashboard:{user_id}")
 
             if cached:
                 payload = json.loads(cached)
@@ -267,7 +283,31 @@ async def dashboard_ws(
                     {"info": "dashboard not ready"}
                 )
 
-            await asyncio.sleep(2)
+            # Pushed only when dashboard_worker publishes a changed dashboard
+            pusher = asyncio.create_task(push_updates(subscription))
+            receiver = asyncio.create_task(drain_client())
+
+            try:
+                done, _ = await asyncio.wait(
+                    {pusher, receiver}, return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                pusher.cancel()
+                receiver.cancel()
+                await asyncio.gather(pusher, receiver, return_exceptions=True)
+
+            if receiver in done:
+                receiver.result()  # re-raises the disconnect
+
+            else:
+                # The pusher never returns: a broken subscription would
+                # otherwise leave the socket open but silent
+                error = pusher.exception()
+                print(f"❌ Dashboard push failed for user {user_id}: {error!r}")
+                try:
+                    await websocket.close(code=1011)
+                except Exception:
+                    pass
 
     except WebSocketDisconnect:
         print(f"🔴 Dashboard socket closed for user {user_id}")
@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+
+from fastapi import WebSocket
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Close code for clients evicted for falling too far behind ("try again later")
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+_CATEGORY_RE = re.compile(r'"category"\s*:\s*"([^"]*)"')
+_SYMBOL_RE = re.compile(r'"symbol"\s*:\s*"([^"]*)"')
+
+# Process-wide counters across all sessions (closed ones included)
+slow_client_metrics = {
+    "sessions": 0,
+    "conflated": 0,
+    "dropped": 0,
+    "slow_sends": 0,
+    "evicted": 0,
+}
+
+
+def peek_key(raw: str) -> tuple[str, str] | None:
+    """(category, symbol) of an already-encoded payload, without parsing it."""
+    category = _CATEGORY_RE.search(raw)
+    if not category:
+        return None
+
+    symbol = _SYMBOL_RE.search(raw)
+    return category.group(1), symbol.group(1) if symbol else None
+
+
+class SessionOutbox:
+    """
+    Bounded outbound queue for one WebSocket session.
+
+    Handlers call send_json / send_text as they would on the WebSocket; the
+    call only enqueues and a single writer task does the network I/O.
+    Messages carrying a category are conflated per (category, symbol): a
+    newer value replaces the one still waiting, so a lagging client skips
+    straight to the latest state. Untagged messages (errors, pings) are
+    never conflated. When the queue is full the oldest message is dropped,
+    and a client that keeps overflowing, or stalls a single send beyond
+    WS_SEND_TIMEOUT, is disconnected.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_depth: int = settings.WS_OUTBOX_DEPTH,
+        drop_limit: int = settings.WS_SLOW_CLIENT_DROP_LIMIT,
+        send_timeout: float = settings.WS_SEND_TIMEOUT,
+    ):
+        self.websocket = websocket
+        self.max_depth = max_depth
+        self.drop_limit = drop_limit
+        self.send_timeout = send_timeout
+
+        self._pending: OrderedDict = OrderedDict()
+        self._ready = asyncio.Event()
+        self._seq = itertools.count()
+        self._writer: asyncio.Task | None = None
+        self.closed = False
+
+        self._metrics = {
+            "sent": 0,
+            "conflated": 0,
+            "dropped": 0,
+            "slow_sends": 0,
+            "max_depth_seen": 0,
+        }
+
+    # ===============================
+    # WebSocket-compatible API
+    # ===============================
+
+    async def send_json(self, data: dict) -> None:
+        key = None
+        if isinstance(data, dict) and data.get("category"):
+            key = (data["category"], data.get("symbol"))
+        self._put(key, data)
+
+    async def send_text(self, text: str) -> None:
+        self._put(peek_key(text), text)
+
+    # ===============================
+    # LIFECYCLE
+    # ===============================
+
+    def start(self) -> None:
+        slow_client_metrics["sessions"] += 1
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self) -> None:
+        self.closed = True
+        writer, self._writer = self._writer, None
+
+        if writer and not writer.done():
+            writer.cancel()
+            try:
+                await writer
+            except asyncio.CancelledError:
+                pass
+
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        return {**self._metrics, "depth": len(self._pending)}
+
+    # ===============================
+    # INTERNALS
+    # ===============================
+
+    def _put(self, key, message) -> None:
+        if self.closed:
+            return
+
+        if key is None:
+            key = ("_", next(self._seq))
+
+        if key in self._pending:
+            # Latest value wins, keeping its place in line
+            self._pending[key] = message
+            self._count("conflated")
+        else:
+            if len(self._pending) >= self.max_depth:
+                self._pending.popitem(last=False)
+                self._count("dropped")
+
+            self._pending[key] = message
+            self._metrics["max_depth_seen"] = max(
+                self._metrics["max_depth_seen"], len(self._pending)
+            )
+
+        self._ready.set()
+
+        if self._metrics["dropped"] >= self.drop_limit:
+            self._evict(f"{self._metrics['dropped']} messages dropped")
+
+    def _count(self, name: str) -> None:
+        self._metrics[name] += 1
+        slow_client_metrics[name] += 1
+
+    async def _write_loop(self) -> None:
+        while True:
+            await self._ready.wait()
+
+            while self._pending:
+                _, message = self._pending.popitem(last=False)
+
+                if not isinstance(message, str):
+                    message = json.dumps(message)
+
+                started = time.perf_counter()
+
+                try:
+                    await asyncio.wait_for(
+                        self.websocket.send_text(message), self.send_timeout
+                    )
+                except asyncio.TimeoutError:
+                    self._count("slow_sends")
+                    self._evict(f"send blocked for over {self.send_timeout}s")
+                    return
+                except Exception:
+                    # Socket is gone; the receive loop handles cleanup
+                    self.closed = True
+                    return
+
+                self._metrics["sent"] += 1
+
+                if time.perf_counter() - started > 1:
+                    self._count("slow_sends")
+
+            self._ready.clear()
+
+    def _evict(self, reason: str) -> None:
+        if self.closed:
+            return
+
+        self.closed = True
+        slow_client_metrics["evicted"] += 1
+        logger.warning(f"🐢 Evicting slow WebSocket client: {reason} {self.stats()}")
+
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.websocket.close(code=SLOW_CLIENT_CLOSE_CODE)
+        except Exception:
+            pass
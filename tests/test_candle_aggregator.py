@@ -0,0 +1,114 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.coinbase import exchange
+from app.services import candle_aggregator as aggregator_module
+from app.services.candle_aggregator import (
+    WEEK_MS,
+    CandleAggregator,
+    base_timeframe,
+    resample,
+)
+
+MINUTE = 60 * 1000
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+
+def ms(*args) -> int:
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def test_resample_empty():
+    assert resample([], HOUR) == []
+
+
+def test_resample_ohlcv():
+    start = ms(2024, 3, 5, 10)
+    candles = [
+        [start, 10.0, 12.0, 9.0, 11.0, 1.0],
+        [start + 30 * MINUTE, 11.0, 15.0, 10.0, 14.0, 2.0],
+        [start + 59 * MINUTE, 14.0, 14.5, 8.0, 13.0, None],
+        [start + HOUR, 13.0, 13.0, 12.0, 12.5, 4.0],
+    ]
+
+    assert resample(candles, HOUR) == [
+        [start, 10.0, 15.0, 8.0, 13.0, 3.0],
+        [start + HOUR, 13.0, 13.0, 12.0, 12.5, 4.0],
+    ]
+
+
+def test_resample_skips_empty_buckets():
+    start = ms(2024, 3, 5)
+    candles = [
+        [start, 1.0, 1.0, 1.0, 1.0, 1.0],
+        [start + 9 * HOUR, 2.0, 2.0, 2.0, 2.0, 1.0],
+    ]
+
+    bars = resample(candles, 4 * HOUR)
+
+    assert [bar[0] for bar in bars] == [start, start + 8 * HOUR]
+
+
+def test_resample_weekly_bars_open_on_monday():
+    sunday = ms(2023, 12, 31, 23)
+    monday = ms(2024, 1, 1)
+    candles = [
+        [sunday - 6 * DAY, 1.0, 2.0, 0.5, 1.5, 1.0],  # Monday 2023-12-25
+        [sunday, 1.5, 3.0, 1.0, 2.0, 1.0],
+        [monday, 2.0, 2.5, 1.8, 2.2, 2.0],
+        [monday + 6 * DAY, 2.2, 4.0, 2.1, 3.9, 3.0],  # Sunday 2024-01-07
+    ]
+
+    bars = resample(candles, WEEK_MS)
+
+    assert bars == [
+        [monday - WEEK_MS, 1.0, 3.0, 0.5, 2.0, 2.0],
+        [monday, 2.0, 4.0, 1.8, 3.9, 5.0],
+    ]
+    assert datetime.fromtimestamp(bars[1][0] / 1000, tz=timezone.utc).weekday() == 0
+
+
+@pytest.mark.parametrize(
+    "timeframe, span, expected",
+    [
+        ("4h", 2 * DAY, "1m"),
+        ("4h", 30 * DAY, "1h"),
+        ("1w", 365 * DAY, "1d"),
+        ("6h", 30 * DAY, "6h"),
+    ],
+)
+def test_base_timeframe(timeframe, span, expected):
+    assert base_timeframe(timeframe, span) == expected
+
+
+def test_live_chart_requests_hit_the_resample_cache(monkeypatch):
+    calls = []
+
+    async def fake_get_candles(db, symbol, timeframe, since, until):
+        calls.append((symbol, timeframe, since, until))
+        return [[ts, 1.0, 2.0, 0.5, 1.5, 1.0] for ts in range(since, until, HOUR)]
+
+    aggregator = CandleAggregator(ttl=60, max_size=10)
+    monkeypatch.setattr(exchange, "candle_aggregator", aggregator)
+    monkeypatch.setattr(
+        aggregator_module.candle_store, "get_candles", fake_get_candles
+    )
+
+    async def two_requests():
+        # Each call derives since/until from the current millisecond
+        chart = exchange.get_historical_ohlc_data
+        first = await chart(None, "4h", "BTC-USD", None, None)
+        time.sleep(0.005)
+        second = await chart(None, "4h", "BTC-USD", None, None)
+        return first, second
+
+    first, second = asyncio.run(two_requests())
+
+    assert len(calls) == 1
+    assert calls[0][1] == "1h"
+    assert first["candles"] and second == first
+    assert aggregator.stats()["hits"] == 1
@@ -0,0 +1,56 @@
+import asyncio
+
+import ccxt.async_support as ccxt
+
+from app.coinbase import coinbase_cctx
+from app.coinbase.client_registry import ExchangeClientRegistry
+
+
+class FakeExchange:
+    def __init__(self, fingerprint):
+        self._credential_fingerprint = fingerprint
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def lease(registry, exchange, error=None):
+    """Run a leased call the way exchange.py does: re-raise, release in finally."""
+
+    async def call():
+        try:
+            try:
+                if error:
+                    raise error
+            except Exception as e:
+                raise Exception(f"Failed to fetch user portfolio: {e}")
+            finally:
+                await registry.release(exchange)
+        except Exception:
+            pass
+
+    asyncio.run(call())
+
+
+def test_auth_error_forgets_probe_and_client():
+    registry = ExchangeClientRegistry(max_size=10, idle_ttl=60)
+    exchange = FakeExchange("fp-auth")
+    coinbase_cctx._auth_probe_cache["fp-auth"] = {"flavour": "advanced"}
+
+    lease(registry, exchange, ccxt.AuthenticationError("invalid key"))
+
+    assert "fp-auth" not in coinbase_cctx._auth_probe_cache
+    assert exchange._auth_failed
+    assert exchange.closed
+
+
+def test_other_errors_keep_probe():
+    registry = ExchangeClientRegistry(max_size=10, idle_ttl=60)
+    exchange = FakeExchange("fp-net")
+    coinbase_cctx._auth_probe_cache["fp-net"] = {"flavour": "advanced"}
+
+    lease(registry, exchange, ccxt.NetworkError("timeout"))
+
+    assert "fp-net" in coinbase_cctx._auth_probe_cache
+    assert not getattr(exchange, "_auth_failed", False)
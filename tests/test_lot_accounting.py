@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from app.services.lot_accounting import (
+    METHODS,
+    average,
+    compute_positions,
+    fifo,
+    lifo,
+    trade_arrays,
+)
+
+ENGINES = {"fifo": fifo, "lifo": lifo, "average": average}
+
+
+def run(method, quantity, cash):
+    return ENGINES[method](
+        "BTC",
+        np.asarray(quantity, dtype=np.float64),
+        np.asarray(cash, dtype=np.float64),
+    )
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_sell_before_any_buy_is_unmatched(method):
+    # Deposited coins sold first, then a buy: the buy is still held
+    position = run(method, [-1.0, 1.0], [100.0, 50.0])
+
+    assert position.quantity == pytest.approx(1.0)
+    assert position.cost_basis == pytest.approx(50.0)
+    assert position.realized_pnl == pytest.approx(100.0)
+    assert position.unmatched_sell_quantity == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_oversell_between_buys(method):
+    position = run(method, [1.0, -2.0, 1.0], [10.0, 30.0, 20.0])
+
+    assert position.quantity == pytest.approx(1.0)
+    assert position.cost_basis == pytest.approx(20.0)
+    assert position.realized_pnl == pytest.approx(20.0)
+    assert position.unmatched_sell_quantity == pytest.approx(1.0)
+
+
+def test_engines_differ_on_partial_sell():
+    quantity = [1.0, 1.0, -1.0]
+    cash = [10.0, 20.0, 25.0]
+
+    assert run("fifo", quantity, cash).cost_basis == pytest.approx(20.0)
+    assert run("lifo", quantity, cash).cost_basis == pytest.approx(10.0)
+    assert run("average", quantity, cash).cost_basis == pytest.approx(15.0)
+
+    assert run("fifo", quantity, cash).realized_pnl == pytest.approx(15.0)
+    assert run("lifo", quantity, cash).realized_pnl == pytest.approx(5.0)
+    assert run("average", quantity, cash).realized_pnl == pytest.approx(10.0)
+
+
+def test_fifo_matches_lot_by_lot_reference():
+    rng = np.random.default_rng(7)
+    quantity = rng.uniform(0.1, 2.0, 200) * rng.choice([1.0, -1.0], 200)
+    cash = np.abs(quantity) * rng.uniform(50.0, 150.0, 200)
+
+    lots = []  # [units, unit cost], oldest first
+    realized = unmatched = 0.0
+    for q, c in zip(quantity, cash):
+        if q > 0:
+            lots.append([q, c / q])
+            continue
+        remaining, matched_cost = -q, 0.0
+        while remaining > 1e-12 and lots:
+            take = min(lots[0][0], remaining)
+            matched_cost += take * lots[0][1]
+            lots[0][0] -= take
+            remaining -= take
+            if lots[0][0] <= 1e-12:
+                lots.pop(0)
+        unmatched += remaining
+        realized += c - matched_cost
+
+    position = fifo("BTC", quantity, cash)
+
+    assert position.quantity == pytest.approx(sum(u for u, _ in lots))
+    assert position.cost_basis == pytest.approx(sum(u * p for u, p in lots))
+    assert position.realized_pnl == pytest.approx(realized)
+    assert position.unmatched_sell_quantity == pytest.approx(unmatched)
+
+
+def test_trade_arrays_fees_and_quotes():
+    rows = [
+        ("BTC/USD", "buy", 1.0, 100.0, None, 1.0, "USD"),
+        ("BTC/USDC", "sell", 0.5, 120.0, 60.0, 0.5, "USDC"),
+        ("BTC/EUR", "buy", 1.0, 90.0, 90.0, 0.0, "EUR"),
+        ("ETH/USD", "buy", 0.0, 10.0, 0.0, 0.0, "USD"),
+    ]
+
+    arrays = trade_arrays(rows)
+
+    assert list(arrays) == ["BTC"]
+    assert arrays["BTC"]["quantity"].tolist() == [1.0, -0.5]
+    assert arrays["BTC"]["cash"].tolist() == [101.0, 59.5]
+
+
+def test_compute_positions_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        compute_positions([], method="hifo")
@@ -0,0 +1,27 @@
+from app.services.ohlcv_backfill import plan_windows
+
+STEP = 60 * 1000
+
+
+def test_plan_windows_pages():
+    windows = plan_windows(0, 650 * STEP, STEP, page_limit=300)
+
+    assert windows == [
+        (0, 300 * STEP),
+        (300 * STEP, 600 * STEP),
+        (600 * STEP, 650 * STEP),
+    ]
+
+
+def test_plan_windows_cover_range_without_overlap():
+    start, end = 7 * STEP, 1234 * STEP
+    windows = plan_windows(start, end, STEP, page_limit=100)
+
+    assert windows[0][0] == start
+    assert windows[-1][1] == end
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+    assert all(until - since <= 100 * STEP for since, until in windows)
+
+
+def test_plan_windows_empty_range():
+    assert plan_windows(10 * STEP, 10 * STEP, STEP) == []
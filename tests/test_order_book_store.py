@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+from app.websocket.background.market_data_hub import CoinbaseMarketDataHub
+from app.websocket.background.order_book_store import (
+    BookSide,
+    OrderBook,
+    OrderBookStore,
+)
+
+
+def test_book_side_keeps_best_first():
+    bids = BookSide(descending=True)
+    for price, size in [(100.0, 1.0), (102.0, 2.0), (101.0, 3.0)]:
+        bids.set(price, size)
+
+    bids.set(101.0, 5.0)  # update in place
+    bids.set(102.0, 0.0)  # remove
+    bids.set(99.0, 0.0)  # removing a missing level is a no-op
+
+    assert bids.top(5) == [
+        {"price": 101.0, "size": 5.0},
+        {"price": 100.0, "size": 1.0},
+    ]
+
+    asks = BookSide(descending=False)
+    for price in (103.0, 101.5, 102.0):
+        asks.set(price, 1.0)
+
+    assert [level["price"] for level in asks.top(2)] == [101.5, 102.0]
+
+
+def test_order_book_ignores_updates_before_snapshot():
+    book = OrderBook("BTC-USD")
+    book.apply("update", [{"side": "bid", "price_level": "1", "new_quantity": "1"}])
+
+    assert not book.ready
+    assert len(book.bids) == 0
+    assert book.version == 0
+
+
+def test_order_book_snapshot_replaces_levels():
+    book = OrderBook("BTC-USD")
+    book.apply(
+        "snapshot",
+        [
+            {"side": "bid", "price_level": "100", "new_quantity": "1"},
+            {"side": "offer", "price_level": "101", "new_quantity": "2"},
+        ],
+    )
+    book.apply("update", [{"side": "bid", "price_level": "99", "new_quantity": "bad"}])
+    book.apply("snapshot", [{"side": "bid", "price_level": "98", "new_quantity": "4"}])
+
+    assert book.version == 3
+    assert book.bids.top(5) == [{"price": 98.0, "size": 4.0}]
+    assert len(book.asks) == 0
+
+
+def test_payload_cached_per_version():
+    book = OrderBook("BTC-USD")
+    book.apply("snapshot", [{"side": "bid", "price_level": "100", "new_quantity": "1"}])
+
+    first = book.payload(10)
+    assert book.payload(10) is first
+    assert json.loads(first)["bids"] == [{"price": 100.0, "size": 1.0}]
+
+    book.apply("update", [{"side": "bid", "price_level": "100", "new_quantity": "2"}])
+    assert json.loads(book.payload(10))["bids"] == [{"price": 100.0, "size": 2.0}]
+
+
+class FakeConnection:
+    index = 0
+
+    def __init__(self, channels):
+        self.channels = channels
+        self.last_sequence = None
+        self.resubscribed = []
+
+    async def resubscribe(self, channel):
+        self.resubscribed.append(channel)
+
+
+def test_sequence_gap_invalidates_books_and_resubscribes():
+    hub = CoinbaseMarketDataHub(max_connections=1)
+    store = OrderBookStore()
+    hub.add_listener(store._on_market_message)
+
+    book = OrderBook("BTC-USD")
+    book.apply("snapshot", [{"side": "bid", "price_level": "100", "new_quantity": "1"}])
+    store._books["BTC-USD"] = book
+
+    connection = FakeConnection({"level2": {"BTC-USD"}, "ticker": {"ETH-USD"}})
+
+    async def frames(*sequences):
+        for sequence in sequences:
+            await hub._handle_message(
+                json.dumps({"channel": "heartbeats", "sequence_num": sequence}),
+                connection,
+            )
+
+    asyncio.run(frames(0, 1, 2))
+    assert connection.resubscribed == []
+    assert book.ready
+
+    asyncio.run(frames(4))
+    assert connection.resubscribed == ["level2"]
+    assert not book.ready
+
+    # Deltas are ignored until the fresh snapshot arrives
+    book.apply("update", [{"side": "bid", "price_level": "99", "new_quantity": "1"}])
+    assert book.bids.top(5) == [{"price": 100.0, "size": 1.0}]
@@ -0,0 +1,33 @@
+import asyncio
+import os
+
+import pytest
+
+from app.coinbase.exchange import safe_decrypt
+from app.security.envelope_service import envelope_service
+
+
+def test_envelope_round_trip():
+    data_key = os.urandom(32)
+    sealed = envelope_service.encrypt("api-secret", data_key)
+
+    assert asyncio.run(safe_decrypt(sealed, data_key)) == "api-secret"
+
+
+def test_missing_data_key_is_a_decrypt_failure():
+    sealed = envelope_service.encrypt("api-secret", os.urandom(32))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(safe_decrypt(sealed, None))
+
+
+def test_tampered_ciphertext_is_a_decrypt_failure():
+    data_key = os.urandom(32)
+    sealed = envelope_service.encrypt("api-secret", data_key)
+    tampered = sealed[:-4] + ("AAAA" if not sealed.endswith("AAAA") else "BBBB")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(safe_decrypt(tampered, data_key))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(safe_decrypt(sealed, os.urandom(32)))
@@ -0,0 +1,73 @@
+import asyncio
+
+from app.websocket.session_outbox import SessionOutbox, peek_key
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def close(self, code=None):
+        self.closed_with = code
+
+
+def test_peek_key():
+    assert peek_key('{"category": "market_order", "symbol": "BTC-USD"}') == (
+        "market_order",
+        "BTC-USD",
+    )
+    assert peek_key('{"category":"top10"}') == ("top10", None)
+    assert peek_key('{"error": "bad"}') is None
+
+
+def test_conflates_per_category_and_symbol():
+    async def scenario():
+        outbox = SessionOutbox(FakeWebSocket(), max_depth=10, drop_limit=100)
+        await outbox.send_json({"category": "ticker", "symbol": "BTC", "p": 1})
+        await outbox.send_json({"category": "ticker", "symbol": "ETH", "p": 2})
+        await outbox.send_json({"category": "ticker", "symbol": "BTC", "p": 3})
+        await outbox.send_json({"error": "x"})
+        await outbox.send_json({"error": "x"})
+        return outbox
+
+    outbox = asyncio.run(scenario())
+
+    assert outbox.stats()["depth"] == 4
+    assert outbox.stats()["conflated"] == 1
+    assert list(outbox._pending.values())[0]["p"] == 3
+
+
+def test_drops_oldest_and_evicts_slow_client():
+    async def scenario():
+        websocket = FakeWebSocket()
+        outbox = SessionOutbox(websocket, max_depth=2, drop_limit=3)
+        for i in range(5):
+            await outbox.send_text(f'{{"category": "c{i}"}}')
+        await asyncio.sleep(0)
+        return outbox, websocket
+
+    outbox, websocket = asyncio.run(scenario())
+
+    assert outbox.closed
+    assert outbox.stats()["dropped"] == 3
+    assert websocket.closed_with == 1013
+
+
+def test_writer_sends_in_order():
+    async def scenario():
+        websocket = FakeWebSocket()
+        outbox = SessionOutbox(websocket, max_depth=10, drop_limit=100)
+        outbox.start()
+        await outbox.send_json({"category": "a", "n": 1})
+        await outbox.send_text("pong")
+        await asyncio.sleep(0.01)
+        await outbox.close()
+        return websocket
+
+    websocket = asyncio.run(scenario())
+
+    assert websocket.sent == ['{"category": "a", "n": 1}', "pong"]
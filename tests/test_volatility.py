@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from app.services.volatility import (
+    LOAD_CANDLES,
+    PERIODS_PER_YEAR,
+    TIMEFRAME_MS,
+    VolatilitySeries,
+    expanding_volatility,
+    rolling_volatility,
+)
+
+
+def hourly_candles(n: int, seed: int = 3) -> list[list]:
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return [[i * TIMEFRAME_MS, c, c, c, c, 1.0] for i, c in enumerate(closes.tolist())]
+
+
+def test_expanding_and_rolling_match_np_std():
+    returns = np.random.default_rng(1).normal(0, 0.02, 50)
+    scale = np.sqrt(PERIODS_PER_YEAR)
+
+    expanding = expanding_volatility(returns)
+    rolling = rolling_volatility(returns, 10)
+
+    assert expanding[-1] == pytest.approx(np.std(returns) * scale)
+    assert expanding[19] == pytest.approx(np.std(returns[:20]) * scale)
+    assert np.isnan(rolling[:9]).all()
+    assert rolling[-1] == pytest.approx(np.std(returns[-10:]) * scale)
+
+
+def test_incremental_updates_match_batch():
+    candles = hourly_candles(800)
+
+    batch = VolatilitySeries.from_ohlcv("BTC/USD", candles)
+
+    series = VolatilitySeries.from_ohlcv("BTC/USD", candles[:500])
+    for ts, _, _, _, close, _ in candles[500:]:
+        # An in-progress close first, then the final one for the same hour
+        series.update(ts, close * 1.01)
+        series.update(ts + 30 * 60 * 1000, close)
+
+    assert series.points[-1] == pytest.approx(batch.points[-1])
+    assert series.points[-1]["timestamp"] == candles[-1][0]
+
+
+def test_loaded_history_fills_the_longest_window():
+    short = VolatilitySeries.from_ohlcv("BTC/USD", hourly_candles(LOAD_CANDLES - 1))
+    full = VolatilitySeries.from_ohlcv("BTC/USD", hourly_candles(LOAD_CANDLES))
+
+    assert short.latest() is not None
+    assert short.points[-1]["volatility_30d"] is None
+    assert full.points[-1]["volatility_30d"] is not None
+
+
+def test_update_ignores_older_hours():
+    series = VolatilitySeries.from_ohlcv("BTC/USD", hourly_candles(30))
+    before = list(series.points)
+
+    series.update(0, 50.0)
+
+    assert list(series.points) == before